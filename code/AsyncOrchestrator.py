@@ -0,0 +1,152 @@
+# #############################################################################
+# ####### GREEN-PRESSURE - EMISSION-REDUCING SIGNALIZED INTERSECTION MANAGEMENT
+# #######
+# #######     AUTHOR:       Kevin Riehl <kriehl@ethz.ch>
+# #######     YEAR :        2025
+# #######     ORGANIZATION: Traffic Engineering Group (SVT),
+# #######                   Institute for Transportation Planning and Systems,
+# #######                   ETH Zürich
+# #############################################################################
+"""
+This code drives many SUMO instances from one Python process. Every run gets
+its own labeled TraCI connection (traci.start(..., label=...)) and log
+folder; the runs are advanced in chunks of simulated seconds on a thread
+pool by asyncio, so while one instance waits for SUMO to step (socket I/O,
+GIL released) the control computation of another instance proceeds.
+
+Usage:
+python AsyncOrchestrator.py --sumo-path sumo --demand-file ../model/CompiledDemand.rou.xml --controllers MAX_PRESSURE GREEN_PRESSURE --seeds 1 2 3 --parallel 6
+"""
+
+
+
+
+# #############################################################################
+# ## IMPORTS
+# #############################################################################
+import os
+import sys
+import argparse
+import asyncio
+import itertools
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+import traci
+from SimulationInstance import SimulationInstance, buildSumoCommand
+from ControllerDefinitions import CONTROLLER_FILE, PRESSURE_MODES
+if 'SUMO_HOME' in os.environ:
+    sys.path.append(os.path.join(os.environ['SUMO_HOME'], 'tools'))
+
+
+
+
+# #############################################################################
+# ## PARAMETERS
+# #############################################################################
+CHUNK_SECONDS = 60 # simulated seconds per scheduling slice
+OUTPUT_ROOT = "../model/logs_orchestrated"
+
+
+
+
+# #############################################################################
+# ## METHODS
+# #############################################################################
+
+def parseWeights(weights_string):
+    weights_parts = [float(w) for w in weights_string.split(",")]
+    return {"car": weights_parts[0], "moc": weights_parts[1], "lwt": weights_parts[2], "hwt": weights_parts[3], "bus": weights_parts[4]}
+
+def buildRunSpecs(controllers, weights_list, seeds, demand_file=None, output_root=OUTPUT_ROOT, duration=None,
+                  controller_file=CONTROLLER_FILE, adaptive_stepping=False, pressure_mode="queue", compress_output=False):
+    # one run per (controller, weights, seed); MAX_PRESSURE / FIXED_CYCLE ignore the weights
+    runs = []
+    for controller, weights, seed in itertools.product(controllers, weights_list, seeds):
+        if controller!="GREEN_PRESSURE" and weights!=weights_list[0]:
+            continue
+        label = controller+"_"+weights.replace(",", "-")+"_s"+str(seed) if controller=="GREEN_PRESSURE" else controller+"_s"+str(seed)
+        runs.append({"label": label, "controller": controller, "weights": weights, "seed": seed,
+                     "demand_file": demand_file, "output_dir": output_root+"/"+label, "duration": duration,
+                     "controller_file": controller_file, "adaptive_stepping": adaptive_stepping,
+                     "pressure_mode": pressure_mode, "compress_output": compress_output})
+    return runs
+
+class AsyncOrchestrator:
+    def __init__(self, sumo_binary, parallel=None, chunk_seconds=CHUNK_SECONDS, score=True):
+        self.sumo_binary = sumo_binary
+        self.parallel = parallel or os.cpu_count() or 1
+        self.chunk_seconds = chunk_seconds
+        self.score = score
+        self.start_lock = None
+
+    def startInstance(self, run):
+        sumo_cmd = buildSumoCommand(self.sumo_binary, run["demand_file"], run["output_dir"], run["compress_output"])
+        traci.start(sumo_cmd, label=run["label"])
+        conn = traci.getConnection(run["label"])
+        instance = SimulationInstance(conn, run["controller"], weights=parseWeights(run["weights"]),
+                                      demand_file=run["demand_file"], seed=run["seed"],
+                                      controller_file=run["controller_file"],
+                                      adaptive_stepping=run["adaptive_stepping"], n_seconds=run["duration"],
+                                      pressure_mode=run["pressure_mode"], verbose=False)
+        instance.prepare()
+        return instance
+
+    async def driveRun(self, run, slots):
+        async with slots:
+            start = time.time()
+            # launching SUMO and connecting is done one at a time (traci keeps a global connection table)
+            async with self.start_lock:
+                instance = await asyncio.to_thread(self.startInstance, run)
+            while await asyncio.to_thread(instance.advance, self.chunk_seconds):
+                pass
+            await asyncio.to_thread(instance.close)
+            result = {"label": run["label"], "controller": run["controller"], "weights": run["weights"],
+                      "seed": run["seed"], "runtime_s": time.time()-start}
+            print("FINISHED", run["label"], "%.1fs" % result["runtime_s"])
+        if self.score:
+            from RunScoring import scoreRun
+            objectives, _ = await asyncio.to_thread(scoreRun, run["output_dir"])
+            result.update(objectives)
+        return result
+
+    async def orchestrate(self, runs):
+        asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=self.parallel+1))
+        self.start_lock = asyncio.Lock()
+        slots = asyncio.Semaphore(self.parallel)
+        return await asyncio.gather(*[self.driveRun(run, slots) for run in runs])
+
+    def runAll(self, runs):
+        return asyncio.run(self.orchestrate(runs))
+
+
+
+
+# #############################################################################
+# ## MAIN CODE
+# #############################################################################
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run many simulations concurrently from one process over labeled TraCI connections.")
+    parser.add_argument("--sumo-path", required=True)
+    parser.add_argument("--controllers", nargs="+", default=["GREEN_PRESSURE"], choices=["FIXED_CYCLE", "MAX_PRESSURE", "GREEN_PRESSURE"])
+    parser.add_argument("--weights", nargs="+", default=["1,1,1,1,1"])
+    parser.add_argument("--seeds", type=int, nargs="+", default=[42])
+    parser.add_argument("--demand-file", default=None, help="recommended, compiled with CompileDemand.py")
+    parser.add_argument("--controller-config", default=CONTROLLER_FILE)
+    parser.add_argument("--duration", type=int, default=None, help="simulated seconds per run")
+    parser.add_argument("--adaptive-steps", action="store_true")
+    parser.add_argument("--pressure-mode", default="queue", choices=PRESSURE_MODES)
+    parser.add_argument("--compress-output", action="store_true", help="write the log files as *.xml.gz")
+    parser.add_argument("--parallel", type=int, default=None, help="concurrent SUMO instances")
+    parser.add_argument("--chunk-seconds", type=int, default=CHUNK_SECONDS)
+    parser.add_argument("--output-root", default=OUTPUT_ROOT)
+    parser.add_argument("--results", default="orchestrated_runs.csv")
+    args = parser.parse_args()
+    demand_file = os.path.abspath(args.demand_file) if args.demand_file is not None else None
+    runs = buildRunSpecs(args.controllers, args.weights, args.seeds, demand_file, args.output_root, args.duration,
+                         args.controller_config, args.adaptive_steps, args.pressure_mode, args.compress_output)
+    orchestrator = AsyncOrchestrator(args.sumo_path, args.parallel, args.chunk_seconds)
+    start = time.time()
+    results = orchestrator.runAll(runs)
+    print("FINISHED", len(runs), "RUNS IN", "%.1fs" % (time.time()-start))
+    pd.DataFrame(results).to_csv(args.results, index=False)
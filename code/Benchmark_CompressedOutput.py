@@ -0,0 +1,130 @@
+# #############################################################################
+# ####### GREEN-PRESSURE - EMISSION-REDUCING SIGNALIZED INTERSECTION MANAGEMENT
+# #######
+# #######     AUTHOR:       Kevin Riehl <kriehl@ethz.ch>
+# #######     YEAR :        2025
+# #######     ORGANIZATION: Traffic Engineering Group (SVT),
+# #######                   Institute for Transportation Planning and Systems,
+# #######                   ETH Zürich
+# #############################################################################
+"""
+This code benchmarks plain against gzip compressed SUMO outputs: per run it
+reports the bytes written to the log folder and the end-to-end time of
+simulating (RunSimulation.py with or without --compress-output) and scoring
+the run (RunScoring.scoreRun), and checks that both modes score the same.
+
+Without a SUMO binary, --logs compresses an existing log folder instead and
+only compares bytes and scoring time:
+python Benchmark_CompressedOutput.py --logs ../model/logs
+"""
+
+
+
+
+# #############################################################################
+# ## IMPORTS
+# #############################################################################
+import os
+import sys
+import argparse
+import gzip
+import shutil
+import subprocess
+import time
+from RunScoring import scoreRun
+
+
+
+
+# #############################################################################
+# ## PARAMETERS
+# #############################################################################
+LOG_FILES = ["Emissions.xml", "TripInfos.xml", "Log_summary.xml"]
+OUTPUT_ROOT = "../model/logs_bench_compression"
+
+
+
+
+# #############################################################################
+# ## METHODS
+# #############################################################################
+
+def folderBytes(folder):
+    return sum(os.path.getsize(folder+"/"+f) for f in os.listdir(folder) if os.path.isfile(folder+"/"+f))
+
+def compressFolder(source, target):
+    # gzip copies of the log files (streamed, level 6 as written by SUMO)
+    os.makedirs(target, exist_ok=True)
+    for name in LOG_FILES:
+        if os.path.exists(source+"/"+name):
+            with open(source+"/"+name, "rb") as f_in, gzip.open(target+"/"+name+".gz", "wb", compresslevel=6) as f_out:
+                shutil.copyfileobj(f_in, f_out, 16*1024*1024)
+
+def timeScoring(folder):
+    start = time.time()
+    objectives, _ = scoreRun(folder)
+    return objectives, time.time()-start
+
+def runSimulation(sumo_path, output_dir, seed, duration, demand_file, compress_output):
+    arguments = ["--sumo-path", sumo_path, "--controller", "GREEN_PRESSURE", "--weights", "1,1,1,1,1",
+                 "--seed", str(seed), "--output-dir", output_dir]
+    if duration is not None:
+        arguments += ["--duration", str(duration)]
+    if demand_file is not None:
+        arguments += ["--demand-file", demand_file]
+    if compress_output:
+        arguments += ["--compress-output"]
+    start = time.time()
+    result = subprocess.run([sys.executable, "RunSimulation.py"] + arguments, capture_output=True, text=True)
+    if result.returncode!=0:
+        print(result.stderr)
+    return time.time()-start
+
+def printRow(mode, n_bytes, simulation_s, scoring_s):
+    print("%-6s %12.1f %14.2f %11.2f %13.2f" % (mode, n_bytes/1024/1024, simulation_s, scoring_s, simulation_s+scoring_s))
+
+
+
+
+# #############################################################################
+# ## MAIN CODE
+# #############################################################################
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bytes written and end-to-end time per run, plain vs. gzip compressed logs.")
+    parser.add_argument("--sumo-path", default=None, help="headless sumo binary, simulates the runs")
+    parser.add_argument("--logs", default=None, help="without SUMO: compress this log folder and compare scoring only")
+    parser.add_argument("--runs", type=int, default=2)
+    parser.add_argument("--duration", type=int, default=3600, help="simulated seconds per run")
+    parser.add_argument("--demand-file", default=None)
+    args = parser.parse_args()
+    print("%-6s %12s %14s %11s %13s" % ("MODE", "MB WRITTEN", "SIMULATION S", "SCORING S", "END-TO-END S"))
+
+    if args.logs is not None:
+        compressed = args.logs.rstrip("/")+"_gz"
+        compressFolder(args.logs, compressed)
+        objectives_plain, scoring_plain = timeScoring(args.logs)
+        objectives_gzip, scoring_gzip = timeScoring(compressed)
+        plain_bytes = sum(os.path.getsize(args.logs+"/"+f) for f in LOG_FILES if os.path.exists(args.logs+"/"+f))
+        printRow("plain", plain_bytes, 0.0, scoring_plain)
+        printRow("gzip", folderBytes(compressed), 0.0, scoring_gzip)
+        print("IDENTICAL SCORES" if objectives_plain==objectives_gzip else "WARNING: SCORES DIFFER")
+        sys.exit(0)
+
+    if args.sumo_path is None:
+        print("either --sumo-path or --logs is required")
+        sys.exit(1)
+    demand_file = os.path.abspath(args.demand_file) if args.demand_file is not None else None
+    scores = {}
+    for mode in ["plain", "gzip"]:
+        n_bytes, simulation_s, scoring_s = 0, 0.0, 0.0
+        for seed in range(1, args.runs+1):
+            output_dir = OUTPUT_ROOT+"/"+mode+"_s"+str(seed)
+            shutil.rmtree(output_dir, ignore_errors=True)
+            simulation_s += runSimulation(args.sumo_path, output_dir, seed, args.duration, demand_file, mode=="gzip")
+            objectives, seconds = timeScoring(output_dir)
+            scoring_s += seconds
+            n_bytes += folderBytes(output_dir)
+            scores[(mode, seed)] = objectives["goal"]
+        printRow(mode, n_bytes/args.runs, simulation_s/args.runs, scoring_s/args.runs)
+    identical = all(scores[("plain", s)]==scores[("gzip", s)] for s in range(1, args.runs+1))
+    print("IDENTICAL SCORES" if identical else "WARNING: SCORES DIFFER")
@@ -0,0 +1,92 @@
+# #############################################################################
+# ####### GREEN-PRESSURE - EMISSION-REDUCING SIGNALIZED INTERSECTION MANAGEMENT
+# #######
+# #######     AUTHOR:       Kevin Riehl <kriehl@ethz.ch>
+# #######     YEAR :        2025
+# #######     ORGANIZATION: Traffic Engineering Group (SVT),
+# #######                   Institute for Transportation Planning and Systems,
+# #######                   ETH Zürich
+# #############################################################################
+"""
+This code benchmarks the control decision per simulated second, for growing
+numbers of intersections (the model's controllers replicated): the
+per-controller state machine (SignalController.doSignalLogic, TraCI calls
+replaced by no-ops) against one update of the decision kernel
+(DecisionKernel.py). Link pressures are given, their measurement is not
+part of the benchmark; as in the simulation, they are written into one
+vector right before every step.
+
+Usage:
+python Benchmark_DecisionKernel.py --intersections 5 50 200 1000 --seconds 3600
+"""
+
+
+
+
+# #############################################################################
+# ## IMPORTS
+# #############################################################################
+import argparse
+import time
+import numpy as np
+from DecisionKernel import DecisionKernel
+from Validate_DecisionKernel import FakeConnection, buildControllers
+
+
+
+
+# #############################################################################
+# ## PARAMETERS
+# #############################################################################
+N_PRESSURE_SAMPLES = 64 # distinct link pressure vectors, cycled through
+
+
+
+
+# #############################################################################
+# ## METHODS
+# #############################################################################
+
+def measure(n, n_seconds, seed, vectorized):
+    # microseconds per simulated second
+    rng = np.random.default_rng(seed)
+    conn = FakeConnection()
+    controllers, n_links = buildControllers(n, seed, conn)
+    kernel = DecisionKernel.fromControllers(controllers, seed)
+    samples = [rng.integers(0, 20, n_links).astype(np.float64) for _ in range(N_PRESSURE_SAMPLES)]
+    link_pressures = np.zeros(n_links)
+    step_us = np.zeros(n_seconds)
+    for t_ctr in range(n_seconds):
+        conn.simulation.time = float(t_ctr)
+        link_pressures[:] = samples[t_ctr % N_PRESSURE_SAMPLES]
+        start = time.perf_counter()
+        if vectorized:
+            kernel.step(link_pressures, conn.simulation.getTime(), kernel.isDue(t_ctr))
+        else:
+            for controller in controllers:
+                if controller.isDue(t_ctr):
+                    controller.doSignalLogic(link_pressures)
+        step_us[t_ctr] = (time.perf_counter()-start)*1e6
+    return step_us
+
+
+
+
+# #############################################################################
+# ## MAIN CODE
+# #############################################################################
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-step cost of the control decision, per-controller state machine against the decision kernel.")
+    parser.add_argument("--intersections", type=int, nargs="+", default=[5, 50, 200, 1000])
+    parser.add_argument("--seconds", type=int, default=3600, help="simulated seconds per measurement")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    print("%-14s %14s %14s %14s %14s %9s" % ("INTERSECTIONS", "LOOP MEAN US", "LOOP P99 US", "KERNEL MEAN US", "KERNEL P99 US", "SPEEDUP"))
+    kernel_means = []
+    for n in args.intersections:
+        loop_us = measure(n, args.seconds, args.seed, False)
+        kernel_us = measure(n, args.seconds, args.seed, True)
+        kernel_means.append(kernel_us.mean())
+        print("%-14d %14.1f %14.1f %14.1f %14.1f %8.1fx" % (n, loop_us.mean(), np.percentile(loop_us, 99),
+                                                           kernel_us.mean(), np.percentile(kernel_us, 99), loop_us.mean()/kernel_us.mean()))
+    print("KERNEL STEP COST %d -> %d INTERSECTIONS: %.2fx" % (args.intersections[0], args.intersections[-1], kernel_means[-1]/kernel_means[0]))
@@ -0,0 +1,168 @@
+# #############################################################################
+# ####### GREEN-PRESSURE - EMISSION-REDUCING SIGNALIZED INTERSECTION MANAGEMENT
+# #######
+# #######     AUTHOR:       Kevin Riehl <kriehl@ethz.ch>
+# #######     YEAR :        2025
+# #######     ORGANIZATION: Traffic Engineering Group (SVT),
+# #######                   Institute for Transportation Planning and Systems,
+# #######                   ETH Zürich
+# #############################################################################
+"""
+This code benchmarks how the simulation scales with demand. For every demand
+factor, a scaled spawn schedule is synthesized (ScaleDemand.py) and
+compiled, and one run is simulated in its own process. The benchmark records
+the wall time of every simulated second (control and stepping) and the
+vehicles in the network at that second. It reports per factor:
+- simulated seconds per wall second,
+- step latency percentiles,
+- peak memory of Python and SUMO.
+It also reports step latency as a function of vehicles in the network (the
+scaling curve), and the exponent of step time over vehicles, to catch
+super-linear hot paths.
+
+Usage (17:15-18:15, the evening peak shifted to the simulation start):
+python Benchmark_DemandScaling.py --sumo-path sumo --factors 1 2 4 6 8 10 --shift-seconds -28800 --duration 3600
+"""
+
+
+
+
+# #############################################################################
+# ## IMPORTS
+# #############################################################################
+import os
+import sys
+import argparse
+import json
+import resource
+import subprocess
+import time
+import numpy as np
+import pandas as pd
+from ScaleDemand import scaleDemand
+
+
+
+
+# #############################################################################
+# ## PARAMETERS
+# #############################################################################
+OUTPUT_ROOT = "../model/demand_scaling"
+BIN_VEHICLES = 100 # width of the vehicles-in-network bins of the scaling curve
+MIN_VEHICLES = 10 # steps with fewer vehicles are left out of the exponent fit
+SUPER_LINEAR_EXPONENT = 1.1
+
+
+
+
+# #############################################################################
+# ## METHODS
+# #############################################################################
+
+def measure(sumo_path, demand_file, controller, weights, seed, duration, output_dir):
+    # one run in this process: wall time and vehicles in the network per simulated second
+    import traci
+    from AsyncOrchestrator import parseWeights
+    from SimulationInstance import SimulationInstance, buildSumoCommand
+    traci.start(buildSumoCommand(sumo_path, demand_file, output_dir), label="scaling")
+    conn = traci.getConnection("scaling")
+    instance = SimulationInstance(conn, controller, weights=parseWeights(weights), demand_file=demand_file,
+                                  seed=seed, n_seconds=duration, verbose=False)
+    instance.prepare()
+    step_ms = []
+    vehicles = []
+    start = time.perf_counter()
+    while not instance.finished():
+        step_start = time.perf_counter()
+        instance.control()
+        instance.step()
+        step_ms.append((time.perf_counter()-step_start)*1000)
+        vehicles.append(conn.vehicle.getIDCount())
+    wall_s = time.perf_counter()-start
+    instance.close()
+    return {"wall_s": wall_s, "simulated_s": instance.t_ctr, "step_ms": step_ms, "vehicles": vehicles,
+            "rss_python_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/1024,
+            "rss_sumo_mb": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss/1024}
+
+def runMeasurement(args, demand_file, output_dir):
+    command = [sys.executable, __file__, "--measure", demand_file, "--sumo-path", args.sumo_path, "--controller", args.controller,
+               "--weights", args.weights, "--seed", str(args.seed), "--duration", str(args.duration), "--measure-logs", output_dir]
+    result = subprocess.run(command, capture_output=True, text=True)
+    if result.returncode!=0:
+        print(result.stderr)
+        return None
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def prepareDemand(factor, args):
+    from CompileDemand import compileDemand
+    folder = args.output_root+"/x"+str(factor)
+    vehicle_file, bus_file = scaleDemand(factor, args.shift_seconds, args.seed, folder, args.scale_buses,
+                                         args.spawn_vehicles, args.spawn_bus)
+    demand_file = os.path.abspath(folder+"/CompiledDemand.rou.xml")
+    compileDemand(demand_file, vehicle_file=vehicle_file, bus_file=bus_file, seed=args.seed)
+    return demand_file, folder+"/logs"
+
+def scalingCurve(df_steps, bin_vehicles):
+    df_steps = df_steps.assign(bin=(df_steps["vehicles"]//bin_vehicles)*bin_vehicles)
+    curve = df_steps.groupby("bin")["step_ms"].agg(steps="size", p50_ms="median", p99_ms=lambda x: np.percentile(x, 99))
+    curve["ms_per_100_vehicles"] = curve["p50_ms"]/np.maximum(curve.index+bin_vehicles/2, 1)*100
+    return curve
+
+def scalingExponent(df_steps, min_vehicles):
+    # slope of log(step time) over log(vehicles in the network)
+    df_fit = df_steps[df_steps["vehicles"]>=min_vehicles]
+    if len(df_fit)<2 or df_fit["vehicles"].nunique()<2:
+        return float("nan")
+    return float(np.polyfit(np.log(df_fit["vehicles"]), np.log(df_fit["step_ms"]), 1)[0])
+
+
+
+
+# #############################################################################
+# ## MAIN CODE
+# #############################################################################
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Throughput, step latency and memory over scaled demand.")
+    parser.add_argument("--sumo-path", required=True, help="headless sumo binary")
+    parser.add_argument("--factors", type=float, nargs="+", default=[1, 2, 4, 6, 8, 10])
+    parser.add_argument("--shift-seconds", type=int, default=0, help="shift of the spawn schedules (ScaleDemand.py)")
+    parser.add_argument("--scale-buses", action="store_true")
+    parser.add_argument("--spawn-vehicles", default="../model/Spawn_Vehicles.csv")
+    parser.add_argument("--spawn-bus", default="../model/Spawn_Bus.csv")
+    parser.add_argument("--duration", type=int, default=3600, help="simulated seconds per run")
+    parser.add_argument("--controller", default="GREEN_PRESSURE", choices=["FIXED_CYCLE", "MAX_PRESSURE", "GREEN_PRESSURE"])
+    parser.add_argument("--weights", default="1,2,3,4,5")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--bin-vehicles", type=int, default=BIN_VEHICLES)
+    parser.add_argument("--output-root", default=OUTPUT_ROOT)
+    parser.add_argument("--results", default="demand_scaling.csv", help="per simulated second: factor, vehicles, step ms")
+    parser.add_argument("--measure", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--measure-logs", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.measure is not None:
+        print(json.dumps(measure(args.sumo_path, args.measure, args.controller, args.weights, args.seed, args.duration, args.measure_logs)))
+        sys.exit(0)
+
+    print("%-7s %9s %9s %12s %12s %12s %13s %12s" % ("FACTOR", "MEAN VEH", "MAX VEH", "SIM-S/WALL-S", "STEP P50 MS", "STEP P99 MS", "PYTHON RSS MB", "SUMO RSS MB"))
+    steps = []
+    for factor in args.factors:
+        demand_file, output_dir = prepareDemand(factor, args)
+        result = runMeasurement(args, demand_file, output_dir)
+        if result is None:
+            continue
+        step_ms = np.asarray(result["step_ms"])
+        vehicles = np.asarray(result["vehicles"])
+        print("%-7g %9.0f %9d %12.1f %12.2f %12.2f %13.1f %12.1f" % (factor, vehicles.mean(), vehicles.max(), result["simulated_s"]/result["wall_s"],
+                                                                    np.percentile(step_ms, 50), np.percentile(step_ms, 99),
+                                                                    result["rss_python_mb"], result["rss_sumo_mb"]))
+        steps.append(pd.DataFrame({"factor": factor, "second": np.arange(len(step_ms)), "vehicles": vehicles, "step_ms": step_ms}))
+    if len(steps)==0:
+        sys.exit(1)
+    df_steps = pd.concat(steps, ignore_index=True)
+    df_steps.to_csv(args.results, index=False)
+
+    print()
+    print("STEP LATENCY OVER VEHICLES IN THE NETWORK")
+    print(scalingCurve(df_steps, args.bin_vehicles).to_string(float_format=lambda x: "%.2f" % x))
+    exponent = scalingExponent(df_steps, MIN_VEHICLES)
+    print("STEP TIME ~ VEHICLES^%.2f" % exponent, "(SUPER-LINEAR)" if exponent>SUPER_LINEAR_EXPONENT else "")
@@ -0,0 +1,174 @@
+# #############################################################################
+# ####### GREEN-PRESSURE - EMISSION-REDUCING SIGNALIZED INTERSECTION MANAGEMENT
+# #######
+# #######     AUTHOR:       Kevin Riehl <kriehl@ethz.ch>
+# #######     YEAR :        2025
+# #######     ORGANIZATION: Traffic Engineering Group (SVT),
+# #######                   Institute for Transportation Planning and Systems,
+# #######                   ETH Zürich
+# #############################################################################
+"""
+This code benchmarks the Emissions.xml parsers of EmissionLogs.py: reading
+the whole file and splitting it (as the scripts did before), streaming it
+line by line, and the memory-mapped chunk parser with 1..n worker processes.
+Every measurement runs in a fresh interpreter, and reports throughput, the
+peak resident memory of the parent and of the largest worker, and whether
+the per-timestep totals equal those of the line parser.
+
+A synthetic log of a given size is built by repeating the timesteps of a
+shipped log with shifted times, e.g. a 10 GB log:
+python Benchmark_EmissionParsing.py --log ../model/logs/Emissions.xml --synthetic-gb 10
+"""
+
+
+
+
+# #############################################################################
+# ## IMPORTS
+# #############################################################################
+import os
+import sys
+import argparse
+import json
+import resource
+import subprocess
+import time
+import numpy as np
+from EmissionLogs import iterEmissionTimesteps, iterEmissionChunks, CHUNK_BYTES
+
+
+
+
+# #############################################################################
+# ## PARAMETERS
+# #############################################################################
+SYNTHETIC_FOLDER = "../model/logs_synthetic"
+
+
+
+
+# #############################################################################
+# ## METHODS
+# #############################################################################
+
+def buildSyntheticLog(source, target, size_bytes):
+    content = open(source, "r").read()
+    head_end = content.index("<timestep ")
+    # up to the last complete timestep, the source log may be truncated
+    body_end = content.rindex("</timestep>")+len("</timestep>\n")
+    head, body = content[:head_end], content[head_end:body_end]
+    timesteps = body.split("<timestep time=\"")[1:]
+    period = float(timesteps[-1].split("\"")[0]) + 10.0
+    n_written = 0
+    with open(target, "w") as f:
+        f.write(head)
+        repetition = 0
+        while n_written<size_bytes:
+            offset = repetition*period
+            for timestep in timesteps:
+                t, rest = timestep.split("\"", 1)
+                part = "<timestep time=\"%.2f\"%s" % (float(t)+offset, rest)
+                f.write(part)
+                n_written += len(part)
+            repetition += 1
+        f.write("</emission-export>\n")
+    return os.path.getsize(target)
+
+def parseByReading(file):
+    # the former approach: whole file as one string, split into timesteps
+    content = open(file, "r").read()
+    series = []
+    for part in content.split("<timestep time=\"")[1:]:
+        if "</timestep>" not in part and not part.split("\"", 1)[1].startswith("/>"):
+            # never closed (truncated log)
+            continue
+        totals = [0.0]*5
+        for vehicle in part.split("<vehicle id=")[1:]:
+            for p_ctr, key in enumerate([" CO2=\"", " CO=\"", " HC=\"", " NOx=\"", " PMx=\""]):
+                totals[p_ctr] += float(vehicle.split(key)[1].split("\"")[0])
+        series.append(totals)
+    return np.array(series).reshape(-1, 5)
+
+def parseByStreaming(file):
+    return np.array([totals for _, totals in iterEmissionTimesteps(file)]).reshape(-1, 5)
+
+def parseByChunks(file, workers, chunk_bytes):
+    chunks = [totals for _, totals in iterEmissionChunks(file, workers, chunk_bytes)]
+    return np.concatenate(chunks) if chunks else np.zeros((0, 5))
+
+def measure(method, file, workers, chunk_bytes, reference):
+    start = time.time()
+    if method=="read":
+        totals = parseByReading(file)
+    elif method=="stream":
+        totals = parseByStreaming(file)
+    else:
+        totals = parseByChunks(file, workers, chunk_bytes)
+    duration = time.time()-start
+    if reference is not None:
+        np.save(reference, totals)
+    return {"seconds": duration, "rss_parent_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/1024,
+            "rss_worker_mb": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss/1024}
+
+def runMeasurement(method, file, workers, chunk_bytes, reference):
+    command = [sys.executable, __file__, "--measure", method, "--log", file, "--workers", str(workers),
+               "--chunk-mb", str(chunk_bytes/1024/1024), "--reference", reference]
+    result = subprocess.run(command, capture_output=True, text=True)
+    if result.returncode!=0:
+        print(result.stderr)
+        return None
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+
+
+# #############################################################################
+# ## MAIN CODE
+# #############################################################################
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Throughput and peak memory of the emission log parsers.")
+    parser.add_argument("--log", default="../model/logs/Emissions.xml")
+    parser.add_argument("--synthetic-gb", type=float, default=None, help="benchmark a synthetic log of this size instead")
+    parser.add_argument("--workers", type=int, nargs="+", default=None, help="worker counts of the chunk parser")
+    parser.add_argument("--chunk-mb", type=float, default=CHUNK_BYTES/1024/1024)
+    parser.add_argument("--skip-read", action="store_true", help="skip the whole-file reader (needs RAM of several times the log)")
+    parser.add_argument("--measure", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--reference", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    chunk_bytes = int(args.chunk_mb*1024*1024)
+    if args.measure is not None:
+        workers = args.workers[0] if args.workers else 1
+        print(json.dumps(measure(args.measure, args.log, workers, chunk_bytes, args.reference)))
+        sys.exit(0)
+
+    log_file = args.log
+    if args.synthetic_gb is not None:
+        os.makedirs(SYNTHETIC_FOLDER, exist_ok=True)
+        log_file = SYNTHETIC_FOLDER+"/Emissions.xml"
+        if not os.path.exists(log_file) or abs(os.path.getsize(log_file)-args.synthetic_gb*1e9)>0.01*args.synthetic_gb*1e9:
+            print("BUILDING SYNTHETIC LOG", log_file)
+            buildSyntheticLog(args.log, log_file, int(args.synthetic_gb*1e9))
+    size_mb = os.path.getsize(log_file)/1024/1024
+    n_cores = os.cpu_count() or 1
+    worker_counts = args.workers or sorted(set([1, 2, 4, n_cores]) & set(range(1, n_cores+1)))
+    print("LOG", log_file, "%.1f MB" % size_mb, "CORES", n_cores, "CHUNK", "%.0f MB" % args.chunk_mb)
+
+    configurations = [("stream", 1)] + ([] if args.skip_read else [("read", 1)]) + [("chunks", w) for w in worker_counts]
+    reference_file = SYNTHETIC_FOLDER+"_reference.npy" if args.synthetic_gb is not None else "emission_parsing_reference.npy"
+    result_file = reference_file.replace("_reference.npy", "_result.npy")
+    reference = None
+    print("%-8s %7s %9s %9s %13s %13s %9s" % ("PARSER", "WORKERS", "SECONDS", "MB/S", "PARENT RSS MB", "WORKER RSS MB", "IDENTICAL"))
+    for method, workers in configurations:
+        result = runMeasurement(method, log_file, workers, chunk_bytes, reference_file if reference is None else result_file)
+        if result is None:
+            continue
+        if reference is None:
+            reference = np.load(reference_file)
+            identical = "REFERENCE"
+        else:
+            identical = str(np.array_equal(np.load(result_file), reference))
+        print("%-8s %7d %9.2f %9.1f %13.1f %13.1f %9s" % (method, workers, result["seconds"], size_mb/result["seconds"],
+                                                        result["rss_parent_mb"], result["rss_worker_mb"], identical))
+    for file in [reference_file, result_file]:
+        if os.path.exists(file):
+            os.remove(file)
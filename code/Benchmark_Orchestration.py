@@ -0,0 +1,95 @@
+# #############################################################################
+# ####### GREEN-PRESSURE - EMISSION-REDUCING SIGNALIZED INTERSECTION MANAGEMENT
+# #######
+# #######     AUTHOR:       Kevin Riehl <kriehl@ethz.ch>
+# #######     YEAR :        2025
+# #######     ORGANIZATION: Traffic Engineering Group (SVT),
+# #######                   Institute for Transportation Planning and Systems,
+# #######                   ETH Zürich
+# #############################################################################
+"""
+This code benchmarks running a batch of seeded simulations as one Python
+process per run (subprocess "RunSimulation.py", as NASH_Optimizer.py does)
+against driving all runs from one process with AsyncOrchestrator.py, with
+the same number of concurrent SUMO instances. It reports wall time, CPU
+utilization and whether both modes produce the same emission totals.
+"""
+
+
+
+
+# #############################################################################
+# ## IMPORTS
+# #############################################################################
+import os
+import sys
+import argparse
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from AsyncOrchestrator import AsyncOrchestrator, buildRunSpecs
+from RunScoring import scoreRun
+
+
+
+
+# #############################################################################
+# ## METHODS
+# #############################################################################
+
+def runProcess(sumo_path, run):
+    arguments = ["--sumo-path", sumo_path, "--controller", run["controller"], "--weights", run["weights"],
+                 "--seed", str(run["seed"]), "--output-dir", run["output_dir"]]
+    if run["demand_file"] is not None:
+        arguments += ["--demand-file", run["demand_file"]]
+    if run["duration"] is not None:
+        arguments += ["--duration", str(run["duration"])]
+    result = subprocess.run([sys.executable, "RunSimulation.py"] + arguments, capture_output=True, text=True)
+    if result.returncode!=0:
+        print(result.stderr)
+    return result.returncode
+
+def benchmarkProcesses(sumo_path, runs, parallel):
+    start, cpu_start = time.time(), os.times()
+    with ThreadPoolExecutor(max_workers=parallel) as executor:
+        list(executor.map(lambda run: runProcess(sumo_path, run), runs))
+    return time.time()-start, cpuSeconds(cpu_start, os.times())
+
+def benchmarkOrchestrator(sumo_path, runs, parallel, chunk_seconds):
+    start, cpu_start = time.time(), os.times()
+    AsyncOrchestrator(sumo_path, parallel, chunk_seconds, score=False).runAll(runs)
+    return time.time()-start, cpuSeconds(cpu_start, os.times())
+
+def cpuSeconds(start, end):
+    # this process and all finished child processes (python interpreters and SUMO)
+    return (end.user-start.user) + (end.system-start.system) + (end.children_user-start.children_user) + (end.children_system-start.children_system)
+
+
+
+
+# #############################################################################
+# ## MAIN CODE
+# #############################################################################
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="One process per run vs. one asyncio orchestrator for many runs.")
+    parser.add_argument("--sumo-path", required=True, help="headless sumo binary")
+    parser.add_argument("--demand-file", default=None)
+    parser.add_argument("--runs", type=int, default=8)
+    parser.add_argument("--parallel", type=int, default=os.cpu_count())
+    parser.add_argument("--duration", type=int, default=3600, help="simulated seconds per run")
+    parser.add_argument("--chunk-seconds", type=int, default=60)
+    args = parser.parse_args()
+    demand_file = os.path.abspath(args.demand_file) if args.demand_file is not None else None
+    seeds = list(range(1, args.runs+1))
+    runs_proc = buildRunSpecs(["GREEN_PRESSURE"], ["1,2,3,4,5"], seeds, demand_file, "../model/logs_bench_processes", args.duration)
+    runs_async = buildRunSpecs(["GREEN_PRESSURE"], ["1,2,3,4,5"], seeds, demand_file, "../model/logs_bench_async", args.duration)
+
+    wall_proc, cpu_proc = benchmarkProcesses(args.sumo_path, runs_proc, args.parallel)
+    wall_async, cpu_async = benchmarkOrchestrator(args.sumo_path, runs_async, args.parallel, args.chunk_seconds)
+    n_cores = os.cpu_count() or 1
+    print("RUNS", args.runs, "PARALLEL", args.parallel, "SIMULATED SECONDS", args.duration)
+    print("ONE PROCESS PER RUN", "%.1fs wall" % wall_proc, "%.0f%% of %d cores" % (100*cpu_proc/wall_proc/n_cores, n_cores))
+    print("ASYNC ORCHESTRATOR ", "%.1fs wall" % wall_async, "%.0f%% of %d cores" % (100*cpu_async/wall_async/n_cores, n_cores))
+    print("SPEEDUP", "%.2fx" % (wall_proc/wall_async))
+    identical = all(scoreRun(a["output_dir"])[0]["goal"]==scoreRun(b["output_dir"])[0]["goal"] for a, b in zip(runs_proc, runs_async))
+    print("IDENTICAL EMISSION TOTALS" if identical else "WARNING: EMISSION TOTALS DIFFER")
@@ -0,0 +1,168 @@
+# #############################################################################
+# ####### GREEN-PRESSURE - EMISSION-REDUCING SIGNALIZED INTERSECTION MANAGEMENT
+# #######
+# #######     AUTHOR:       Kevin Riehl <kriehl@ethz.ch>
+# #######     YEAR :        2025
+# #######     ORGANIZATION: Traffic Engineering Group (SVT),
+# #######                   Institute for Transportation Planning and Systems,
+# #######                   ETH Zürich
+# #############################################################################
+"""
+This code benchmarks acceptance policies of the NASH optimizer on a synthetic
+score model, without SUMO: score(weights, seed) = true score of the weights +
+seed effect (shared by all weights, i.e. the demand realization) + noise
+(the chaotic response of a run to the weights). Candidates are perturbations
+of the incumbent, with a true score difference drawn around zero, as near
+the optimum. Every policy runs its own optimization chain of equal length:
+- FIXED-k: the candidate's mean over k seeds against the incumbent's mean
+  over the same seeds (k=1 is the original optimizer),
+- SEQUENTIAL: SequentialEvaluation.py.
+A decision is correct if it accepts a truly better candidate, or rejects a
+truly worse one; differences within the indifference count as correct
+either way. Reported are simulations per correct decision and the true
+score the chain ends at. Noise levels can be estimated from the run
+database (weights evaluated on several seeds).
+
+Usage:
+python Benchmark_SequentialEvaluation.py --decisions 500 --repetitions 5
+"""
+
+
+
+
+# #############################################################################
+# ## IMPORTS
+# #############################################################################
+import argparse
+import numpy as np
+import pandas as pd
+from SequentialEvaluation import SequentialEvaluator, weightsKey, MIN_SEEDS, MAX_SEEDS, BATCH_SIZE, ALPHA, BOUNDARY, INDIFFERENCE, SEEDS
+
+
+
+
+# #############################################################################
+# ## PARAMETERS
+# #############################################################################
+BASE_SCORE = 1.66e6 # goal score of the calibrated demand (RunScoring.py)
+SEED_SD = 0.03 # seed effect, share of the base score
+NOISE_SD = 0.005 # run noise, share of the base score
+DELTA_MEAN = 0.001 # true difference candidate - incumbent, share of the base score
+DELTA_SD = 0.005
+FIXED_SEEDS = [1, 3, 10]
+
+
+
+
+# #############################################################################
+# ## METHODS
+# #############################################################################
+
+class SyntheticScores:
+    def __init__(self, base, seed_sd, noise_sd, rng):
+        self.true_scores = {}
+        self.seed_effects = {}
+        self.base = base
+        self.seed_sd = seed_sd
+        self.noise_sd = noise_sd
+        self.rng = rng
+
+    def evaluate(self, weights, seed):
+        if seed not in self.seed_effects:
+            self.seed_effects[seed] = self.rng.normal(0, self.seed_sd)
+        noise = self.rng.normal(0, self.noise_sd)
+        return {"goal": self.true_scores[weightsKey(weights)]+self.seed_effects[seed]+noise}, None
+
+def runChain(policy, n_decisions, scores, delta_mean, delta_sd, indifference, rng, alpha=ALPHA, boundary=BOUNDARY):
+    # optimization chain: one candidate per decision, accepted candidates become the incumbent
+    incumbent = [0.0]
+    scores.true_scores[weightsKey(incumbent)] = scores.base
+    evaluator = SequentialEvaluator(scores.evaluate, alpha=alpha, boundary=boundary)
+    n_correct = 0
+    n_simulations = 0
+    for d in range(1, n_decisions+1):
+        candidate = [float(d)]
+        true_difference = rng.normal(delta_mean, delta_sd)
+        scores.true_scores[weightsKey(candidate)] = scores.true_scores[weightsKey(incumbent)]+true_difference
+        if policy=="sequential":
+            decision = evaluator.compare(candidate, incumbent)
+            accept = decision["accept"]
+            n_simulations += decision["simulations"]
+        else:
+            seeds = SEEDS[:policy]
+            jobs = [(candidate, s) for s in seeds]+[(incumbent, s) for s in seeds if s not in evaluator.seedScores(incumbent)]
+            evaluator.runSeeds(jobs, None)
+            n_simulations += len(jobs)
+            accept = np.mean([evaluator.seedScores(candidate)[s] for s in seeds])<np.mean([evaluator.seedScores(incumbent)[s] for s in seeds])
+        if abs(true_difference)<=indifference*scores.base or accept==(true_difference<0):
+            n_correct += 1
+        if accept:
+            incumbent = candidate
+    return {"decisions": n_decisions, "simulations": n_simulations, "correct": n_correct,
+            "final_true_score": scores.true_scores[weightsKey(incumbent)]}
+
+def estimateNoise(database_file, study):
+    # total and run noise sd from weights evaluated on several seeds; run noise from pairs sharing seeds
+    from RunDatabase import RunDatabase
+    database = RunDatabase(database_file)
+    df = database.evaluations(study)
+    database.close()
+    df = df[df["seed"].notna() & df["score"].notna()]
+    df = df.assign(weights=df["weights"].apply(weightsKey))
+    table = df.pivot_table(index="seed", columns="weights", values="score", aggfunc="mean")
+    table = table.loc[:, table.notna().sum()>=2]
+    if table.shape[1]==0:
+        return None
+    base = float(np.nanmean(table.to_numpy()))
+    total_sd = float(np.sqrt(np.nanmean(table.var(ddof=1).to_numpy())))
+    differences = [(table[a]-table[b]).dropna() for i, a in enumerate(table.columns) for b in table.columns[i+1:]]
+    differences = [x-x.mean() for x in differences if len(x)>=2]
+    noise_sd = float(np.sqrt(np.mean(np.concatenate([x.to_numpy()**2 for x in differences]))/2)) if differences else total_sd/6
+    seed_sd = float(np.sqrt(max(total_sd**2-noise_sd**2, 0)))
+    return base, seed_sd/base, noise_sd/base
+
+
+
+
+# #############################################################################
+# ## MAIN CODE
+# #############################################################################
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulations per correct acceptance decision, fixed seed counts against sequential evaluation.")
+    parser.add_argument("--decisions", type=int, default=500, help="candidates per optimization chain")
+    parser.add_argument("--repetitions", type=int, default=5)
+    parser.add_argument("--fixed-seeds", type=int, nargs="+", default=FIXED_SEEDS)
+    parser.add_argument("--seed-sd", type=float, default=SEED_SD)
+    parser.add_argument("--noise-sd", type=float, default=NOISE_SD)
+    parser.add_argument("--delta-mean", type=float, default=DELTA_MEAN)
+    parser.add_argument("--delta-sd", type=float, default=DELTA_SD)
+    parser.add_argument("--alpha", type=float, default=ALPHA, help="error rate of the sequential policy over all looks")
+    parser.add_argument("--boundary", default=BOUNDARY, choices=["pocock", "obrien-fleming"], help="group-sequential boundary of the sequential policy")
+    parser.add_argument("--database", default=None, help="estimate seed and noise sd from this run database")
+    parser.add_argument("--study", default="nash")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    base = BASE_SCORE
+    if args.database is not None:
+        estimate = estimateNoise(args.database, args.study)
+        if estimate is None:
+            print("NO WEIGHTS WITH SEVERAL SEEDS IN", args.database, "- USING DEFAULTS")
+        else:
+            base, args.seed_sd, args.noise_sd = estimate
+    print("BASE %.0f, SEED SD %.4f, NOISE SD %.4f, DELTA %.4f +- %.4f (shares of the base score), MIN/MAX SEEDS %d/%d, BATCH %d, ALPHA %.2f (%s), INDIFFERENCE %.4f" %
+          (base, args.seed_sd, args.noise_sd, args.delta_mean, args.delta_sd, MIN_SEEDS, MAX_SEEDS, BATCH_SIZE, args.alpha, args.boundary, INDIFFERENCE))
+    results = []
+    policies = args.fixed_seeds+["sequential"]
+    for repetition in range(args.repetitions):
+        for policy in policies:
+            rng = np.random.default_rng([args.seed, repetition])
+            scores = SyntheticScores(base, args.seed_sd*base, args.noise_sd*base, np.random.default_rng([args.seed, repetition, 1]))
+            result = runChain(policy, args.decisions, scores, args.delta_mean*base, args.delta_sd*base, INDIFFERENCE, rng, args.alpha, args.boundary)
+            results.append({"policy": "SEQUENTIAL" if policy=="sequential" else "FIXED-"+str(policy), **result})
+    df = pd.DataFrame(results).groupby("policy", sort=False).sum()
+    df["correct_rate"] = df["correct"]/df["decisions"]
+    df["simulations_per_decision"] = df["simulations"]/df["decisions"]
+    df["simulations_per_correct"] = df["simulations"]/df["correct"]
+    df["final_true_score"] = df["final_true_score"]/args.repetitions
+    print(df.to_string(float_format=lambda x: "%.3f" % x if x<100 else "%.0f" % x))
@@ -0,0 +1,91 @@
+# #############################################################################
+# ####### GREEN-PRESSURE - EMISSION-REDUCING SIGNALIZED INTERSECTION MANAGEMENT
+# #######
+# #######     AUTHOR:       Kevin Riehl <kriehl@ethz.ch>
+# #######     YEAR :        2025
+# #######     ORGANIZATION: Traffic Engineering Group (SVT),
+# #######                   Institute for Transportation Planning and Systems,
+# #######                   ETH Zürich
+# #############################################################################
+"""
+This code measures the startup time of every RunSimulation.py subcommand
+(interpreter start, imports and argument parsing, up to the point where the
+subcommand would start working), checks that no heavy module (pandas,
+numpy, traci) is imported before that point, and fails (exit code 1) if a
+subcommand exceeds the time budget. For reference, it also reports the time
+of an interpreter that only imports pandas, numpy and traci.
+"""
+
+
+
+
+# #############################################################################
+# ## IMPORTS
+# #############################################################################
+import sys
+import argparse
+import statistics
+import subprocess
+import time
+
+
+
+
+# #############################################################################
+# ## PARAMETERS
+# #############################################################################
+BUDGET_SECONDS = 0.25
+HEAVY_MODULES = ["pandas", "numpy", "traci", "matplotlib"]
+# arguments that parse successfully for every subcommand
+SUBCOMMAND_ARGUMENTS = {
+    "run": ["run", "--sumo-path", "sumo", "--controller", "GREEN_PRESSURE", "--weights", "1,2,3,4,5"],
+    "sweep": ["sweep", "--sumo-path", "sumo", "--weights", "1,1,1,1,1", "1,2,3,4,5", "--seeds", "1", "2"],
+    "parse-logs": ["parse-logs", "../model/logs"],
+    "heatmap": ["heatmap", "A=../model/logs/Emissions.xml"],
+}
+# parses the arguments like RunSimulation.main, without running the subcommand
+PARSE_ONLY = "import sys, RunSimulation; RunSimulation.buildParser().parse_args(sys.argv[1:]); " \
+             "print(','.join(m for m in %r if m in sys.modules))" % HEAVY_MODULES
+
+
+
+
+# #############################################################################
+# ## METHODS
+# #############################################################################
+
+def timeCommand(command, repetitions):
+    durations = []
+    output = ""
+    for _ in range(0, repetitions):
+        start = time.perf_counter()
+        result = subprocess.run(command, capture_output=True, text=True)
+        durations.append(time.perf_counter()-start)
+        output = result.stdout.strip()
+        if result.returncode!=0:
+            print(result.stderr)
+    return statistics.median(durations), output
+
+
+
+
+# #############################################################################
+# ## MAIN CODE
+# #############################################################################
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Startup time of the RunSimulation.py subcommands.")
+    parser.add_argument("--repetitions", type=int, default=10)
+    parser.add_argument("--budget", type=float, default=BUDGET_SECONDS, help="seconds per subcommand")
+    args = parser.parse_args()
+
+    reference, _ = timeCommand([sys.executable, "-c", "import pandas, numpy, traci"], args.repetitions)
+    print("%-12s %10s  %s" % ("SUBCOMMAND", "STARTUP S", "HEAVY MODULES IMPORTED"))
+    failed = False
+    for subcommand, arguments in SUBCOMMAND_ARGUMENTS.items():
+        duration, heavy = timeCommand([sys.executable, "-c", PARSE_ONLY] + arguments, args.repetitions)
+        print("%-12s %10.3f  %s" % (subcommand, duration, heavy if heavy else "-"))
+        if duration>args.budget or heavy:
+            failed = True
+    print("%-12s %10.3f" % ("(eager)", reference))
+    print("FAILED: OVER BUDGET OR HEAVY IMPORTS" if failed else "ALL SUBCOMMANDS WITHIN %.2fs" % args.budget)
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,154 @@
+# #############################################################################
+# ####### GREEN-PRESSURE - EMISSION-REDUCING SIGNALIZED INTERSECTION MANAGEMENT
+# #######
+# #######     AUTHOR:       Kevin Riehl <kriehl@ethz.ch>
+# #######     YEAR :        2025
+# #######     ORGANIZATION: Traffic Engineering Group (SVT),
+# #######                   Institute for Transportation Planning and Systems,
+# #######                   ETH Zürich
+# #############################################################################
+"""
+This code benchmarks the per-step state representation: the former pandas
+DataFrame construction in determine_current_state() / determinePressures()
+against the preallocated StateSnapshot, reporting allocations and run time
+per step on synthetic vehicle states. Pressures of both are checked equal;
+the downstream pressure mode (upstream minus downstream queues) is checked
+against a plain loop and timed alongside.
+"""
+
+
+
+
+# #############################################################################
+# ## IMPORTS
+# #############################################################################
+import argparse
+import time
+import tracemalloc
+from types import SimpleNamespace
+import numpy as np
+import pandas as pd
+from VehicleRegistry import VehicleRegistry, VEHICLE_CLASSES
+from StateSnapshot import LaneIndex, StateSnapshot
+
+
+
+
+# #############################################################################
+# ## PARAMETERS
+# #############################################################################
+WEIGHTS = {"car": 1.0, "moc": 0.61, "lwt": 1.12, "hwt": 5.73, "bus": 13.19}
+
+
+
+
+# #############################################################################
+# ## METHODS
+# #############################################################################
+
+def generateControllers(n_controllers, n_links=3, n_lanes=4):
+    controllers = []
+    for c in range(0, n_controllers):
+        links = {2*l: ["E%d-%d_%d" % (c, l, k) for k in range(0, n_lanes)] for l in range(0, n_links)}
+        controllers.append(SimpleNamespace(intersection_name="intersection%d" % c, links=links, downstream=None))
+    return controllers
+
+def withDownstream(controllers):
+    # downstream lanes of a link: the lanes of the same link of the next controller
+    return [SimpleNamespace(intersection_name=c.intersection_name, links=c.links,
+                            downstream=controllers[(c_ctr+1) % len(controllers)].links)
+            for c_ctr, c in enumerate(controllers)]
+
+def generateStep(rng, controllers, n_vehicles, veh_ids):
+    all_lanes = [l for c in controllers for link in c.links.values() for l in link] + ["uncontrolled_1"]
+    lanes = list(rng.choice(all_lanes, size=n_vehicles))
+    hidden_edges = [None]*n_vehicles
+    for i in rng.choice(n_vehicles, size=n_vehicles//10, replace=False):
+        hidden_edges[i] = lanes[i].split("_")[0]
+        lanes[i] = ":J_0_0"
+    return veh_ids, lanes, hidden_edges
+
+def legacyPressures(controllers, veh_ids, lanes, hidden_edges, veh_classes):
+    new_current_lanes = [l if e is None else "@"+e for l, e in zip(lanes, hidden_edges)]
+    df_current_status = pd.DataFrame(np.asarray([veh_ids, new_current_lanes]).transpose(), columns=["veh_id", "lane"])
+    df_current_status["class"] = df_current_status["veh_id"].map(veh_classes)
+    df_current_status["weight"] = df_current_status["class"].map(WEIGHTS)
+    df_hidden_vehicles = df_current_status[df_current_status["lane"].str.startswith("@")].copy()
+    df_hidden_vehicles["edge"] = df_hidden_vehicles["lane"].str.replace("@","")
+    pressures = []
+    for controller in controllers:
+        for link in controller.links:
+            lanes = controller.links[link]
+            df_vehicles = df_current_status[df_current_status["lane"].isin(lanes)]
+            edges = [l.split("_")[0] for l in lanes]
+            hits = df_hidden_vehicles[df_hidden_vehicles["edge"].isin(edges)]
+            if len(hits)>0:
+                df_vehicles = pd.concat((df_vehicles, hits[["veh_id", "lane", "class", "weight"]]))
+            pressures.append(sum(df_vehicles["weight"]) if len(df_vehicles)>0 else 0)
+    return np.asarray(pressures, dtype=float)
+
+def downstreamQueues(controllers, veh_ids, lanes, hidden_edges, veh_classes):
+    queues = []
+    for controller in controllers:
+        for link in controller.links:
+            downstream_lanes = set(controller.downstream[link])
+            queues.append(sum(WEIGHTS[veh_classes[v]] for v, l, e in zip(veh_ids, lanes, hidden_edges) if e is None and l in downstream_lanes))
+    return np.asarray(queues, dtype=float)
+
+def snapshotPressures(state_snapshot, veh_ids, lanes, hidden_edges):
+    state_snapshot.update(veh_ids, lanes, hidden_edges)
+    return state_snapshot.computeLinkPressures()
+
+def measure(function, n_steps):
+    # returns (allocated bytes per step, peak traced bytes, seconds per step)
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    allocated = 0
+    for _ in range(0, n_steps):
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        function()
+        allocated += tracemalloc.get_traced_memory()[1]-before
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    start = time.perf_counter()
+    for _ in range(0, n_steps):
+        function()
+    duration = (time.perf_counter()-start)/n_steps
+    return allocated/n_steps, peak, duration
+
+
+
+
+# #############################################################################
+# ## MAIN CODE
+# #############################################################################
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark per-step state representations.")
+    parser.add_argument("--vehicles", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--controllers", type=int, default=5)
+    parser.add_argument("--steps", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    rng = np.random.default_rng(args.seed)
+    controllers = generateControllers(args.controllers)
+    print("vehicles\tmode\talloc_per_step[kB]\tpeak[kB]\ttime_per_step[ms]")
+    for n_vehicles in args.vehicles:
+        veh_ids = tuple("VEH_%d" % i for i in range(0, n_vehicles))
+        veh_classes = {v: VEHICLE_CLASSES[i % len(VEHICLE_CLASSES)] for i, v in enumerate(veh_ids)}
+        vehicle_registry = VehicleRegistry(WEIGHTS)
+        for v in veh_ids:
+            vehicle_registry.register(v, veh_classes[v], "route")
+        state_snapshot = StateSnapshot(LaneIndex(controllers), vehicle_registry)
+        downstream_snapshot = StateSnapshot(LaneIndex(withDownstream(controllers)), vehicle_registry)
+        step = generateStep(rng, controllers, n_vehicles, veh_ids)
+        legacy = legacyPressures(controllers, *step, veh_classes)
+        fast = snapshotPressures(state_snapshot, *step)
+        assert np.allclose(legacy, fast), "PRESSURES DIFFER"
+        downstream = snapshotPressures(downstream_snapshot, *step)
+        assert np.allclose(downstream, legacy-downstreamQueues(withDownstream(controllers), *step, veh_classes)), "DOWNSTREAM PRESSURES DIFFER"
+        for mode, function in [("dataframe", lambda: legacyPressures(controllers, *step, veh_classes)),
+                               ("snapshot", lambda: snapshotPressures(state_snapshot, *step)),
+                               ("snapshot_downstream", lambda: snapshotPressures(downstream_snapshot, *step))]:
+            allocated, peak, duration = measure(function, args.steps)
+            print("%d\t%s\t%.1f\t%.1f\t%.3f" % (n_vehicles, mode, allocated/1024, peak/1024, duration*1000))
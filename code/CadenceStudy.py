@@ -0,0 +1,108 @@
+# #############################################################################
+# ####### GREEN-PRESSURE - EMISSION-REDUCING SIGNALIZED INTERSECTION MANAGEMENT
+# #######
+# #######     AUTHOR:       Kevin Riehl <kriehl@ethz.ch>
+# #######     YEAR :        2025
+# #######     ORGANIZATION: Traffic Engineering Group (SVT),
+# #######                   Institute for Transportation Planning and Systems,
+# #######                   ETH Zürich
+# #############################################################################
+"""
+This code studies how the control cadence (seconds between two controller
+ticks, "cadence" in model/SignalControllers.json) trades off against runtime
+and outcomes: for every cadence, the seeded simulation is run with all
+controllers set to that cadence, and runtime, emissions and travel times are
+reported in one table. The controller configurations, the log folder of each
+cadence and the table (cadence_study.csv) are written into the output folder.
+"""
+
+
+
+
+# #############################################################################
+# ## IMPORTS
+# #############################################################################
+import os
+import argparse
+import json
+import subprocess
+import sys
+import time
+import pandas as pd
+from RunScoring import scoreRun
+
+
+
+
+# #############################################################################
+# ## PARAMETERS
+# #############################################################################
+OUTPUT_FOLDER = "../model/logs_cadence"
+
+
+
+
+# #############################################################################
+# ## METHODS
+# #############################################################################
+
+def writeCadenceConfig(controller_file, cadence, target_file):
+    f = open(controller_file, "r")
+    definitions = json.load(f)
+    f.close()
+    for definition in definitions:
+        definition.setdefault("timing", {})["cadence"] = cadence
+    f = open(target_file, "w")
+    json.dump(definitions, f, indent=1)
+    f.close()
+
+def runCadence(args, cadence):
+    config_file = args.output+"/cadence_%d.json" % cadence
+    log_folder = args.output+"/cadence_%d" % cadence
+    os.makedirs(log_folder, exist_ok=True)
+    writeCadenceConfig(args.controllers, cadence, config_file)
+    arguments = ["run", "--sumo-path", args.sumo_path, "--controller", args.controller, "--weights", args.weights,
+                 "--seed", str(args.seed), "--controller-config", config_file, "--output-dir", log_folder]
+    if args.demand_file is not None:
+        arguments += ["--demand-file", args.demand_file]
+    if args.adaptive_steps:
+        arguments += ["--adaptive-steps"]
+    start = time.time()
+    result = subprocess.run([sys.executable, "RunSimulation.py"] + arguments, capture_output=True, text=True)
+    runtime = time.time()-start
+    if result.returncode!=0:
+        print(result.stderr)
+        sys.exit(result.returncode)
+    objectives, _ = scoreRun(log_folder)
+    return {"cadence": cadence, "runtime_s": runtime, **objectives}
+
+
+
+
+# #############################################################################
+# ## MAIN CODE
+# #############################################################################
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Trade-off of control cadence against runtime and outcomes.")
+    parser.add_argument("--sumo-path", required=True)
+    parser.add_argument("--controller", default="GREEN_PRESSURE", choices=["MAX_PRESSURE", "GREEN_PRESSURE"])
+    parser.add_argument("--weights", default="1,1,1,1,1")
+    parser.add_argument("--cadences", type=int, nargs="+", default=[1, 2, 3, 5])
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--controllers", default="../model/SignalControllers.json")
+    parser.add_argument("--demand-file", default=None)
+    parser.add_argument("--adaptive-steps", action="store_true")
+    parser.add_argument("--output", default=OUTPUT_FOLDER, help="folder for the configurations, logs and cadence_study.csv")
+    args = parser.parse_args()
+    os.makedirs(args.output, exist_ok=True)
+    rows = []
+    for cadence in args.cadences:
+        rows.append(runCadence(args, cadence))
+        print("CADENCE", cadence, "FINISHED IN", "%.1fs" % rows[-1]["runtime_s"])
+    df_study = pd.DataFrame(rows)
+    reference = df_study.iloc[0]
+    for column in ["runtime_s", "goal", "total_travel_time_h", "total_delay_h"]:
+        df_study[column+"_rel"] = df_study[column]/reference[column]
+    df_study.to_csv(args.output+"/cadence_study.csv", index=False)
+    print(df_study[["cadence", "runtime_s", "goal", "total_travel_time_h", "total_delay_h",
+                    "runtime_s_rel", "goal_rel", "total_travel_time_h_rel"]].to_string(index=False))
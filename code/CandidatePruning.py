@@ -0,0 +1,95 @@
+# #############################################################################
+# ####### GREEN-PRESSURE - EMISSION-REDUCING SIGNALIZED INTERSECTION MANAGEMENT
+# #######
+# #######     AUTHOR:       Kevin Riehl <kriehl@ethz.ch>
+# #######     YEAR :        2025
+# #######     ORGANIZATION: Traffic Engineering Group (SVT),
+# #######                   Institute for Transportation Planning and Systems,
+# #######                   ETH Zürich
+# #############################################################################
+"""
+This code aborts optimizer candidates that cannot win anymore. While a
+candidate's simulation runs, its Emissions.xml is followed (EmissionTail)
+and its running emission goal is compared against the incumbent's stored
+cumulative trajectory (emission series in the run database). The run is
+terminated as soon as
+- its running goal exceeds the incumbent's total of the whole day (it can
+  only grow, so the candidate is certainly worse), or
+- after min_time simulated seconds, its running goal exceeds the incumbent's
+  at the same time by more than the margin (margin=None disables this rule).
+Pruned candidates are recorded in the run database without a score.
+"""
+
+
+
+
+# #############################################################################
+# ## IMPORTS
+# #############################################################################
+import os
+import subprocess
+import time
+import numpy as np
+from EmissionLogs import EmissionTail
+
+
+
+
+# #############################################################################
+# ## PARAMETERS
+# #############################################################################
+PRUNE_MARGIN = 0.10 # share above the incumbent's running goal at the same time
+PRUNE_MIN_TIME = 3600 # simulated seconds before the margin rule applies
+POLL_SECONDS = 2.0
+
+
+
+
+# #############################################################################
+# ## METHODS
+# #############################################################################
+
+class PruningBound:
+    def __init__(self, df_emissions, margin=PRUNE_MARGIN, min_time=PRUNE_MIN_TIME):
+        # df_emissions: the incumbent's per-timestep series (time, goal)
+        self.times = np.asarray(df_emissions["time"], dtype=np.float64)
+        self.cumulative = np.cumsum(np.asarray(df_emissions["goal"], dtype=np.float64))
+        self.total = float(self.cumulative[-1]) if len(self.cumulative) else float("inf")
+        self.margin = margin
+        self.min_time = min_time
+
+    def bound(self, t):
+        if self.margin is None or t<self.min_time or len(self.times)==0:
+            return self.total
+        return min(self.total, (1+self.margin)*float(np.interp(t, self.times, self.cumulative)))
+
+    def crossed(self, t, goal):
+        return t is not None and goal>self.bound(t)
+
+def runPruned(command, emissions_file, bound=None, log_file=None, poll_seconds=POLL_SECONDS):
+    # runs command (a simulation writing emissions_file), terminates it once the bound is crossed;
+    # returns None if the run finished, else {"pruned_time": .., "partial_goal": ..}
+    if os.path.exists(emissions_file):
+        # the log of an earlier run in the same folder
+        os.remove(emissions_file)
+    log = open(log_file, "w") if log_file is not None else subprocess.DEVNULL
+    process = subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT)
+    tail = EmissionTail(emissions_file)
+    pruned = None
+    try:
+        while process.poll() is None:
+            time.sleep(poll_seconds)
+            if bound is None:
+                continue
+            t, goal = tail.update()
+            if bound.crossed(t, goal):
+                pruned = {"pruned_time": t, "partial_goal": goal, "bound": bound.bound(t)}
+                process.terminate()
+                break
+        process.wait()
+    finally:
+        if process.poll() is None:
+            process.kill()
+        if log_file is not None:
+            log.close()
+    return pruned
@@ -0,0 +1,153 @@
+# #############################################################################
+# ####### GREEN-PRESSURE - EMISSION-REDUCING SIGNALIZED INTERSECTION MANAGEMENT
+# #######
+# #######     AUTHOR:       Kevin Riehl <kriehl@ethz.ch>
+# #######     YEAR :        2025
+# #######     ORGANIZATION: Traffic Engineering Group (SVT),
+# #######                   Institute for Transportation Planning and Systems,
+# #######                   ETH Zürich
+# #############################################################################
+"""
+This code will pre-compile the vehicle and bus spawn schedules into a seeded,
+departure-sorted SUMO route file, so that SUMO can load the demand natively
+instead of spawning every vehicle through TraCI at runtime.
+
+Vehicles are written while they are generated, memory is bounded by the
+number of schedule rows, not by the number of vehicles.
+"""
+
+
+
+
+# #############################################################################
+# ## IMPORTS
+# #############################################################################
+import argparse
+import xml.etree.ElementTree as ET
+from datetime import datetime
+import pandas as pd
+import numpy as np
+from DemandModel import loadEmissionClassesFromFile, determineWhetherTruckBannedRoute
+from DemandModel import sampleVehicleClasses, sampleEmissionClasses, sumo_vehicle_types
+
+
+
+
+# #############################################################################
+# ## PARAMETERS
+# #############################################################################
+DEFAULT_START_TIME = "2024-03-04 09:15:00"
+DEFAULT_END_TIME = "2024-03-04 23:00:00"
+BUS_STOP_DURATION = 20 # SECS
+VTYPE_FILE = "../model/CarRoutes.rou.xml"
+
+
+
+
+# #############################################################################
+# ## METHODS
+# #############################################################################
+
+def loadSpawnSchedule(vehicle_file, bus_file, start_time, end_time):
+    # one row per (second, route) in the order RunSimulation.py would spawn them:
+    # per second all vehicle rows (file order) first, then all bus rows
+    start_time = datetime.strptime(start_time, "%Y-%m-%d %H:%M:%S")
+    end_time = datetime.strptime(end_time, "%Y-%m-%d %H:%M:%S")
+    df_veh_spawn = pd.read_csv(vehicle_file, usecols=["Adjusted_Datetime", "n_spawn", "route"])
+    df_veh_spawn["kind"] = 0
+    df_veh_spawn["Stops"] = ""
+    df_bus_spawn = pd.read_csv(bus_file, usecols=["Adjusted_Datetime", "route", "Stops"])
+    df_bus_spawn["kind"] = 1
+    df_bus_spawn["n_spawn"] = 1
+    df_spawn = pd.concat((df_veh_spawn, df_bus_spawn), ignore_index=True)
+    df_spawn["order"] = np.arange(len(df_spawn))
+    df_spawn["Adjusted_Datetime"] = pd.to_datetime(df_spawn["Adjusted_Datetime"])
+    df_spawn = df_spawn[(df_spawn["Adjusted_Datetime"]>=start_time) & (df_spawn["Adjusted_Datetime"]<=end_time)]
+    df_spawn["depart"] = (df_spawn["Adjusted_Datetime"] - start_time).dt.total_seconds()
+    df_spawn = df_spawn.sort_values(["depart", "kind", "order"])
+    return df_spawn[["depart", "kind", "route", "n_spawn", "Stops"]]
+
+def loadVehicleTypes(file=VTYPE_FILE):
+    vtypes = {}
+    for _, elem in ET.iterparse(file):
+        if elem.tag=="vType":
+            vtypes[elem.attrib["id"]] = dict(elem.attrib)
+        elem.clear()
+    return vtypes
+
+def emissionTypeId(vehicle_type, emission_class):
+    return vehicle_type+"@"+emission_class.replace("HBEFA4/", "")
+
+def writeVehicleTypes(f, emission_model, vtypes):
+    # SUMO has no per-vehicle emission class, so every (type, class) pair becomes its own vType
+    f.write("    <!-- VTypes -->\n")
+    for vehicle_class, vehicle_type in sumo_vehicle_types.items():
+        for emission_class in emission_model[vehicle_class]["sumo_emission_class"].unique():
+            attributes = dict(vtypes[vehicle_type])
+            attributes["id"] = emissionTypeId(vehicle_type, "HBEFA4/"+emission_class)
+            attributes["emissionClass"] = "HBEFA4/"+emission_class
+            f.write("    <vType "+" ".join(k+"=\""+str(v)+"\"" for k, v in attributes.items())+"/>\n")
+
+def compileDemand(target_file, vehicle_file="../model/Spawn_Vehicles.csv", bus_file="../model/Spawn_Bus.csv",
+                  emission_file="../data/Emission_VehiclePopulation.xlsx", seed=42,
+                  start_time=DEFAULT_START_TIME, end_time=DEFAULT_END_TIME):
+    rng = np.random.default_rng(seed)
+    emission_model = loadEmissionClassesFromFile(file=emission_file)
+    df_spawn = loadSpawnSchedule(vehicle_file, bus_file, start_time, end_time)
+    vtypes = loadVehicleTypes()
+    truck_banned = {}
+    veh_ctr = 0
+    with open(target_file, "w", buffering=1<<20) as f:
+        f.write("<?xml version=\"1.0\" encoding=\"UTF-8\"?>\n\n")
+        f.write("<!-- generated by CompileDemand.py (seed="+str(seed)+", "+start_time+" - "+end_time+") -->\n\n")
+        f.write("<routes xmlns:xsi=\"http://www.w3.org/2001/XMLSchema-instance\" xsi:noNamespaceSchemaLocation=\"http://sumo.dlr.de/xsd/routes_file.xsd\">\n")
+        writeVehicleTypes(f, emission_model, vtypes)
+        f.write("\n    <!-- Vehicles -->\n")
+        for depart, kind, route, n_spawn, stops in df_spawn.itertuples(index=False):
+            route = str(route)
+            if kind==0:
+                n = int(np.ceil(n_spawn))
+                if n==0:
+                    continue
+                if route not in truck_banned:
+                    truck_banned[route] = determineWhetherTruckBannedRoute(route)
+                vehicle_classes = sampleVehicleClasses(rng, n, truck_banned[route])
+                emission_classes = np.empty(n, dtype=object)
+                for vehicle_class in np.unique(vehicle_classes):
+                    mask = vehicle_classes==vehicle_class
+                    emission_classes[mask] = sampleEmissionClasses(rng, vehicle_class, int(mask.sum()), emission_model)
+                for vehicle_class, emission_class in zip(vehicle_classes, emission_classes):
+                    veh_ctr += 1
+                    type_id = emissionTypeId(sumo_vehicle_types[vehicle_class], emission_class)
+                    f.write("    <vehicle id=\"VEH_%d\" type=\"%s\" route=\"%s\" depart=\"%.2f\"/>\n" % (veh_ctr, type_id, route, depart))
+            else:
+                veh_ctr += 1
+                emission_class = sampleEmissionClasses(rng, "bus", 1, emission_model)[0]
+                type_id = emissionTypeId(sumo_vehicle_types["bus"], emission_class)
+                f.write("    <vehicle id=\"BUS_%d-%s\" type=\"%s\" route=\"%s\" depart=\"%.2f\">\n" % (veh_ctr, route, type_id, route, depart))
+                for stop in str(stops).split("-"):
+                    f.write("        <stop busStop=\"%s\" duration=\"%d\"/>\n" % (stop, BUS_STOP_DURATION))
+                f.write("    </vehicle>\n")
+        f.write("</routes>\n")
+    return veh_ctr
+
+
+
+
+# #############################################################################
+# ## MAIN CODE
+# #############################################################################
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-compile Spawn_Vehicles.csv and Spawn_Bus.csv into a SUMO route file.")
+    parser.add_argument("--output", default="../model/CompiledDemand.rou.xml", help="target route file")
+    parser.add_argument("--seed", type=int, default=42, help="random seed for vehicle and emission classes")
+    parser.add_argument("--spawn-vehicles", default="../model/Spawn_Vehicles.csv")
+    parser.add_argument("--spawn-bus", default="../model/Spawn_Bus.csv")
+    parser.add_argument("--emission-population", default="../data/Emission_VehiclePopulation.xlsx")
+    parser.add_argument("--start-time", default=DEFAULT_START_TIME)
+    parser.add_argument("--end-time", default=DEFAULT_END_TIME)
+    args = parser.parse_args()
+    n_vehicles = compileDemand(args.output, vehicle_file=args.spawn_vehicles, bus_file=args.spawn_bus,
+                               emission_file=args.emission_population, seed=args.seed,
+                               start_time=args.start_time, end_time=args.end_time)
+    print("COMPILED", n_vehicles, "VEHICLES INTO", args.output)
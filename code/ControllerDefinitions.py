@@ -0,0 +1,110 @@
+# #############################################################################
+# ####### GREEN-PRESSURE - EMISSION-REDUCING SIGNALIZED INTERSECTION MANAGEMENT
+# #######
+# #######     AUTHOR:       Kevin Riehl <kriehl@ethz.ch>
+# #######     YEAR :        2025
+# #######     ORGANIZATION: Traffic Engineering Group (SVT),
+# #######                   Institute for Transportation Planning and Systems,
+# #######                   ETH Zürich
+# #############################################################################
+"""
+This code loads the signal controller definitions (intersection name, phases
+and the incoming lanes per link) from model/SignalControllers.json, shared by
+the simulation and the analysis scripts. For the downstream pressure mode,
+the outgoing lanes of every link are derived once from the signalized
+connections in model/Network.net.xml, and for measurements that only name
+lanes, internal junction lanes are traced back to the edge they leave.
+"""
+
+
+
+
+# #############################################################################
+# ## IMPORTS
+# #############################################################################
+import json
+import xml.etree.ElementTree as ET
+
+
+
+
+# #############################################################################
+# ## PARAMETERS
+# #############################################################################
+CONTROLLER_FILE = "../model/SignalControllers.json"
+NET_FILE = "../model/Network.net.xml"
+PRESSURE_MODES = ["queue", "downstream"]
+
+
+
+
+# #############################################################################
+# ## METHODS
+# #############################################################################
+
+def loadControllerDefinitions(file=CONTROLLER_FILE):
+    # JSON object keys are strings, links and multipliers are keyed by phase
+    f = open(file, "r")
+    definitions = json.load(f)
+    f.close()
+    for definition in definitions:
+        definition["links"] = {int(k): v for k, v in definition["links"].items()}
+        if definition.get("multiplier") is not None:
+            definition["multiplier"] = {int(k): v for k, v in definition["multiplier"].items()}
+    return definitions
+
+def determineLaneIntersections(definitions):
+    # incoming lane -> intersection name, as listed in the controllers' links
+    lane_intersections = {}
+    for definition in definitions:
+        for lanes in definition["links"].values():
+            for lane in lanes:
+                lane_intersections[lane] = definition["intersection_name"]
+    return lane_intersections
+
+def loadSignalizedConnections(net_file=NET_FILE):
+    # signal programs (tl -> phase states) and signalized connections from the network
+    phase_states = {}
+    connections = []
+    for _, elem in ET.iterparse(net_file):
+        if elem.tag=="tlLogic":
+            phase_states[elem.attrib["id"]] = [phase.attrib["state"] for phase in elem.findall("phase")]
+        elif elem.tag=="connection" and "tl" in elem.attrib:
+            connections.append((elem.attrib["tl"], int(elem.attrib["linkIndex"]),
+                                elem.attrib["from"]+"_"+elem.attrib["fromLane"], elem.attrib["to"]+"_"+elem.attrib["toLane"]))
+        if elem.tag!="phase":
+            elem.clear()
+    return phase_states, connections
+
+def addDownstreamLanes(definitions, net_file=NET_FILE):
+    # downstream lanes of a link: target lanes of the connections with green in the
+    # link's phase that leave one of the link lanes; links whose lanes lie further
+    # upstream (no such connection) get the targets of all green connections
+    phase_states, connections = loadSignalizedConnections(net_file)
+    for definition in definitions:
+        name = definition["intersection_name"]
+        downstream = {}
+        for link, lanes in definition["links"].items():
+            green = [(from_lane, to_lane) for tl, link_index, from_lane, to_lane in connections
+                     if tl==name and phase_states[name][link][link_index] in "Gg"]
+            direct = [to_lane for from_lane, to_lane in green if from_lane in lanes]
+            downstream[link] = list(dict.fromkeys(direct if direct else [to_lane for _, to_lane in green]))
+        definition["downstream"] = downstream
+    return definitions
+
+def loadInternalLaneEdges(net_file=NET_FILE):
+    # internal junction lane -> the (normal) edge its vehicles come from, following chains of
+    # internal lanes; the simulation counts vehicles there as hidden on that edge
+    from_lanes = {}
+    for _, elem in ET.iterparse(net_file):
+        if elem.tag=="connection" and "via" in elem.attrib:
+            from_lanes[elem.attrib["via"]] = elem.attrib["from"]+"_"+elem.attrib["fromLane"]
+        elem.clear()
+    internal_edges = {}
+    for internal_lane in from_lanes:
+        lane = internal_lane
+        while lane.startswith(":") and lane in from_lanes:
+            lane = from_lanes[lane]
+        if not lane.startswith(":"):
+            internal_edges[internal_lane] = lane.rsplit("_", 1)[0]
+    return internal_edges
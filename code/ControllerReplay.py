@@ -0,0 +1,175 @@
+# #############################################################################
+# ####### GREEN-PRESSURE - EMISSION-REDUCING SIGNALIZED INTERSECTION MANAGEMENT
+# #######
+# #######     AUTHOR:       Kevin Riehl <kriehl@ethz.ch>
+# #######     YEAR :        2025
+# #######     ORGANIZATION: Traffic Engineering Group (SVT),
+# #######                   Institute for Transportation Planning and Systems,
+# #######                   ETH Zürich
+# #############################################################################
+"""
+This code is a stand-in for live detector feeds: it replays the vehicles
+per lane and class recorded by SUMO (Emissions.xml, every 10 seconds, held
+for the seconds in between) as per-second detector snapshots to the
+controller service (ControllerService.py), faster than real time, and
+reports throughput and decision latency. With --replicas the snapshots are
+copied onto replicas of the intersections (each replica shifted in time),
+to load-test hundreds of intersections. Without --port / --unix-socket the
+service runs in-process (decision time only, no socket).
+
+Usage:
+python ControllerService.py --replicas 40 --port 8765 &
+python ControllerReplay.py ../model/logs --replicas 40 --port 8765 --speedup 100
+"""
+
+
+
+
+# #############################################################################
+# ## IMPORTS
+# #############################################################################
+import argparse
+import asyncio
+import json
+import time
+import numpy as np
+from ControllerService import buildService, SERVICE_PORT, STREAM_LIMIT
+from ControllerDefinitions import CONTROLLER_FILE, PRESSURE_MODES
+from DemandModel import determineVehicleClassFromType
+from EmissionCube import LANE_PATTERN
+from EmissionLogs import openLog, findLog
+from VehicleRegistry import VEHICLE_CLASS_CODES
+
+
+
+
+# #############################################################################
+# ## PARAMETERS
+# #############################################################################
+REPLICA_SHIFT = 37 # recorded timesteps between two replicas
+
+
+
+
+# #############################################################################
+# ## METHODS
+# #############################################################################
+
+def loadRecordedSnapshots(file):
+    # [(time, {lane: [car, moc, lwt, hwt, bus]})] per closed <timestep> of an emission log,
+    # the unfinished end of a truncated log is dropped
+    snapshots = []
+    lanes = None
+    with openLog(file) as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith("<vehicle ") and lanes is not None:
+                match = LANE_PATTERN.search(line)
+                if match is None or not line.endswith("/>"):
+                    # unfinished last line
+                    continue
+                class_code = VEHICLE_CLASS_CODES.get(determineVehicleClassFromType(match.group(1)), 0)
+                lanes.setdefault(match.group(2), [0, 0, 0, 0, 0])[class_code] += 1
+            elif line.startswith("<timestep "):
+                t = float(line.split("\"")[1])
+                if line.endswith("/>"):
+                    snapshots.append((t, {}))
+                else:
+                    lanes = {}
+            elif line.startswith("</timestep>") and lanes is not None:
+                snapshots.append((t, lanes))
+                lanes = None
+    return snapshots
+
+def iterDetectorSnapshots(recorded, n_replicas=1, n_seconds=None):
+    # one snapshot per second, the last recorded state held in between; replica r
+    # (lanes prefixed "<r>/") sees the recording shifted by r*REPLICA_SHIFT timesteps
+    first, last = int(recorded[0][0]), int(recorded[-1][0])
+    times = np.asarray([t for t, _ in recorded])
+    n_seconds = last-first+1 if n_seconds is None else n_seconds
+    for second in range(first, first+n_seconds):
+        index = int(np.searchsorted(times, second, side="right"))-1
+        if n_replicas<=1:
+            lanes = recorded[index][1]
+        else:
+            lanes = {}
+            for r_ctr in range(0, n_replicas):
+                prefix = str(r_ctr)+"/"
+                for lane, counts in recorded[(index+r_ctr*REPLICA_SHIFT) % len(recorded)][1].items():
+                    lanes[prefix+lane] = counts
+        yield {"time": second, "lanes": lanes}
+
+def replayInProcess(service, snapshots, interval):
+    round_trips = []
+    start = time.perf_counter()
+    for s_ctr, snapshot in enumerate(snapshots):
+        waitUntil(start+s_ctr*interval)
+        sent = time.perf_counter()
+        # a JSON round trip as on the socket, without the socket
+        json.dumps(service.handle(json.dumps(snapshot)))
+        round_trips.append((time.perf_counter()-sent)*1000)
+    return time.perf_counter()-start, round_trips, service.stats()
+
+async def replayOverSocket(snapshots, interval, host, port, unix_socket):
+    if unix_socket is not None:
+        reader, writer = await asyncio.open_unix_connection(unix_socket, limit=STREAM_LIMIT)
+    else:
+        reader, writer = await asyncio.open_connection(host, port, limit=STREAM_LIMIT)
+    round_trips = []
+    start = time.perf_counter()
+    for s_ctr, snapshot in enumerate(snapshots):
+        delay = start+s_ctr*interval-time.perf_counter()
+        if delay>0:
+            await asyncio.sleep(delay)
+        sent = time.perf_counter()
+        writer.write(json.dumps(snapshot).encode()+b"\n")
+        await writer.drain()
+        await reader.readline()
+        round_trips.append((time.perf_counter()-sent)*1000)
+    duration = time.perf_counter()-start
+    writer.write(b'{"command": "stats"}\n')
+    await writer.drain()
+    stats = json.loads(await reader.readline())
+    writer.close()
+    return duration, round_trips, stats
+
+def waitUntil(moment):
+    delay = moment-time.perf_counter()
+    if delay>0:
+        time.sleep(delay)
+
+
+
+
+# #############################################################################
+# ## MAIN CODE
+# #############################################################################
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay recorded SUMO detector snapshots to the controller service.")
+    parser.add_argument("logs", help="log folder with Emissions.xml (or .xml.gz)")
+    parser.add_argument("--replicas", type=int, default=1, help="copies of the intersections (must match the service)")
+    parser.add_argument("--seconds", type=int, default=None, help="number of replayed seconds (default: whole log)")
+    parser.add_argument("--speedup", type=float, default=0, help="snapshots per wall second relative to real time, 0: as fast as possible")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=None, help="replay to a running service (default: in-process)")
+    parser.add_argument("--unix-socket", default=None)
+    # in-process service
+    parser.add_argument("--controller-config", default=CONTROLLER_FILE)
+    parser.add_argument("--weights", default="1,1,1,1,1")
+    parser.add_argument("--pressure-mode", default="queue", choices=PRESSURE_MODES)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    recorded = loadRecordedSnapshots(findLog(args.logs, "Emissions.xml"))
+    snapshots = list(iterDetectorSnapshots(recorded, args.replicas, args.seconds))
+    interval = 1.0/args.speedup if args.speedup>0 else 0.0
+    print("REPLAYING", len(snapshots), "SNAPSHOTS FOR", args.replicas, "REPLICAS", "AS FAST AS POSSIBLE" if interval==0 else "AT %gx REAL TIME" % args.speedup)
+    if args.port is None and args.unix_socket is None:
+        service = buildService(args.controller_config, args.weights, args.seed, args.pressure_mode, args.replicas)
+        duration, round_trips, stats = replayInProcess(service, snapshots, interval)
+    else:
+        duration, round_trips, stats = asyncio.run(replayOverSocket(snapshots, interval, args.host, args.port or SERVICE_PORT, args.unix_socket))
+    print("SNAPSHOTS PER SECOND", "%.1f" % (len(snapshots)/duration), "(%.0fx REAL TIME)" % (len(snapshots)/duration))
+    print("INTERSECTION DECISIONS PER SECOND", "%.0f" % (len(snapshots)*stats["intersections"]/duration))
+    print("ROUND TRIP P50 %.3f ms  P99 %.3f ms" % (np.percentile(round_trips, 50), np.percentile(round_trips, 99)))
+    print("SERVICE", stats)
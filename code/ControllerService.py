@@ -0,0 +1,273 @@
+# #############################################################################
+# ####### GREEN-PRESSURE - EMISSION-REDUCING SIGNALIZED INTERSECTION MANAGEMENT
+# #######
+# #######     AUTHOR:       Kevin Riehl <kriehl@ethz.ch>
+# #######     YEAR :        2025
+# #######     ORGANIZATION: Traffic Engineering Group (SVT),
+# #######                   Institute for Transportation Planning and Systems,
+# #######                   ETH Zürich
+# #############################################################################
+"""
+This code runs the (Max- / Green-) Pressure signal controllers as a
+standalone service, without SUMO: detector snapshots (per lane, vehicle
+counts per class) are received once per second over a local socket, one
+JSON object per line, and the phases of all intersections are returned.
+
+Snapshot:  {"time": 3600, "lanes": {"E3_1": [car, moc, lwt, hwt, bus], ...}}
+           (counts per class as list, or as {"car": 2, "bus": 1})
+Response:  {"time": 3600, "phases": {"intersection1": 0, ...}, "latency_ms": 0.05}
+Stats:     {"command": "stats"} -> decision latency percentiles (p50, p99)
+Snapshot times are seconds and must increase from one snapshot to the next
+(the controllers count their timers per snapshot). A malformed snapshot, or
+one with a repeated or earlier time, is answered with {"error": ...} and
+changes nothing, so it can be corrected and sent again.
+
+One process serves exactly one detector feed: the controllers keep their
+state across client connections, so a reconnecting feed continues where it
+stopped (with later times), and a new feed needs a new process.
+
+Vehicles on internal junction lanes (":..." lanes) are counted as hidden on
+the edge they come from (from Network.net.xml), as in the simulation.
+
+The controllers are the SignalController objects of the simulation; they
+read the time from and set phases on a stand-in for the TraCI connection.
+Replicas of the intersections can be served for load tests (ControllerReplay.py).
+
+Usage:
+python ControllerService.py --weights 1,2,3,4,5 --port 8765
+"""
+
+
+
+
+# #############################################################################
+# ## IMPORTS
+# #############################################################################
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+from collections import deque
+import numpy as np
+from ControllerDefinitions import loadControllerDefinitions, addDownstreamLanes, loadInternalLaneEdges, CONTROLLER_FILE, NET_FILE, PRESSURE_MODES
+from SignalController import SignalController
+from StateSnapshot import LaneIndex
+from VehicleRegistry import VEHICLE_CLASSES
+
+
+
+
+# #############################################################################
+# ## PARAMETERS
+# #############################################################################
+SERVICE_PORT = 8765
+LATENCY_WINDOW = 100000 # decisions kept for the latency percentiles
+LATENCY_BUDGET_MS = 10.0
+STREAM_LIMIT = 64*1024*1024 # longest snapshot line (hundreds of intersections)
+
+
+
+
+# #############################################################################
+# ## METHODS
+# #############################################################################
+
+class ServiceConnection:
+    """
+    Stand-in for the TraCI connection of the SignalController: the time is
+    the one of the current snapshot, and phase commands are collected.
+    """
+    def __init__(self):
+        self.time = 0.0
+        self.phases = {}
+        self.phase_durations = {}
+        self.simulation = self
+        self.trafficlight = self
+
+    def getTime(self):
+        return self.time
+
+    def setPhase(self, intersection_name, phase):
+        self.phases[intersection_name] = phase
+
+    def setPhaseDuration(self, intersection_name, duration):
+        self.phase_durations[intersection_name] = duration
+
+def replicateInternalEdges(internal_edges, n_replicas):
+    # internal lane -> hidden location ("@"+edge), for every replica
+    if n_replicas<=1:
+        return {lane: "@"+edge for lane, edge in internal_edges.items()}
+    return {str(r_ctr)+"/"+lane: "@"+str(r_ctr)+"/"+edge for r_ctr in range(0, n_replicas) for lane, edge in internal_edges.items()}
+
+def replicateDefinitions(definitions, n_replicas):
+    # copies of the intersections, names and lanes prefixed with "<replica>/"
+    if n_replicas<=1:
+        return definitions
+    replicas = []
+    for r_ctr in range(0, n_replicas):
+        prefix = str(r_ctr)+"/"
+        for definition in definitions:
+            replica = dict(definition)
+            replica["intersection_name"] = prefix+definition["intersection_name"]
+            replica["links"] = {link: [prefix+lane for lane in lanes] for link, lanes in definition["links"].items()}
+            if definition.get("downstream") is not None:
+                replica["downstream"] = {link: [prefix+lane for lane in lanes] for link, lanes in definition["downstream"].items()}
+            replicas.append(replica)
+    return replicas
+
+class ControllerService:
+    def __init__(self, definitions, weights, seed=None, latency_budget_ms=LATENCY_BUDGET_MS, hidden_locations=None):
+        self.connection = ServiceConnection()
+        self.rng = random.Random(seed)
+        self.signal_controllers = [SignalController(**definition, conn=self.connection, rng=self.rng) for definition in definitions]
+        self.lane_index = LaneIndex(self.signal_controllers)
+        for controller in self.signal_controllers:
+            controller.link_slice = self.lane_index.link_slices[controller.intersection_name]
+        self.class_weights = np.asarray([weights[c] for c in VEHICLE_CLASSES], dtype=np.float64)
+        self.hidden_locations = hidden_locations or {}
+        self.started = False
+        self.last_time = None
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.latency_budget_ms = latency_budget_ms
+        self.n_decisions = 0
+        self.n_over_budget = 0
+
+    def parseLanes(self, lanes):
+        # (location per lane, class counts per lane), ValueError for anything malformed
+        if not isinstance(lanes, dict):
+            raise ValueError("lanes must be an object of lane: counts")
+        counts = []
+        for lane, lane_counts in lanes.items():
+            if isinstance(lane_counts, dict):
+                unknown = set(lane_counts)-set(VEHICLE_CLASSES)
+                if len(unknown)>0:
+                    raise ValueError("unknown vehicle classes %s on lane %s" % (sorted(unknown), lane))
+                lane_counts = [lane_counts.get(v, 0) for v in VEHICLE_CLASSES]
+            if not isinstance(lane_counts, list) or len(lane_counts)!=len(VEHICLE_CLASSES) or \
+               not all(isinstance(c, (int, float)) and not isinstance(c, bool) for c in lane_counts):
+                raise ValueError("counts of lane %s must be %d numbers (%s)" % (lane, len(VEHICLE_CLASSES), ", ".join(VEHICLE_CLASSES)))
+            counts.append(lane_counts)
+        counts = np.asarray(counts, dtype=np.float64).reshape(-1, len(VEHICLE_CLASSES))
+        if not (np.isfinite(counts) & (counts>=0)).all():
+            raise ValueError("counts must be finite and not negative")
+        locationOf = self.lane_index.locationOf
+        hidden_locations = self.hidden_locations
+        locations = [locationOf(hidden_locations.get(lane, lane)) for lane in lanes]
+        return locations, counts
+
+    def determineLinkPressures(self, locations, counts):
+        # weighted counts per location, then summed per link like StateSnapshot.computeLinkPressures()
+        if len(locations)==0:
+            return np.zeros(self.lane_index.n_links)
+        lane_weights = counts @ self.class_weights
+        location_weights = np.bincount(locations, weights=lane_weights, minlength=self.lane_index.n_locations)
+        location_weights[self.lane_index.sink] = 0.0
+        link_pressures = self.lane_index.sumLinks(location_weights)
+        if self.lane_index.has_downstream:
+            link_pressures -= self.lane_index.sumDownstream(location_weights)
+        return link_pressures
+
+    def decide(self, snapshot):
+        # the snapshot is checked completely before any controller state changes
+        start = time.perf_counter()
+        if not isinstance(snapshot, dict) or "time" not in snapshot:
+            raise ValueError("a snapshot must be an object with a time")
+        snapshot_time = snapshot["time"]
+        if not isinstance(snapshot_time, (int, float)) or isinstance(snapshot_time, bool) or not math.isfinite(snapshot_time):
+            raise ValueError("snapshot time must be a number of seconds")
+        if self.last_time is not None and snapshot_time<=self.last_time:
+            raise ValueError("snapshot time %s is not after the last one (%s)" % (snapshot_time, self.last_time))
+        locations, counts = self.parseLanes(snapshot.get("lanes", {}))
+        self.connection.time = float(snapshot_time)
+        t_ctr = int(self.connection.time)
+        if not self.started:
+            for controller in self.signal_controllers:
+                controller.current_gt_start = self.connection.time
+            self.started = True
+        due_controllers = [c for c in self.signal_controllers if c.isDue(t_ctr)]
+        link_pressures = None
+        if any(c.needsPressures() for c in due_controllers):
+            link_pressures = self.determineLinkPressures(locations, counts)
+        for controller in due_controllers:
+            controller.doSignalLogic(link_pressures)
+        self.last_time = float(snapshot_time)
+        phases = {c.intersection_name: c.current_phase for c in self.signal_controllers}
+        latency_ms = (time.perf_counter()-start)*1000
+        self.latencies.append(latency_ms)
+        self.n_decisions += 1
+        if latency_ms>self.latency_budget_ms:
+            self.n_over_budget += 1
+        return {"time": snapshot_time, "phases": phases, "latency_ms": latency_ms}
+
+    def stats(self):
+        latencies = np.asarray(self.latencies)
+        return {"decisions": self.n_decisions, "intersections": len(self.signal_controllers),
+                "p50_ms": float(np.percentile(latencies, 50)) if len(latencies)>0 else None,
+                "p99_ms": float(np.percentile(latencies, 99)) if len(latencies)>0 else None,
+                "max_ms": float(latencies.max()) if len(latencies)>0 else None,
+                "budget_ms": self.latency_budget_ms, "over_budget": self.n_over_budget}
+
+    def handle(self, line):
+        message = json.loads(line)
+        if isinstance(message, dict) and message.get("command")=="stats":
+            return self.stats()
+        return self.decide(message)
+
+    async def handleClient(self, reader, writer):
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            try:
+                response = self.handle(line)
+            except (ValueError, KeyError, TypeError, OverflowError) as error:
+                response = {"error": str(error)}
+            writer.write(json.dumps(response).encode()+b"\n")
+            await writer.drain()
+        writer.close()
+
+    async def serve(self, host="127.0.0.1", port=SERVICE_PORT, unix_socket=None):
+        if unix_socket is not None:
+            server = await asyncio.start_unix_server(self.handleClient, path=unix_socket, limit=STREAM_LIMIT)
+        else:
+            server = await asyncio.start_server(self.handleClient, host, port, limit=STREAM_LIMIT)
+        print("CONTROLLER SERVICE FOR", len(self.signal_controllers), "INTERSECTIONS ON", unix_socket or "%s:%d" % (host, port))
+        async with server:
+            await server.serve_forever()
+
+def buildService(controller_file=CONTROLLER_FILE, weights_string="1,1,1,1,1", seed=None, pressure_mode="queue",
+                 n_replicas=1, latency_budget_ms=LATENCY_BUDGET_MS, net_file=NET_FILE):
+    definitions = loadControllerDefinitions(controller_file)
+    if pressure_mode=="downstream":
+        definitions = addDownstreamLanes(definitions, net_file)
+    definitions = replicateDefinitions(definitions, n_replicas)
+    hidden_locations = replicateInternalEdges(loadInternalLaneEdges(net_file), n_replicas)
+    weights = dict(zip(VEHICLE_CLASSES, [float(w) for w in weights_string.split(",")]))
+    return ControllerService(definitions, weights, seed, latency_budget_ms, hidden_locations)
+
+
+
+
+# #############################################################################
+# ## MAIN CODE
+# #############################################################################
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve phase decisions for detector snapshots over a local socket.")
+    parser.add_argument("--controller-config", default=CONTROLLER_FILE)
+    parser.add_argument("--net-file", default=NET_FILE, help="network of the internal junction lanes (and of the downstream lanes)")
+    parser.add_argument("--weights", default="1,1,1,1,1", help="car,moc,lwt,hwt,bus (all 1: Max-Pressure)")
+    parser.add_argument("--pressure-mode", default="queue", choices=PRESSURE_MODES)
+    parser.add_argument("--seed", type=int, default=None, help="controller tie-breaks")
+    parser.add_argument("--replicas", type=int, default=1, help="serve copies of the intersections (load tests)")
+    parser.add_argument("--latency-budget-ms", type=float, default=LATENCY_BUDGET_MS)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=SERVICE_PORT)
+    parser.add_argument("--unix-socket", default=None)
+    args = parser.parse_args()
+    service = buildService(args.controller_config, args.weights, args.seed, args.pressure_mode, args.replicas, args.latency_budget_ms, args.net_file)
+    try:
+        asyncio.run(service.serve(args.host, args.port, args.unix_socket))
+    except KeyboardInterrupt:
+        print(service.stats())
@@ -0,0 +1,276 @@
+# #############################################################################
+# ####### GREEN-PRESSURE - EMISSION-REDUCING SIGNALIZED INTERSECTION MANAGEMENT
+# #######
+# #######     AUTHOR:       Kevin Riehl <kriehl@ethz.ch>
+# #######     YEAR :        2025
+# #######     ORGANIZATION: Traffic Engineering Group (SVT),
+# #######                   Institute for Transportation Planning and Systems,
+# #######                   ETH Zürich
+# #############################################################################
+"""
+This code contains the decision kernel: the state machine of
+SignalController.doSignalLogic() for all intersections at once. States,
+timers, phases and green start times are held in arrays (integer state
+codes), the link pressures of every intersection are gathered into one
+padded matrix, and one update per control tick advances every due
+intersection with masked array operations. The update runs the same
+operations on preallocated arrays in every tick, however many intersections
+decide; its cost still grows with the array lengths (Benchmark_DecisionKernel.py).
+
+Ties between the highest pressures are broken by a seeded stream per
+intersection (splitmix64), so that decisions do not depend on how many
+other intersections drew before. TieBreakStream is the same stream as an
+rng for a SignalController, which makes both produce identical decisions
+(Validate_DecisionKernel.py).
+"""
+
+
+
+
+# #############################################################################
+# ## IMPORTS
+# #############################################################################
+import random
+import numpy as np
+
+
+
+
+# #############################################################################
+# ## PARAMETERS
+# #############################################################################
+START, CHECK_PRESSURES, WAIT, NEXT_PHASE, TRANSITION = 0, 1, 2, 3, 4
+STATE_NAMES = ["start", "check_pressures", "wait", "next_phase", "transition"]
+STATE_CODES = {name: code for code, name in enumerate(STATE_NAMES)}
+MASK64 = (1<<64)-1
+GAMMA = 0x9E3779B97F4A7C15
+MIX_CONSTANTS = [np.uint64(c) for c in [30, 0xBF58476D1CE4E5B9, 27, 0x94D049BB133111EB, 31, 11]]
+# next state per state code and outcome (CHECK_PRESSURES: a link has more pressure, WAIT: maximum green over)
+TRANSITIONS = np.asarray([[CHECK_PRESSURES, CHECK_PRESSURES], [WAIT, NEXT_PHASE], [CHECK_PRESSURES, NEXT_PHASE],
+                          [TRANSITION, TRANSITION], [START, START]], dtype=np.int64)
+
+
+
+
+# #############################################################################
+# ## METHODS
+# #############################################################################
+
+def mix64(z):
+    # splitmix64 finalizer, on Python ints
+    z = ((z^(z>>30))*0xBF58476D1CE4E5B9) & MASK64
+    z = ((z^(z>>27))*0x94D049BB133111EB) & MASK64
+    return z^(z>>31)
+
+def mix64Array(z):
+    # splitmix64 finalizer, on uint64 arrays (wrapping arithmetic)
+    s30, m1, s27, m2, s31, _ = MIX_CONSTANTS
+    z = (z^(z>>s30))*m1
+    z = (z^(z>>s27))*m2
+    return z^(z>>s31)
+
+def streamStart(seed, index):
+    return mix64((seed+(index+1)*GAMMA) & MASK64)
+
+class TieBreakStream:
+    # the kernel's tie-break stream of one intersection, usable as SignalController rng
+    def __init__(self, seed, index):
+        self.state = streamStart(seed & MASK64, index)
+
+    def random(self):
+        self.state = (self.state+GAMMA) & MASK64
+        return (mix64(self.state)>>11)*2.0**-53
+
+    def choice(self, sequence):
+        return sequence[int(self.random()*len(sequence))]
+
+class DecisionKernel:
+    def __init__(self, names, link_slices, phases, timings, multipliers=None, seed=None):
+        # link_slices: (start, end) of every intersection in the link pressure vector; link arrays
+        # are (link x intersection), so that reductions over the links run along contiguous rows;
+        # padding slots point behind the link pressures, at a -inf sentinel
+        self.names = list(names)
+        self.n = len(self.names)
+        n_links = np.asarray([end-start for start, end in link_slices], dtype=np.int64)
+        self.n_links_max = int(n_links.max()) if self.n>0 else 0
+        self.n_links_total = int(max([end for _, end in link_slices], default=0))
+        self.columns = np.arange(self.n_links_max)[:, None]
+        self.link_valid = self.columns<n_links[None, :]
+        self.starts = np.asarray([start for start, _ in link_slices], dtype=np.int64)
+        self.link_index = np.where(self.link_valid, self.starts[None, :]+self.columns, self.n_links_total)
+        self.link_pressures = np.full(self.n_links_total+1, -np.inf)
+        self.link_factor = np.ones((self.n_links_max, self.n))
+        for i, factors in enumerate(multipliers or []):
+            for l_ctr, factor in enumerate(factors or []):
+                self.link_factor[l_ctr, i] = factor
+        self.has_factors = bool((self.link_factor!=1.0).any())
+        self.t_a = np.asarray([t["T_A"] for t in timings], dtype=np.int64)
+        self.t_l = np.asarray([t["T_L"] for t in timings], dtype=np.int64)
+        self.g_t_min = np.asarray([t["G_T_MIN"] for t in timings], dtype=np.int64)
+        self.g_t_max = np.asarray([t["G_T_MAX"] for t in timings], dtype=np.int64)
+        self.green_max = self.g_t_max.astype(np.float64)
+        self.cadence = np.asarray([t["cadence"] for t in timings], dtype=np.int64)
+        # with one cadence for all, the due masks are fixed
+        self.common_cadence = int(self.cadence[0]) if self.n>0 and (self.cadence==self.cadence[0]).all() else None
+        self.all_due = np.ones(self.n, dtype=bool)
+        self.none_due = np.zeros(self.n, dtype=bool)
+        # timer threshold of a decision per intersection and state code (CHECK_PRESSURES, NEXT_PHASE: every tick)
+        always = np.full(self.n, np.iinfo(np.int64).min)
+        self.thresholds = np.stack([self.g_t_min, always, self.t_a, always, self.t_l], axis=1).ravel()
+        self.threshold_base = np.arange(self.n)*len(STATE_NAMES)
+        self.state = np.full(self.n, START, dtype=np.int64)
+        self.threshold = self.g_t_min.copy()
+        self.timer = np.full(self.n, -1, dtype=np.int64)
+        self.phase = np.asarray(phases, dtype=np.int64)
+        self.next_phase = np.full(self.n, -1, dtype=np.int64)
+        self.gt_start = np.zeros(self.n)
+        seed = random.getrandbits(64) if seed is None else seed & MASK64
+        self.streams = np.asarray([streamStart(seed, i) for i in range(self.n)], dtype=np.uint64)
+        # step() evaluates every intersection and applies the result where one decides, so that
+        # its work does not depend on how many decide; all its intermediate arrays live here
+        self.state_codes = np.arange(len(STATE_NAMES))[:, None]
+        self.in_state = np.zeros((len(STATE_NAMES), self.n), dtype=bool)
+        self.acting = np.zeros((len(STATE_NAMES), self.n), dtype=bool)
+        self.deciding = np.zeros(self.n, dtype=bool)
+        self.due_remainder = np.zeros(self.n, dtype=np.int64)
+        self.due = np.zeros(self.n, dtype=bool)
+        self.pressures = np.zeros((self.n_links_max, self.n))
+        self.pressures_flat = self.pressures.reshape(-1)
+        self.tie_rank = np.zeros((self.n_links_max, self.n))
+        self.before_pick = np.zeros((self.n_links_max, self.n), dtype=bool)
+        self.current = np.zeros(self.n, dtype=np.int64)
+        self.current_index = np.zeros(self.n, dtype=np.int64)
+        self.rows = np.arange(self.n)
+        self.current_pressure = np.zeros(self.n)
+        self.best_pressure = np.zeros(self.n)
+        self.chosen = np.zeros(self.n, dtype=np.int64)
+        self.mixed = np.zeros(self.n, dtype=np.uint64)
+        self.shifted = np.zeros(self.n, dtype=np.uint64)
+        self.draws = np.zeros(self.n)
+        self.green_time = np.zeros(self.n)
+        self.outcome = np.zeros(self.n, dtype=bool)
+        self.outcome_wait = np.zeros(self.n, dtype=bool)
+        self.transition_index = np.zeros(self.n, dtype=np.int64)
+        self.new_state = np.zeros(self.n, dtype=np.int64)
+
+    @classmethod
+    def fromControllers(cls, controllers, seed=None):
+        # takes over the configuration and the current state of SignalController objects
+        multipliers = [[(c.multiplier or {}).get(link, 1.0) for link in c.links] for c in controllers]
+        timings = [{"T_A": c.t_a, "T_L": c.t_l, "G_T_MIN": c.g_t_min, "G_T_MAX": c.g_t_max, "cadence": c.cadence} for c in controllers]
+        kernel = cls([c.intersection_name for c in controllers], [c.link_slice for c in controllers],
+                     [c.current_phase for c in controllers], timings, multipliers, seed)
+        kernel.state[:] = [STATE_CODES[c.current_state] for c in controllers]
+        kernel.timer[:] = [c.timer for c in controllers]
+        kernel.next_phase[:] = [c.next_phase for c in controllers]
+        kernel.gt_start[:] = [c.current_gt_start for c in controllers]
+        kernel.updateThresholds()
+        return kernel
+
+    def exportState(self, controllers):
+        # writes the current state back into SignalController objects
+        for i, c in enumerate(controllers):
+            c.current_state = STATE_NAMES[self.state[i]]
+            c.timer = int(self.timer[i])
+            c.current_phase = int(self.phase[i])
+            c.next_phase = int(self.next_phase[i])
+            c.current_gt_start = float(self.gt_start[i])
+
+    def isDue(self, t_ctr):
+        # the returned mask must not be modified
+        if self.common_cadence is not None:
+            return self.all_due if t_ctr % self.common_cadence==0 else self.none_due
+        np.remainder(t_ctr, self.cadence, out=self.due_remainder)
+        return np.equal(self.due_remainder, 0, out=self.due)
+
+    def needsPressures(self):
+        return (self.state==CHECK_PRESSURES) | (self.state==NEXT_PHASE)
+
+    def drawTieBreaks(self, where):
+        # advances the streams of the intersections in where, draws into self.draws
+        np.add(self.streams, np.uint64(GAMMA), out=self.streams, where=where)
+        s30, m1, s27, m2, s31, s11 = MIX_CONSTANTS
+        np.right_shift(self.streams, s30, out=self.shifted)
+        np.bitwise_xor(self.streams, self.shifted, out=self.mixed)
+        np.multiply(self.mixed, m1, out=self.mixed)
+        np.right_shift(self.mixed, s27, out=self.shifted)
+        np.bitwise_xor(self.mixed, self.shifted, out=self.mixed)
+        np.multiply(self.mixed, m2, out=self.mixed)
+        np.right_shift(self.mixed, s31, out=self.shifted)
+        np.bitwise_xor(self.mixed, self.shifted, out=self.mixed)
+        np.right_shift(self.mixed, s11, out=self.mixed)
+        np.multiply(self.mixed, 2.0**-53, out=self.draws)
+        return self.draws
+
+    def updateThresholds(self):
+        # timer threshold of the current state (always reached in CHECK_PRESSURES / NEXT_PHASE)
+        np.add(self.threshold_base, self.state, out=self.transition_index)
+        np.take(self.thresholds, self.transition_index, out=self.threshold, mode="clip")
+
+    def step(self, link_pressures, sim_time, due):
+        # one control tick of the due intersections, returns the phases of all intersections;
+        # every tick runs the same array operations over all intersections (and link slots),
+        # whatever number decides, and their results are applied where an intersection decides
+        if due is self.all_due:
+            np.add(self.timer, self.cadence, out=self.timer)
+        else:
+            np.add(self.timer, self.cadence, out=self.timer, where=due)
+        np.greater_equal(self.timer, self.threshold, out=self.deciding)
+        np.logical_and(self.deciding, due, out=self.deciding)
+        np.equal(self.state, self.state_codes, out=self.in_state)
+        np.logical_and(self.in_state, self.deciding, out=self.acting)
+        switching, ending = self.acting[NEXT_PHASE], self.acting[TRANSITION]
+        # CHECK_PRESSURES: switch if any link has more pressure than the current one,
+        # that is, if another link has more pressure
+        self.link_pressures[:self.n_links_total] = link_pressures
+        np.take(self.link_pressures, self.link_index, out=self.pressures, mode="clip")
+        if self.has_factors:
+            np.multiply(self.pressures, self.link_factor, out=self.pressures)
+        np.right_shift(self.phase, 1, out=self.current)
+        np.multiply(self.current, self.n, out=self.current_index)
+        np.add(self.current_index, self.rows, out=self.current_index)
+        np.take(self.pressures_flat, self.current_index, out=self.current_pressure, mode="clip")
+        np.put(self.pressures_flat, self.current_index, -np.inf, mode="clip")
+        np.max(self.pressures, axis=0, out=self.best_pressure)
+        np.less(self.current_pressure, self.best_pressure, out=self.outcome)
+        np.logical_and(self.outcome, self.in_state[CHECK_PRESSURES], out=self.outcome)
+        # NEXT_PHASE: highest pressure among the other links, ties broken by the stream, yellow first;
+        # the pick-th tie (from 0) is the link slot after all slots with at most pick ties up to them
+        np.equal(self.pressures, self.best_pressure, out=self.tie_rank, casting="unsafe")
+        for l_ctr in range(1, self.n_links_max):
+            np.add(self.tie_rank[l_ctr-1], self.tie_rank[l_ctr], out=self.tie_rank[l_ctr])
+        draws = self.drawTieBreaks(switching)
+        np.multiply(draws, self.tie_rank[-1], out=draws)
+        np.less_equal(self.tie_rank, draws, out=self.before_pick)
+        np.add.reduce(self.before_pick, axis=0, out=self.chosen)
+        np.left_shift(self.chosen, 1, out=self.chosen)
+        np.copyto(self.next_phase, self.chosen, where=switching)
+        np.add(self.phase, switching, out=self.phase)
+        # WAIT: switch once the maximum green is over, else check again
+        np.subtract(sim_time, self.gt_start, out=self.green_time)
+        np.greater(self.green_time, self.green_max, out=self.outcome_wait)
+        np.logical_and(self.outcome_wait, self.in_state[WAIT], out=self.outcome_wait)
+        np.logical_or(self.outcome, self.outcome_wait, out=self.outcome)
+        # TRANSITION: yellow over, the next green starts
+        np.copyto(self.phase, self.next_phase, where=ending)
+        np.copyto(self.next_phase, -1, where=ending)
+        np.copyto(self.gt_start, sim_time, where=ending)
+        np.multiply(self.state, 2, out=self.transition_index)
+        np.add(self.transition_index, self.outcome, out=self.transition_index)
+        np.take(TRANSITIONS, self.transition_index, out=self.new_state, mode="clip")
+        np.copyto(self.state, self.new_state, where=self.deciding)
+        np.copyto(self.timer, -1, where=self.deciding)
+        self.updateThresholds()
+        return self.phase
+
+    def quietSeconds(self, t_ctr):
+        # per intersection, seconds after t_ctr until its next tick with a decision (SignalController.quietSeconds)
+        thresholds = np.select([self.state==START, self.state==WAIT, self.state==TRANSITION], [self.g_t_min, self.t_a, self.t_l], 0)
+        quiet = (self.state==START) | (self.state==WAIT) | (self.state==TRANSITION)
+        ticks = np.where(quiet, np.maximum(0, -(-(thresholds-self.timer)//self.cadence)-1), 0)
+        next_tick = (t_ctr//self.cadence+1)*self.cadence
+        return next_tick + ticks*self.cadence - t_ctr - 1
+
+    def skipSeconds(self, t_ctr, seconds):
+        # ticks falling into the skipped seconds only count the timer up
+        self.timer += ((t_ctr+seconds)//self.cadence - t_ctr//self.cadence)*self.cadence
@@ -0,0 +1,105 @@
+# #############################################################################
+# ####### GREEN-PRESSURE - EMISSION-REDUCING SIGNALIZED INTERSECTION MANAGEMENT
+# #######
+# #######     AUTHOR:       Kevin Riehl <kriehl@ethz.ch>
+# #######     YEAR :        2025
+# #######     ORGANIZATION: Traffic Engineering Group (SVT),
+# #######                   Institute for Transportation Planning and Systems,
+# #######                   ETH Zürich
+# #############################################################################
+"""
+This code contains the demand model (vehicle class shares, truck bans,
+emission class population) shared by the runtime spawning in RunSimulation.py
+and the demand pre-compilation in CompileDemand.py.
+"""
+
+
+
+
+# #############################################################################
+# ## IMPORTS
+# #############################################################################
+import pandas as pd
+import numpy as np
+
+
+
+
+# #############################################################################
+# ## PARAMETERS
+# #############################################################################
+VEHICLE_CLASS_SHARES = {"car": 0.81, "moc": 0.082, "lwt": 0.046, "hwt": 0.062}
+sumo_vehicle_types = {
+    "car": "sumo_car",
+    "moc": "sumo_motorcycle",
+    "lwt": "sumo_transporter",
+    "hwt": "sumo_truck",
+    "bus": "sumo_bus",
+}
+vehicle_classes_by_type = {v: k for k, v in sumo_vehicle_types.items()}
+
+
+
+
+# #############################################################################
+# ## METHODS
+# #############################################################################
+
+def loadEmissionClassesFromFile(file="../data/Emission_VehiclePopulation.xlsx"):
+    df_emissions_car = pd.read_excel(file, sheet_name="hb_passenger_car")
+    df_emissions_moc = pd.read_excel(file, sheet_name="hb_motor_cycle")
+    df_emissions_lwt = pd.read_excel(file, sheet_name="hb_transporter")
+    df_emissions_hwt = pd.read_excel(file, sheet_name="hb_truck")
+    df_emissions_bus = pd.read_excel(file, sheet_name="hb_bus")
+    rel_columns = ["fleet_share_2022", "sumo_emission_class"]
+    df_emissions_car = df_emissions_car[rel_columns]
+    df_emissions_moc = df_emissions_moc[rel_columns]
+    df_emissions_lwt = df_emissions_lwt[rel_columns]
+    df_emissions_hwt = df_emissions_hwt[rel_columns]
+    df_emissions_bus = df_emissions_bus[rel_columns]
+    emission_model = {"car": df_emissions_car,
+                      "moc": df_emissions_moc,
+                      "lwt": df_emissions_lwt,
+                      "hwt": df_emissions_hwt,
+                      "bus": df_emissions_bus}
+    return emission_model
+
+def getRandomEmissionClass(vehicle_class, emission_model, rng=np.random):
+    probs = [v for v in emission_model[vehicle_class]["fleet_share_2022"]]
+    probs = [p/sum(probs) for p in probs]
+    vals  = ["HBEFA4/"+v for v in emission_model[vehicle_class]["sumo_emission_class"]]
+    random_emission_class = rng.choice(vals, size=1, p=probs)[0]
+    return random_emission_class
+
+def getRandomVehicleClass(no_truck=False, rng=np.random):
+    probs = list(VEHICLE_CLASS_SHARES.values())
+    vals = list(VEHICLE_CLASS_SHARES.keys())
+    random_vehicle_class = rng.choice(vals, size=1, p=probs)[0]
+    while no_truck and random_vehicle_class=="hwt":
+        random_vehicle_class = rng.choice(vals, size=1, p=probs)[0]
+    return random_vehicle_class
+
+def determineWhetherTruckBannedRoute(desired_route):
+    route_entrance = desired_route.split("_")[1]
+    route_exit = desired_route.split("_")[2]
+    selected_entrances = ["E21", "E22", "E24", "E25", "E20", "E3", "E4", "E5", "E1", "E2", "E6", "E7", "E12", "E13"]
+    selected_exits = ["A1", "A2", "A3", "A16", "A18", "A15"]
+    if route_entrance in selected_entrances and route_exit in selected_exits:
+        return False
+    return True
+
+def sampleVehicleClasses(rng, n, no_truck=False):
+    # vectorized getRandomVehicleClass: rejecting trucks equals renormalizing without them
+    vals = [c for c in VEHICLE_CLASS_SHARES if not (no_truck and c=="hwt")]
+    probs = np.asarray([VEHICLE_CLASS_SHARES[c] for c in vals])
+    return rng.choice(vals, size=n, p=probs/probs.sum())
+
+def sampleEmissionClasses(rng, vehicle_class, n, emission_model):
+    probs = np.asarray(emission_model[vehicle_class]["fleet_share_2022"], dtype=float)
+    vals  = np.asarray(["HBEFA4/"+v for v in emission_model[vehicle_class]["sumo_emission_class"]])
+    return rng.choice(vals, size=n, p=probs/probs.sum())
+
+def determineVehicleClassFromType(type_id):
+    # "sumo_car", "sumo_car@VEH_5" (TraCI emission override) and
+    # "sumo_car@PC_petrol_Euro-5" (compiled demand) all map to "car"
+    return vehicle_classes_by_type.get(type_id.split("@")[0])
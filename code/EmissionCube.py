@@ -0,0 +1,202 @@
+# #############################################################################
+# ####### GREEN-PRESSURE - EMISSION-REDUCING SIGNALIZED INTERSECTION MANAGEMENT
+# #######
+# #######     AUTHOR:       Kevin Riehl <kriehl@ethz.ch>
+# #######     YEAR :        2025
+# #######     ORGANIZATION: Traffic Engineering Group (SVT),
+# #######                   Institute for Transportation Planning and Systems,
+# #######                   ETH Zürich
+# #############################################################################
+"""
+This code aggregates Emissions.xml in a single streaming pass into a compact
+emission cube (time bucket x intersection x vehicle class x pollutant).
+Vehicles are assigned to an intersection if they are on one of its link lanes
+(model/SignalControllers.json) or inside its junction, everything else goes
+to "other". The cube is stored as .npy next to a .json file with the labels,
+and can be opened memory-mapped to slice across runs without re-parsing.
+"""
+
+
+
+
+# #############################################################################
+# ## IMPORTS
+# #############################################################################
+import argparse
+import json
+import re
+from datetime import datetime, timedelta
+import xml.etree.ElementTree as ET
+import numpy as np
+import pandas as pd
+from ControllerDefinitions import loadControllerDefinitions, determineLaneIntersections
+from DemandModel import determineVehicleClassFromType
+from EmissionLogs import parsePollutants, openLog, findLog, POLLUTANT_COLUMNS, GOAL_WEIGHTS
+from VehicleRegistry import VEHICLE_CLASSES, VEHICLE_CLASS_CODES
+
+
+
+
+# #############################################################################
+# ## PARAMETERS
+# #############################################################################
+BUCKET_SECONDS = 900
+START_CLOCK = "09:15:00" # simulation time 0, see RunSimulation.py
+OTHER = "other"
+NET_FILE = "../model/Network.net.xml"
+LANE_PATTERN = re.compile(r' type="([^"]*)".* lane="([^"]*)"')
+
+
+
+
+# #############################################################################
+# ## METHODS
+# #############################################################################
+
+def determineJunctionIntersections(net_file=NET_FILE):
+    # junction (internal lane prefix) -> intersection, from the signalized connections' via lanes
+    junction_intersections = {}
+    for _, elem in ET.iterparse(net_file):
+        if elem.tag=="connection" and "tl" in elem.attrib and "via" in elem.attrib:
+            junction = elem.attrib["via"].rsplit("_", 2)[0]
+            junction_intersections[junction] = elem.attrib["tl"]
+        elem.clear()
+    return junction_intersections
+
+class LaneMapper:
+    def __init__(self, intersections, lane_intersections, junction_intersections):
+        self.index = {name: i for i, name in enumerate(intersections)}
+        self.other = len(intersections)
+        self.lane_intersections = lane_intersections
+        self.junction_intersections = junction_intersections
+        self.cache = {}
+
+    def intersectionOf(self, lane):
+        if lane not in self.cache:
+            if lane.startswith(":"):
+                name = self.junction_intersections.get(lane.rsplit("_", 2)[0])
+            else:
+                name = self.lane_intersections.get(lane)
+            self.cache[lane] = self.index.get(name, self.other)
+        return self.cache[lane]
+
+def accumulateCubeLines(lines, lane_mapper, n_intersections, buckets, bucket_seconds=BUCKET_SECONDS):
+    # adds the vehicles of the log lines to buckets {bucket: intersection x class x pollutant};
+    # a timestep counts once it is closed, so the unfinished end of a truncated log is dropped
+    shape = (n_intersections+1, len(VEHICLE_CLASSES), len(POLLUTANT_COLUMNS))
+    timestep = None
+    b = None
+    for line in lines:
+        line = line.strip()
+        if line.startswith("<vehicle "):
+            if timestep is None:
+                continue
+            match = LANE_PATTERN.search(line)
+            if match is None or not line.endswith("/>"):
+                # unfinished last line
+                continue
+            vehicle_class = determineVehicleClassFromType(match.group(1))
+            class_code = VEHICLE_CLASS_CODES.get(vehicle_class, 0) # unknown types count as cars
+            timestep[lane_mapper.intersectionOf(match.group(2)), class_code] += parsePollutants(line)
+        elif line.startswith("<timestep "):
+            b = int(float(line.split("\"")[1])//bucket_seconds)
+            if line.endswith("/>"):
+                if b not in buckets:
+                    buckets[b] = np.zeros(shape)
+                timestep = None
+            else:
+                timestep = np.zeros(shape)
+        elif line.startswith("</timestep>") and timestep is not None:
+            buckets[b] = buckets[b]+timestep if b in buckets else timestep
+            timestep = None
+    return buckets
+
+def cubeFromBuckets(buckets, n_intersections):
+    n_buckets = max(buckets)+1 if len(buckets)>0 else 0
+    cube = np.zeros((n_buckets, n_intersections+1, len(VEHICLE_CLASSES), len(POLLUTANT_COLUMNS)))
+    for b, values in buckets.items():
+        cube[b] = values
+    return cube
+
+def buildEmissionCube(file, lane_mapper, n_intersections, bucket_seconds=BUCKET_SECONDS):
+    with openLog(file) as f:
+        buckets = accumulateCubeLines(f, lane_mapper, n_intersections, {}, bucket_seconds)
+    return cubeFromBuckets(buckets, n_intersections)
+
+def saveEmissionCube(cube, labels, target_file):
+    # target_file.npy holds the cube, target_file.json its axis labels
+    np.save(target_file+".npy", cube)
+    f = open(target_file+".json", "w")
+    json.dump(labels, f, indent=1)
+    f.close()
+
+def loadEmissionCube(target_file, mmap_mode="r"):
+    cube = np.load(target_file+".npy", mmap_mode=mmap_mode)
+    f = open(target_file+".json", "r")
+    labels = json.load(f)
+    f.close()
+    return cube, labels
+
+def buildLaneMapper(controller_file="../model/SignalControllers.json", net_file=NET_FILE):
+    definitions = loadControllerDefinitions(controller_file)
+    intersections = [d["intersection_name"] for d in definitions]
+    return intersections, LaneMapper(intersections, determineLaneIntersections(definitions), determineJunctionIntersections(net_file))
+
+def cubeLabels(cube, intersections, bucket_seconds, source):
+    start = datetime.strptime(START_CLOCK, "%H:%M:%S")
+    return {
+        "bucket_seconds": bucket_seconds,
+        "buckets": [(start+timedelta(seconds=b*bucket_seconds)).strftime("%H:%M") for b in range(cube.shape[0])],
+        "intersections": intersections+[OTHER],
+        "classes": VEHICLE_CLASSES,
+        "pollutants": POLLUTANT_COLUMNS,
+        "source": source,
+    }
+
+def aggregateEmissions(folder="../model/logs", target_file=None, bucket_seconds=BUCKET_SECONDS,
+                       controller_file="../model/SignalControllers.json", net_file=NET_FILE):
+    intersections, lane_mapper = buildLaneMapper(controller_file, net_file)
+    source = findLog(folder, "Emissions.xml")
+    cube = buildEmissionCube(source, lane_mapper, len(intersections), bucket_seconds)
+    labels = cubeLabels(cube, intersections, bucket_seconds, source)
+    if target_file is None:
+        target_file = folder+"/"+"EmissionCube"
+    saveEmissionCube(cube, labels, target_file)
+    return cube, labels
+
+def cubeGoal(cube):
+    # weighted emission goal along the last (pollutant) axis, as in EmissionLogs.addEmissionGoal
+    return np.tensordot(cube, np.asarray([GOAL_WEIGHTS[p] for p in POLLUTANT_COLUMNS]), axes=([-1], [0]))
+
+def cubeTable(cube, labels, begin="00:00", end="23:59", pollutant="goal"):
+    # intersection x class table for buckets starting in [begin, end)
+    selected = [b for b, clock in enumerate(labels["buckets"]) if begin<=clock<end]
+    window = np.asarray(cube[selected]).sum(axis=0)
+    if pollutant=="goal":
+        values = cubeGoal(window)
+    else:
+        values = window[..., labels["pollutants"].index(pollutant)]
+    return pd.DataFrame(values, index=labels["intersections"], columns=labels["classes"])
+
+
+
+
+# #############################################################################
+# ## MAIN CODE
+# #############################################################################
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Aggregate Emissions.xml into a time x intersection x class x pollutant cube.")
+    parser.add_argument("folders", nargs="+", help="log folders containing Emissions.xml")
+    parser.add_argument("--bucket-seconds", type=int, default=BUCKET_SECONDS)
+    parser.add_argument("--controllers", default="../model/SignalControllers.json")
+    parser.add_argument("--net-file", default=NET_FILE)
+    parser.add_argument("--window", nargs=2, default=None, metavar=("BEGIN", "END"),
+                        help="optional, print the table for a clock window, e.g. 17:00 18:00")
+    parser.add_argument("--pollutant", default="goal", choices=["goal"]+POLLUTANT_COLUMNS)
+    args = parser.parse_args()
+    for folder in args.folders:
+        cube, labels = aggregateEmissions(folder, bucket_seconds=args.bucket_seconds,
+                                          controller_file=args.controllers, net_file=args.net_file)
+        print("SAVED", folder+"/"+"EmissionCube.npy", cube.shape)
+        if args.window is not None:
+            print(cubeTable(cube, labels, args.window[0], args.window[1], args.pollutant).round(2).to_string())
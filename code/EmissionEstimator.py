@@ -0,0 +1,261 @@
+# #############################################################################
+# ####### GREEN-PRESSURE - EMISSION-REDUCING SIGNALIZED INTERSECTION MANAGEMENT
+# #######
+# #######     AUTHOR:       Kevin Riehl <kriehl@ethz.ch>
+# #######     YEAR :        2025
+# #######     ORGANIZATION: Traffic Engineering Group (SVT),
+# #######                   Institute for Transportation Planning and Systems,
+# #######                   ETH Zürich
+# #############################################################################
+"""
+This code estimates CO2, CO, HC, NOx and PMx offline from recorded
+trajectories, so runs need neither the SUMO emission device nor its logs.
+The trajectories hold speed, acceleration, slope and emission class per
+vehicle and second (RunSimulation.py --record-trajectory). The estimate uses
+the polynomial form of SUMO's HBEFA4 model (SUMO 1.19), in mg/s:
+
+    E = max(0, c0 + c1*v + c2*v^2 + c3*v^3 + a*(c4 + c5*v + c6*v^2 + c7*v^3)) / 3.6
+
+with v in km/h and a in m/s^2. The model ignores the slope, and SUMO sets
+emissions to zero while a vehicle decelerates more than it would coasting
+(about 0.1 m/s^2 plus 0.013 m/s^2 per m/s, for the default vehicle of
+emissionsDrivingCycle); the estimate does not, it clamps at zero only.
+All rows of one emission class are evaluated in one matrix product.
+
+The coefficients per HBEFA4 class and pollutant are calibrated once with
+SUMO's emissionsDrivingCycle tool, on a grid of speeds and accelerations,
+for all classes in Emission_VehiclePopulation.xlsx. They are stored in
+data/HBEFA4_Coefficients.csv:
+python EmissionEstimator.py --calibrate --driving-cycle-path ./sumo-1.19.0/bin/emissionsDrivingCycle.exe
+
+Estimate a run (optionally with other pollutant weights for the goal), and
+validate it against the Emissions.xml of the same run. The trajectory is
+sampled every 10 seconds, as by the emission device:
+python EmissionEstimator.py --trajectory ../model/logs/Trajectory.npy --logs ../model/logs
+
+Without trajectories, --log-samples evaluates the coefficients on the
+vehicle samples of an emission log, at acceleration 0 as the log holds none.
+Only standing vehicles are exact then: moving ones are underestimated, and
+coasting ones (logged as 0) overestimated, see README.md:
+python EmissionEstimator.py --log-samples ../model/logs
+"""
+
+
+
+
+# #############################################################################
+# ## IMPORTS
+# #############################################################################
+import os
+import argparse
+import re
+import subprocess
+import numpy as np
+import pandas as pd
+from EmissionLogs import addEmissionGoal, determineEmissions, findLog, openLog, POLLUTANT_COLUMNS, GOAL_WEIGHTS
+from TrajectoryRecorder import loadTrajectoryChunks
+
+
+
+
+# #############################################################################
+# ## PARAMETERS
+# #############################################################################
+COEFFICIENT_FILE = "../data/HBEFA4_Coefficients.csv"
+CALIBRATION_FOLDER = "../data/hbefa4_calibration"
+N_TERMS = 8
+LOG_PERIOD = 10 # device.emissions.period of the SUMO configuration
+# output columns of emissionsDrivingCycle (mg/s), and the grid it is evaluated on
+DRIVING_CYCLE_COLUMNS = ["time", "speed", "accel", "slope", "co", "co2", "hc", "PMx", "NOx", "fuel", "electricity"]
+CALIBRATION_SPEEDS = np.arange(0.0, 40.5, 1.0) # m/s
+CALIBRATION_ACCELS = np.arange(-3.0, 3.25, 0.25) # m/s^2
+LOG_SAMPLE_PATTERN = re.compile(r' eclass="([^"]*)" CO2="([^"]*)" CO="([^"]*)" HC="([^"]*)" NOx="([^"]*)" PMx="([^"]*)".* speed="([^"]*)"')
+
+
+
+
+# #############################################################################
+# ## METHODS
+# #############################################################################
+
+def designMatrix(speed, accel):
+    # terms of the HBEFA4 polynomial per row
+    kmh = np.asarray(speed, dtype=np.float64)*3.6
+    speed_terms = np.stack([np.ones_like(kmh), kmh, kmh*kmh, kmh*kmh*kmh], axis=-1)
+    return np.concatenate([speed_terms, np.asarray(accel, dtype=np.float64)[..., None]*speed_terms], axis=-1)
+
+def evaluateEmissions(coefficients, class_index, speed, accel):
+    # mg/s per row and pollutant; rows of unknown classes (index -1) are NaN
+    terms = designMatrix(speed, accel)
+    class_index = np.asarray(class_index)
+    emissions = np.full((len(class_index), coefficients.shape[1]), np.nan)
+    order = np.argsort(class_index, kind="stable")
+    classes, starts = np.unique(class_index[order], return_index=True)
+    for c_ctr, c in enumerate(classes):
+        if c<0:
+            continue
+        rows = order[starts[c_ctr]:starts[c_ctr+1] if c_ctr+1<len(starts) else len(order)]
+        emissions[rows] = terms[rows] @ coefficients[c].T
+    return np.maximum(emissions, 0.0)/3.6
+
+def loadCoefficients(file=COEFFICIENT_FILE):
+    # emission class names, and coefficients [class, pollutant, term]
+    df_coefficients = pd.read_csv(file)
+    eclasses = list(dict.fromkeys(df_coefficients["eclass"]))
+    coefficients = np.zeros((len(eclasses), len(POLLUTANT_COLUMNS), N_TERMS))
+    class_of = {eclass: c_ctr for c_ctr, eclass in enumerate(eclasses)}
+    for row in df_coefficients.itertuples(index=False):
+        coefficients[class_of[row.eclass], POLLUTANT_COLUMNS.index(row.pollutant)] = [getattr(row, "c"+str(t)) for t in range(0, N_TERMS)]
+    return eclasses, coefficients
+
+def classIndices(names, eclasses):
+    # index into the coefficient table per name, -1 if not calibrated
+    class_of = {eclass: c_ctr for c_ctr, eclass in enumerate(eclasses)}
+    return np.asarray([class_of.get(name, -1) for name in names], dtype=np.int64)
+
+def writeCalibrationCycle(file):
+    # one row per (speed, acceleration) grid point: time;velocity;acceleration
+    speeds, accels = np.meshgrid(CALIBRATION_SPEEDS, CALIBRATION_ACCELS, indexing="ij")
+    with open(file, "w") as f:
+        for t_ctr, (speed, accel) in enumerate(zip(speeds.ravel(), accels.ravel())):
+            f.write("%d;%.2f;%.2f\n" % (t_ctr, speed, accel))
+
+def readDrivingCycleOutput(file):
+    rows = []
+    for line in open(file, "r"):
+        try:
+            rows.append([float(v) for v in line.strip().split(";")])
+        except ValueError:
+            continue
+    return pd.DataFrame(rows, columns=DRIVING_CYCLE_COLUMNS[:len(rows[0])])
+
+def fitClassCoefficients(df_cycle):
+    # least squares per pollutant, on the grid points SUMO did not cut off to zero
+    # (coasting); the error is measured on the same points
+    terms = designMatrix(df_cycle["speed"], df_cycle["accel"])
+    rows = []
+    for pollutant in POLLUTANT_COLUMNS:
+        values = df_cycle[pollutant].to_numpy()*3.6
+        emitting = values!=0
+        coefficients = np.zeros(N_TERMS)
+        error = 0.0
+        if emitting.sum()>=N_TERMS:
+            coefficients = np.linalg.lstsq(terms[emitting], values[emitting], rcond=None)[0]
+            error = float(np.abs(terms[emitting] @ coefficients-values[emitting]).max()/np.abs(values[emitting]).max())
+        rows.append({"pollutant": pollutant, **{"c"+str(t): coefficients[t] for t in range(0, N_TERMS)}, "max_rel_error": error})
+    return rows
+
+def calibrateCoefficients(driving_cycle_binary, eclasses, target_file=COEFFICIENT_FILE, work_folder=CALIBRATION_FOLDER):
+    os.makedirs(work_folder, exist_ok=True)
+    cycle_file = work_folder+"/cycle.csv"
+    writeCalibrationCycle(cycle_file)
+    rows = []
+    for eclass in eclasses:
+        output_file = work_folder+"/"+eclass.replace("/", "_")+".csv"
+        subprocess.run([driving_cycle_binary, "-e", eclass, "-t", cycle_file, "-o", output_file], check=True, capture_output=True)
+        for row in fitClassCoefficients(readDrivingCycleOutput(output_file)):
+            rows.append({"eclass": eclass, **row})
+    df_coefficients = pd.DataFrame(rows)
+    df_coefficients.to_csv(target_file, index=False)
+    return df_coefficients
+
+def estimateTrajectoryEmissions(trajectory_file, coefficient_file=COEFFICIENT_FILE, sample_period=1, goal_weights=GOAL_WEIGHTS):
+    # emissions per recorded second (mg/s over one second = mg), or sampled every
+    # sample_period seconds like the emission device; as determineEmissions()
+    eclasses, coefficients = loadCoefficients(coefficient_file)
+    times = []
+    totals = []
+    n_unknown = 0
+    for _, vehicle_rows, _, names in loadTrajectoryChunks(trajectory_file, with_emission_classes=True):
+        if "eclass" not in vehicle_rows.dtype.names:
+            raise ValueError("trajectory file without kinematics and emission classes: "+trajectory_file)
+        if sample_period>1:
+            vehicle_rows = vehicle_rows[np.round(vehicle_rows["time"]).astype(np.int64) % sample_period==0]
+        class_index = classIndices(names, eclasses)[vehicle_rows["eclass"]]
+        n_unknown += int((class_index<0).sum())
+        emissions = evaluateEmissions(coefficients, class_index, vehicle_rows["speed"], vehicle_rows["accel"])
+        chunk_times, inverse = np.unique(vehicle_rows["time"], return_inverse=True)
+        chunk_totals = np.stack([np.bincount(inverse, weights=np.nan_to_num(emissions[:,p]), minlength=len(chunk_times))
+                                 for p in range(0, len(POLLUTANT_COLUMNS))], axis=1)
+        times += [float(t) for t in chunk_times]
+        totals.append(chunk_totals)
+    if n_unknown>0:
+        print("WARNING:", n_unknown, "ROWS OF EMISSION CLASSES WITHOUT COEFFICIENTS (NOT COUNTED)")
+    totals = np.concatenate(totals) if totals else np.zeros((0, len(POLLUTANT_COLUMNS)))
+    df_emissions = pd.DataFrame(totals, columns=POLLUTANT_COLUMNS)
+    df_emissions.insert(0, "time", times)
+    df_emissions = addEmissionGoal(df_emissions, goal_weights)
+    return float(df_emissions["goal"].sum()), df_emissions
+
+def loadLogSamples(log_file):
+    # emission class, logged pollutants and speed of every vehicle sample in an emission log
+    names, values = [], []
+    with openLog(log_file) as f:
+        for line in f:
+            match = LOG_SAMPLE_PATTERN.search(line)
+            if match is not None:
+                names.append(match.group(1))
+                values.append([float(v) for v in match.groups()[1:]])
+    values = np.asarray(values).reshape(-1, len(POLLUTANT_COLUMNS)+1)
+    return names, values[:,:len(POLLUTANT_COLUMNS)], values[:,len(POLLUTANT_COLUMNS)]
+
+def estimateLogSamples(log_file, coefficient_file=COEFFICIENT_FILE):
+    # estimated and logged totals per pollutant, at acceleration 0 (the log holds none)
+    eclasses, coefficients = loadCoefficients(coefficient_file)
+    names, logged, speeds = loadLogSamples(log_file)
+    estimated = evaluateEmissions(coefficients, classIndices(names, eclasses), speeds, np.zeros(len(speeds)))
+    return dict(zip(POLLUTANT_COLUMNS, np.nansum(estimated, axis=0))), dict(zip(POLLUTANT_COLUMNS, logged.sum(axis=0)))
+
+def compareTotals(estimated, logged):
+    rows = []
+    for key in logged:
+        deviation = (estimated[key]-logged[key])/logged[key] if logged[key]!=0 else 0.0
+        rows.append({"pollutant": key, "logged": logged[key], "estimated": estimated[key], "deviation_%": 100*deviation})
+    return pd.DataFrame(rows)
+
+def parseGoalWeights(goal_weights_string):
+    goal_weights = dict(GOAL_WEIGHTS)
+    if goal_weights_string is not None:
+        goal_weights.update({k: float(v) for k, v in (p.split("=") for p in goal_weights_string.split(","))})
+    return goal_weights
+
+
+
+
+# #############################################################################
+# ## MAIN CODE
+# #############################################################################
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline emission estimates from recorded trajectories.")
+    parser.add_argument("--calibrate", action="store_true", help="fit the HBEFA4 coefficients with emissionsDrivingCycle")
+    parser.add_argument("--driving-cycle-path", default="emissionsDrivingCycle")
+    parser.add_argument("--emission-population", default="../data/Emission_VehiclePopulation.xlsx")
+    parser.add_argument("--coefficients", default=COEFFICIENT_FILE)
+    parser.add_argument("--trajectory", default=None, help="recorded trajectory (RunSimulation.py --record-trajectory)")
+    parser.add_argument("--logs", default=None, help="validate the trajectory estimate against this run's Emissions.xml")
+    parser.add_argument("--log-samples", default=None, help="validate the coefficients on the samples of this log folder")
+    parser.add_argument("--goal-weights", default=None, help="pollutant weights of the goal, e.g. \"co2=0.2,NOx=0.4\"")
+    args = parser.parse_args()
+
+    if args.calibrate:
+        from DemandModel import loadEmissionClassesFromFile
+        emission_model = loadEmissionClassesFromFile(file=args.emission_population)
+        eclasses = sorted(set("HBEFA4/"+e for df in emission_model.values() for e in df["sumo_emission_class"].unique()))
+        df_coefficients = calibrateCoefficients(args.driving_cycle_path, eclasses, args.coefficients)
+        print("CALIBRATED", len(eclasses), "EMISSION CLASSES INTO", args.coefficients,
+              "(MAX RELATIVE FIT ERROR %.4f)" % df_coefficients["max_rel_error"].max())
+    if args.trajectory is not None:
+        goal_weights = parseGoalWeights(args.goal_weights)
+        total_emissions, df_emissions = estimateTrajectoryEmissions(args.trajectory, args.coefficients, goal_weights=goal_weights)
+        print("ESTIMATED EMISSIONS (mg, every second)")
+        print(df_emissions[POLLUTANT_COLUMNS+["goal"]].sum().to_string())
+        if args.logs is not None:
+            # sampled like the emission device, and scored like RunScoring.scoreRun
+            _, df_sampled = estimateTrajectoryEmissions(args.trajectory, args.coefficients, LOG_PERIOD, goal_weights)
+            _, df_logged = determineEmissions(args.logs)
+            df_logged = addEmissionGoal(df_logged, goal_weights)
+            keys = POLLUTANT_COLUMNS+["goal"]
+            print(compareTotals(df_sampled[keys].sum().to_dict(), df_logged[keys].sum().to_dict()).to_string(index=False))
+    if args.log_samples is not None:
+        estimated, logged = estimateLogSamples(findLog(args.log_samples, "Emissions.xml"), args.coefficients)
+        print(compareTotals(estimated, logged).to_string(index=False))
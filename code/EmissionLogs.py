@@ -0,0 +1,272 @@
+# #############################################################################
+# ####### GREEN-PRESSURE - EMISSION-REDUCING SIGNALIZED INTERSECTION MANAGEMENT
+# #######
+# #######     AUTHOR:       Kevin Riehl <kriehl@ethz.ch>
+# #######     YEAR :        2025
+# #######     ORGANIZATION: Traffic Engineering Group (SVT),
+# #######                   Institute for Transportation Planning and Systems,
+# #######                   ETH Zürich
+# #############################################################################
+"""
+This code contains the readers for the SUMO emission output (Emissions.xml),
+shared by the optimizer, the scoring and the analysis scripts. The log is
+never read into memory at once: it is either streamed line by line, or
+memory-mapped and split into byte ranges aligned on <timestep> tags, which
+are scanned by worker processes (regex on bytes) and merged in file order.
+Gzip compressed logs (SUMO writes *.xml.gz natively) are decompressed while
+streaming, in blocks aligned on <timestep> tags. EmissionTail follows a log
+while SUMO is still writing it.
+"""
+
+
+
+
+# #############################################################################
+# ## IMPORTS
+# #############################################################################
+import os
+import re
+import gzip
+import mmap
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+
+
+
+# #############################################################################
+# ## PARAMETERS
+# #############################################################################
+POLLUTANT_COLUMNS = ["co2", "co", "hc", "NOx", "PMx"]
+POLLUTANT_ATTRIBUTES = ["CO2", "CO", "HC", "NOx", "PMx"] # names in the SUMO outputs, in the order of POLLUTANT_COLUMNS
+# the emission goal, the only definition of its weights (AQI in the trip and heatmap analyses)
+GOAL_WEIGHTS = {"co2": 0.15, "co": 0.10, "hc": 0.15, "NOx": 0.30, "PMx": 0.30}
+ATTRIBUTE_GOAL_WEIGHTS = {a: GOAL_WEIGHTS[p] for a, p in zip(POLLUTANT_ATTRIBUTES, POLLUTANT_COLUMNS)}
+POLLUTANT_PATTERN = re.compile(r' CO2="([^"]*)" CO="([^"]*)" HC="([^"]*)" NOx="([^"]*)" PMx="([^"]*)"')
+POLLUTANT_BYTES_PATTERN = re.compile(POLLUTANT_PATTERN.pattern.encode())
+CHUNK_BYTES = 64*1024*1024
+
+
+
+
+# #############################################################################
+# ## METHODS
+# #############################################################################
+
+def parsePollutants(line):
+    match = POLLUTANT_PATTERN.search(line)
+    if match is not None:
+        return [float(v) for v in match.groups()]
+    return [float(line.split(key+"=\"")[1].split("\"")[0]) for key in POLLUTANT_ATTRIBUTES]
+
+def isCompressed(file):
+    with open(file, "rb") as f:
+        return f.read(2)==b"\x1f\x8b"
+
+def openLog(file, mode="r"):
+    # plain or gzip compressed log, decompressed while reading
+    if isCompressed(file):
+        return gzip.open(file, mode+"t" if mode=="r" else mode)
+    return open(file, mode)
+
+def findLog(folder, name):
+    # folder/name, or folder/name.gz if that was written instead (or more recently)
+    file = folder+"/"+name
+    if os.path.exists(file+".gz") and (not os.path.exists(file) or os.path.getmtime(file+".gz")>=os.path.getmtime(file)):
+        return file+".gz"
+    return file
+
+def iterEmissionTimesteps(file):
+    # yields (time string, [co2, co, hc, NOx, PMx]) per <timestep>, summed over vehicles;
+    # a timestep that is never closed (truncated log) is dropped, as by parseEmissionBuffer
+    time = None
+    totals = None
+    with openLog(file) as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith("<vehicle ") and time is not None:
+                if not line.endswith("/>"):
+                    # unfinished last line
+                    continue
+                values = parsePollutants(line)
+                for p_ctr in range(0, 5):
+                    totals[p_ctr] += values[p_ctr]
+            elif line.startswith("<timestep "):
+                t = line.split("\"")[1]
+                if line.endswith("/>"):
+                    yield t, [0.0]*5
+                else:
+                    time = t
+                    totals = [0.0]*5
+            elif line.startswith("</timestep>") and time is not None:
+                yield time, totals
+                time = None
+
+def determineChunkRanges(file, chunk_bytes=CHUNK_BYTES):
+    # byte ranges of roughly chunk_bytes, each starting at a <timestep tag (the
+    # first one at 0), so that no timestep is split between two chunks
+    size = os.path.getsize(file)
+    if size==0:
+        return []
+    starts = [0]
+    with open(file, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        offset = chunk_bytes
+        while offset<size:
+            boundary = mm.find(b"<timestep ", offset)
+            if boundary==-1:
+                break
+            starts.append(boundary)
+            offset = boundary+chunk_bytes
+        mm.close()
+    return list(zip(starts, starts[1:]+[size]))
+
+def parseEmissionBuffer(buffer, start, end):
+    # per-timestep pollutant sums of buffer[start:end] (mapped file or bytes),
+    # which starts at a <timestep tag
+    times = []
+    totals = []
+    position = buffer.find(b"<timestep time=\"", start, end)
+    while position!=-1:
+        time_end = buffer.find(b"\"", position+16, end)
+        next_position = buffer.find(b"<timestep time=\"", time_end, end)
+        if buffer[time_end+1:time_end+3]==b"/>":
+            times.append(buffer[position+16:time_end].decode())
+            totals.append(np.zeros(len(POLLUTANT_COLUMNS)))
+        else:
+            # a timestep that is never closed (truncated log) is dropped, as by iterEmissionTimesteps
+            closing = buffer.find(b"</timestep>", time_end, end if next_position==-1 else next_position)
+            if closing!=-1:
+                values = POLLUTANT_BYTES_PATTERN.findall(buffer, time_end, closing)
+                times.append(buffer[position+16:time_end].decode())
+                if values:
+                    totals.append(np.array(values, dtype="S").astype(np.float64).sum(axis=0))
+                else:
+                    totals.append(np.zeros(len(POLLUTANT_COLUMNS)))
+        position = next_position
+    return times, np.array(totals).reshape(-1, len(POLLUTANT_COLUMNS))
+
+def parseEmissionChunk(task):
+    # (file, start, end) -> (time strings, array of per-timestep pollutant sums);
+    # only the chunk is mapped, so the resident memory stays near the chunk size
+    file, start, end = task
+    map_start = start - start % mmap.ALLOCATIONGRANULARITY
+    with open(file, "rb") as f:
+        mm = mmap.mmap(f.fileno(), end-map_start, access=mmap.ACCESS_READ, offset=map_start)
+        result = parseEmissionBuffer(mm, start-map_start, end-map_start)
+        mm.close()
+    return result
+
+def parseEmissionBlock(block):
+    return parseEmissionBuffer(block, 0, len(block))
+
+def iterCompressedBlocks(file, block_bytes=CHUNK_BYTES):
+    # decompressed blocks of roughly block_bytes, cut before a <timestep tag
+    rest = b""
+    with gzip.open(file, "rb") as f:
+        while True:
+            data = f.read(block_bytes)
+            if not data:
+                break
+            block = rest+data
+            cut = block.rfind(b"<timestep ")
+            if cut<=0:
+                rest = block
+                continue
+            rest = block[cut:]
+            yield block[:cut]
+    if rest:
+        yield rest
+
+def iterBounded(executor, function, tasks, n_pending):
+    # like executor.map, but at most n_pending tasks are submitted at a time,
+    # so that a stream of large tasks is not held in memory at once
+    pending = []
+    for task in tasks:
+        pending.append(executor.submit(function, task))
+        if len(pending)>=n_pending:
+            yield pending.pop(0).result()
+    for future in pending:
+        yield future.result()
+
+def iterEmissionChunks(file, workers=None, chunk_bytes=CHUNK_BYTES):
+    # yields (time strings, per-timestep pollutant sums) per chunk, in file order
+    if isCompressed(file):
+        function, tasks = parseEmissionBlock, iterCompressedBlocks(file, chunk_bytes)
+        # the size of a compressed log says little about the number of blocks
+        workers = workers or os.cpu_count() or 1
+    else:
+        function, tasks = parseEmissionChunk, [(file, start, end) for start, end in determineChunkRanges(file, chunk_bytes)]
+        workers = min(workers or os.cpu_count() or 1, len(tasks))
+    if workers<=1:
+        for task in tasks:
+            yield function(task)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for result in iterBounded(executor, function, tasks, 2*workers):
+            yield result
+
+def addEmissionGoal(df_emissions, goal_weights=GOAL_WEIGHTS):
+    df_emissions["goal"] = sum(df_emissions[p]*goal_weights[p] for p in POLLUTANT_COLUMNS)
+    return df_emissions
+
+class EmissionTail:
+    """
+    Cumulative pollutants of a log that is still being written: every update()
+    parses the bytes appended since the last one. The last <timestep> may be
+    incomplete, so it is held back until the next one starts (or until
+    update(final=True)).
+    """
+    def __init__(self, file, goal_weights=GOAL_WEIGHTS):
+        self.file = file
+        self.goal_weights = goal_weights
+        self.offset = 0
+        self.rest = b""
+        self.decompressor = None
+        self.time = None
+        self.totals = np.zeros(len(POLLUTANT_COLUMNS))
+
+    def goal(self):
+        return float(sum(self.totals[p_ctr]*self.goal_weights[p] for p_ctr, p in enumerate(POLLUTANT_COLUMNS)))
+
+    def update(self, final=False):
+        # returns (time of the last complete timestep or None, cumulative goal)
+        if not os.path.exists(self.file):
+            return self.time, self.goal()
+        if os.path.getsize(self.file)<self.offset:
+            # rewritten from the start
+            self.__init__(self.file, self.goal_weights)
+        with open(self.file, "rb") as f:
+            f.seek(self.offset)
+            data = f.read()
+        if self.offset==0 and data[:2]==b"\x1f\x8b":
+            self.decompressor = zlib.decompressobj(wbits=31)
+        self.offset += len(data)
+        if self.decompressor is not None:
+            data = self.decompressor.decompress(data)
+        block = self.rest+data
+        cut = len(block) if final else block.rfind(b"<timestep ")
+        if cut<=0:
+            self.rest = block
+            return self.time, self.goal()
+        self.rest = block[cut:]
+        times, totals = parseEmissionBuffer(block, 0, cut)
+        if times:
+            self.time = float(times[-1])
+            self.totals += totals.sum(axis=0)
+        return self.time, self.goal()
+
+def determineEmissions(folder="../model/logs", workers=None, chunk_bytes=CHUNK_BYTES):
+    times = []
+    totals = []
+    for chunk_times, chunk_totals in iterEmissionChunks(findLog(folder, "Emissions.xml"), workers, chunk_bytes):
+        times += chunk_times
+        totals.append(chunk_totals)
+    totals = np.concatenate(totals) if totals else np.zeros((0, len(POLLUTANT_COLUMNS)))
+    df_emissions = pd.DataFrame(totals, columns=POLLUTANT_COLUMNS)
+    df_emissions.insert(0, "time", times)
+    df_emissions = addEmissionGoal(df_emissions)
+    total_emissions = sum(df_emissions["goal"])
+    return total_emissions, df_emissions
@@ -10,6 +10,11 @@
 """
 This code will run multiple microsimulation with the Green-Pressure
 signal controller to optimize the weights using NASH optimization algorithm.
+With SEQUENTIAL, candidates are compared against the incumbent on common
+seeds, adding seeds until the difference is significant
+(SequentialEvaluation.py), instead of a single run each. With PRUNE,
+candidates whose running emissions cross a bound derived from the
+incumbent's are aborted early (CandidatePruning.py).
 """
 
 
@@ -18,137 +23,160 @@ signal controller to optimize the weights using NASH optimization algorithm.
 # *****************************************************************************
 # ******* IMPORTS *************************************************************
 # *****************************************************************************
-import pandas as pd
-import numpy as np
-import subprocess
 import sys
 import random
-from concurrent.futures import ThreadPoolExecutor
 import os
-import ast
+import time
+import shutil
+import hashlib
+from RunScoring import scoreRun
+from RunDatabase import RunDatabase, DATABASE_FILE
+from SequentialEvaluation import SequentialEvaluator, weightsKey
+from CandidatePruning import PruningBound, runPruned
 
 
 
 
 # *****************************************************************************
-# ******* METHODS *************************************************************
-# *****************************************************************************
-def determineEmissions(folder="../model/logs"):
-    f = open(folder+"/"+"Emissions.xml", "r")
-    content = f.read()
-    f.close()
-    lines = content.split("\n")
-    lines = [line.strip() for line in lines]
-    emissions = []
-    for l_ctr in range(0, len(lines)):
-        line = lines[l_ctr]
-        if line.startswith("<timestep "):
-            time = line.split("\"")[1].split("\"")[0]
-            relevant_lines = []
-            for l_ctr2 in range(l_ctr+1, len(lines)):
-                line = lines[l_ctr2]
-                if line.startswith("</timestep>"):
-                    break
-                else:
-                    relevant_lines.append(line)
-            co2 = 0
-            co  = 0
-            hc  = 0
-            NOx = 0
-            PMx = 0
-            for line in relevant_lines:
-                co2 += float(line.split("CO2=\"")[1].split("\"")[0])
-                co  += float(line.split("CO=\"")[1].split("\"")[0])
-                hc  += float(line.split("HC=\"")[1].split("\"")[0])
-                NOx += float(line.split("NOx=\"")[1].split("\"")[0])
-                PMx += float(line.split("PMx=\"")[1].split("\"")[0])
-            emissions.append([time, co2, co, hc, NOx, PMx])
-    df_emissions = pd.DataFrame(emissions, columns=["time", "co2", "co", "hc", "NOx", "PMx"])
-    df_emissions["goal"] = df_emissions["co2"]*0.15 + df_emissions["co"]*0.10 + df_emissions["hc"]*0.15 + df_emissions["NOx"]*0.30 + df_emissions["PMx"]*0.30
-    total_emissions = sum(df_emissions["goal"])
-    return total_emissions, df_emissions
-
-# Define the function to run the simulation
-def run_simulation(candidate_weights):
-    script_name = "RunSimulation_green_pressure.py"
-    arguments = ["--sumo-path", SUMO_PATH, "--controller", "GREEN_PRESSURE", "--weights", str(candidate_weights).replace(" ", "").replace("[","").replace("]","")]
-    result = subprocess.run(["python", script_name] + arguments, capture_output=True, text=True)
-    print("FINISHED RUNNING", result.stdout, result.stderr)
-    return result.stdout, result.stderr  
-
-def logProcess(iteration, new_best, candidate_weights, candidate_score, std):
-    f = open("nash_optim_log.txt", "a+")
-    f.write(str(iteration))
-    f.write("\t")
-    f.write(str(new_best))
-    f.write("\t")
-    f.write(str(candidate_score))
-    f.write("\t")
-    f.write(str(candidate_weights).replace(" ",""))
-    f.write("\n")
-    f.close()
-
-def loadLastOptim():
-    f = open("nash_optim_log.txt", "r")
-    content = f.read()
-    f.close()
-    lines = content.split("\n")
-    best_score = INIT_SCORE
-    best_weights = INIT_WEIGHTS
-    for line in lines:
-        try:
-            weights = ast.literal_eval(line.split("\t")[3].replace("\n", ""))
-            score = float(line.split("\t")[2])
-            if line.split("\t")[1]=="True":
-                if score<best_score:
-                    best_score = score
-                    best_weights = weights
-        except:
-            pass
-    return best_weights, best_score
-
-
-
-
-# *****************************************************************************
-# ******* MAIN ****************************************************************
+# ******* PARAMETERS **********************************************************
 # *****************************************************************************
 SUMO_PATH = "C:/Users/kriehl/AppData/Local/sumo-1.19.0/bin/sumo-gui.exe"
 INIT_WEIGHTS = [1,1,1,1,1]
 INIT_SCORE = 1000000000000000000
 NUM_ITERATIONS = 1000  # Number of iterations to try
 SEARCH_RADIUS = 0.08
+STUDY = "nash"
+SEQUENTIAL = True # compare on common seeds until significant, see SequentialEvaluation.py
+PARALLEL_RUNS = 2 # simulations in parallel (sequential evaluation)
+LOGS_ROOT = "../model/logs_nash"
+PRUNE = True # abort candidates whose running emissions cross the bound, see CandidatePruning.py
+PRUNE_MARGIN = 0.10 # None: only abort once the incumbent's total of the day is exceeded
+PRUNE_MIN_TIME = 3600 # simulated seconds before the margin applies
+
+
+
 
-# Check if Optim Log Exists
-if os.path.exists("nash_optim_log.txt"):
-    best_weights, best_score = loadLastOptim()
-    print(f"Initial Solution 0: {best_weights} with score {best_score}")
-else:
-    best_weights = INIT_WEIGHTS
-    run_simulation(best_weights)
-    score, std = determineEmissions()
-    best_score = score
-    print(f"Initial Solution 0: {best_weights} with score {best_score}")
-    logProcess(-1, True, best_weights, score, std)
-    
-# NASH-optimization
-# Min. Optimization loop
-for i in range(NUM_ITERATIONS):
+# *****************************************************************************
+# ******* METHODS *************************************************************
+# *****************************************************************************
+# Define the function to run the simulation
+def run_simulation(candidate_weights, seed=None, output_dir=None, bound=None):
+    script_name = "RunSimulation.py"
+    arguments = ["run", "--sumo-path", SUMO_PATH, "--controller", "GREEN_PRESSURE", "--weights", ",".join(str(w) for w in candidate_weights)]
+    if seed is not None:
+        arguments += ["--seed", str(seed)]
+    if output_dir is not None:
+        arguments += ["--output-dir", output_dir]
+    log_dir = output_dir if output_dir is not None else "../model/logs"
+    # the running emissions are followed, the run is aborted (pruned) once they cross the bound
+    pruned = runPruned([sys.executable, script_name] + arguments, log_dir+"/Emissions.xml", bound, log_file=log_dir+"/RunSimulation.log")
+    print("FINISHED RUNNING" if pruned is None else "PRUNED", candidate_weights, "" if pruned is None else pruned)
+    return pruned
+
+def generateCandidate(best_weights):
     # Generate new candidate weights by slightly modifying the current best weights
     candidate_weights = [w + random.uniform(-SEARCH_RADIUS, SEARCH_RADIUS) for w in best_weights]  # Add small random perturbations
     candidate_weights = [w if w >= 0 else 0 for w in candidate_weights]
-    candidate_weights = [w / candidate_weights[0] for w in candidate_weights]
-    # Run simulation
-    run_simulation(candidate_weights)
-    # Evaluate the candidate weights
-    candidate_score, std = determineEmissions()
-    print("\t", "Candidate", candidate_score, "["+str(std)+"]")
-    # If the candidate is better, update the best weights and efficiency
-    if candidate_score < best_score:  # Assuming lower efficiency is better
-        best_weights = candidate_weights[:]
-        best_score = candidate_score
-        print(f"New best found at iteration {i}: {best_weights} with efficiency {best_score}")
-        logProcess(i, True, best_weights, best_score, std)
+    return [w / candidate_weights[0] for w in candidate_weights]
+
+def evaluateCandidate(database, iteration, candidate_weights, best_score, best_series):
+    start = time.time()
+    bound = PruningBound(best_series, PRUNE_MARGIN, PRUNE_MIN_TIME) if PRUNE and best_series is not None else None
+    pruned = run_simulation(candidate_weights, bound=bound)
+    runtime = time.time()-start
+    if pruned is not None:
+        database.addEvaluation(STUDY, candidate_weights, pruned, iteration=iteration, runtime_s=runtime, pruned=True)
+        return float("inf"), False, None
+    objectives, df_emissions = scoreRun()
+    new_best = objectives["goal"] < best_score
+    database.addEvaluation(STUDY, candidate_weights, objectives, iteration=iteration, new_best=new_best,
+                           runtime_s=runtime, df_emissions=df_emissions)
+    return objectives["goal"], new_best, df_emissions
+
+def evaluateSeed(candidate_weights, seed, database_file=DATABASE_FILE, incumbent_weights=None):
+    # one run in its own log folder, so seeds can run in parallel
+    output_dir = LOGS_ROOT+"/"+hashlib.md5(weightsKey(candidate_weights).encode()).hexdigest()[:12]+"_s"+str(seed)
+    os.makedirs(output_dir, exist_ok=True)
+    bound = None
+    if PRUNE and incumbent_weights is not None and candidate_weights!=incumbent_weights:
+        # the incumbent's run on the same seed (own connection, this runs in a worker thread)
+        thread_database = RunDatabase(database_file)
+        incumbent_series = thread_database.seedEmissionSeries(STUDY, incumbent_weights).get(seed)
+        thread_database.close()
+        if incumbent_series is not None:
+            bound = PruningBound(incumbent_series, PRUNE_MARGIN, PRUNE_MIN_TIME)
+    pruned = run_simulation(candidate_weights, seed, output_dir, bound)
+    if pruned is not None:
+        shutil.rmtree(output_dir, ignore_errors=True)
+        return {"pruned": True, **pruned}, None
+    objectives, df_emissions = scoreRun(output_dir)
+    shutil.rmtree(output_dir, ignore_errors=True)
+    return objectives, df_emissions
+
+def optimizeSequential(database):
+    # candidates against the incumbent on common seeds (SequentialEvaluation.py)
+    best_weights = database.incumbent(STUDY) or INIT_WEIGHTS
+    def evaluate(candidate_weights, seed):
+        return evaluateSeed(candidate_weights, seed, database.file, best_weights)
+    evaluator = SequentialEvaluator(evaluate, database, STUDY, parallel=PARALLEL_RUNS)
+    last_iteration = database.lastIteration(STUDY)
+    first_iteration = 0 if last_iteration is None else last_iteration+1
+    best_score, n_seeds = evaluator.estimate(best_weights)
+    print(f"Initial Solution 0: {best_weights} with score {best_score} over {n_seeds} seeds")
+    for i in range(first_iteration, NUM_ITERATIONS):
+        candidate_weights = generateCandidate(best_weights)
+        decision = evaluator.compare(candidate_weights, best_weights, iteration=i)
+        print("\t", "Candidate", decision["candidate_score"], "over", decision["seeds"], "seeds,", decision["simulations"], "simulations,", decision["reason"])
+        if decision["accept"]:
+            database.markBest(STUDY, candidate_weights, iteration=i)
+            best_weights = candidate_weights[:]
+            print(f"New best found at iteration {i}: {best_weights} with efficiency {decision['candidate_score']}")
+        else:
+            print(f"Wasted iteration iteration {i}: {candidate_weights} with efficiency {decision['candidate_score']}")
+
+def optimizeSingleRuns(database):
+    # one run per candidate, accepted if its score beats the best so far
+    if database.countEvaluations(STUDY)>0:
+        best = database.best(STUDY)[0]
+        best_weights, best_score = best["weights"], best["score"]
+        best_series = database.emissionSeries(best["id"])
+        first_iteration = database.lastIteration(STUDY)+1
+        print(f"Initial Solution 0: {best_weights} with score {best_score}")
+    else:
+        best_weights = INIT_WEIGHTS
+        best_score, _, best_series = evaluateCandidate(database, -1, best_weights, INIT_SCORE, None)
+        first_iteration = 0
+        print(f"Initial Solution 0: {best_weights} with score {best_score}")
+    # NASH-optimization
+    # Min. Optimization loop
+    for i in range(first_iteration, NUM_ITERATIONS):
+        candidate_weights = generateCandidate(best_weights)
+        # Run simulation and evaluate the candidate weights
+        candidate_score, new_best, candidate_series = evaluateCandidate(database, i, candidate_weights, best_score, best_series)
+        print("\t", "Candidate", candidate_score)
+        # If the candidate is better, update the best weights and efficiency
+        if new_best:  # Assuming lower efficiency is better
+            best_weights = candidate_weights[:]
+            best_score = candidate_score
+            best_series = candidate_series
+            print(f"New best found at iteration {i}: {best_weights} with efficiency {best_score}")
+        else:
+            print(f"Wasted iteration iteration {i}: {candidate_weights} with efficiency {candidate_score}")
+
+
+
+
+# *****************************************************************************
+# ******* MAIN ****************************************************************
+# *****************************************************************************
+# the guard keeps worker processes (spawn start method, e.g. on Windows) from running the optimizer
+if __name__ == "__main__":
+    database = RunDatabase(DATABASE_FILE) # all evaluations, see RunDatabase.py / RunScoring.py
+    # Resume from the best evaluation so far (older runs logged to nash_optim_log.txt are imported once)
+    if database.countEvaluations(STUDY)==0 and os.path.exists("nash_optim_log.txt"):
+        database.importLegacyLog(STUDY, "nash_optim_log.txt")
+    if SEQUENTIAL:
+        optimizeSequential(database)
     else:
-        print(f"Wasted iteration iteration {i}: {candidate_weights} with efficiency {candidate_score}")
-        logProcess(i, False, candidate_weights, candidate_score, std)
+        optimizeSingleRuns(database)
+    database.close()
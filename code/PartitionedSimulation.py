@@ -0,0 +1,429 @@
+# #############################################################################
+# ####### GREEN-PRESSURE - EMISSION-REDUCING SIGNALIZED INTERSECTION MANAGEMENT
+# #######
+# #######     AUTHOR:       Kevin Riehl <kriehl@ethz.ch>
+# #######     YEAR :        2025
+# #######     ORGANIZATION: Traffic Engineering Group (SVT),
+# #######                   Institute for Transportation Planning and Systems,
+# #######                   ETH Zürich
+# #############################################################################
+"""
+This code runs one simulation spatially partitioned over several SUMO
+processes, for networks too large for a single SUMO process and control loop.
+The signalized intersections are clustered along the artery, and every edge
+is assigned to the cluster of its nearest intersection. Each partition gets
+its own network (cut from Network.net.xml with netconvert --keep-edges), bus
+stops, controllers and demand. The controllers switch phases by index, so
+every partition network has to keep the tlLogic phases and the link indices of
+its intersections; partitioning fails with an error otherwise. Routes are cut
+into one segment per partition
+they pass. The partitions are stepped in lockstep, one second at a time, on a
+thread pool. After every second, vehicles that left a partition at the end of
+their route segment are inserted into the partition of their next segment
+(same id, type and remaining bus stops).
+
+The demand has to be compiled (CompileDemand.py). With --validate, the same
+demand is also simulated monolithically, and total emissions and travel times
+of both runs are compared.
+
+Usage:
+python PartitionedSimulation.py --sumo-path sumo --demand-file ../model/CompiledDemand.rou.xml --partitions 2 --validate
+"""
+
+
+
+
+# #############################################################################
+# ## IMPORTS
+# #############################################################################
+import os
+import sys
+import argparse
+import json
+import shutil
+import subprocess
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import traci
+from SimulationInstance import SimulationInstance, buildSumoCommand, simulation_times, SUMO_CONFIG_FILE, ROUTE_FILES, BUS_STOP_DURATION
+from ControllerDefinitions import loadControllerDefinitions, loadSignalizedConnections, CONTROLLER_FILE, NET_FILE
+from AsyncOrchestrator import parseWeights
+from EmissionLogs import determineEmissions, findLog, POLLUTANT_COLUMNS
+from TripInfoAnalytics import iterTripInfos, laneEdge
+if 'SUMO_HOME' in os.environ:
+    sys.path.append(os.path.join(os.environ['SUMO_HOME'], 'tools'))
+
+
+
+
+# #############################################################################
+# ## PARAMETERS
+# #############################################################################
+N_PARTITIONS = 2
+PARTITION_ROOT = "../model/partitions"
+OUTPUT_ROOT = "../model/logs_partitioned"
+ADDITIONAL_FILE = "../model/BusStops.add.xml"
+SEGMENT_SEPARATOR = "@" # route id of segment s: <route>@<s>
+VALIDATION_TOLERANCE = 0.05 # relative deviation from the monolithic run
+VALIDATION_METRICS = ["goal"] + POLLUTANT_COLUMNS + ["total_travel_time_h", "total_delay_h", "trips"]
+
+
+
+
+# #############################################################################
+# ## METHODS
+# #############################################################################
+
+def loadNetworkGraph(net_file=NET_FILE):
+    # junction positions, (from, to) junctions of all normal edges, and the
+    # junctions of every traffic light (the junctions its connections cross)
+    junction_positions = {}
+    edges = {}
+    tl_edges = {}
+    for _, elem in ET.iterparse(net_file):
+        if elem.tag=="junction" and elem.attrib.get("type")!="internal":
+            junction_positions[elem.attrib["id"]] = (float(elem.attrib["x"]), float(elem.attrib["y"]))
+        elif elem.tag=="edge" and "from" in elem.attrib:
+            edges[elem.attrib["id"]] = (elem.attrib["from"], elem.attrib["to"])
+        elif elem.tag=="connection" and "tl" in elem.attrib:
+            tl_edges.setdefault(elem.attrib["tl"], set()).add(elem.attrib["from"])
+        elem.clear()
+    tl_junctions = {tl: set(edges[edge][1] for edge in from_edges) for tl, from_edges in tl_edges.items()}
+    return junction_positions, edges, tl_junctions
+
+def partitionIntersections(tl_positions, n_partitions):
+    # contiguous clusters along the principal axis of the intersection positions
+    names = list(tl_positions)
+    positions = np.asarray([tl_positions[name] for name in names])
+    centered = positions-positions.mean(axis=0)
+    axis = np.linalg.svd(centered, full_matrices=False)[2][0]
+    order = np.argsort(centered @ axis)
+    tl_partition = {}
+    for partition, members in enumerate(np.array_split(order, n_partitions)):
+        for member in members:
+            tl_partition[names[member]] = partition
+    return tl_partition
+
+def assignEdges(edges, junction_positions, tl_junctions, tl_partition, definitions):
+    # edges at a signalized junction and the controllers' link lanes belong to the
+    # intersection's partition, every other edge to the partition of the nearest one
+    tl_names = list(tl_partition)
+    tl_positions = np.asarray([np.mean([junction_positions[j] for j in tl_junctions[tl]], axis=0) for tl in tl_names])
+    junction_partition = {j: tl_partition[tl] for tl in tl_names for j in tl_junctions[tl]}
+    edge_partition = {}
+    for edge, (from_junction, to_junction) in edges.items():
+        if to_junction in junction_partition:
+            edge_partition[edge] = junction_partition[to_junction]
+        elif from_junction in junction_partition:
+            edge_partition[edge] = junction_partition[from_junction]
+        else:
+            middle = (np.asarray(junction_positions[from_junction])+np.asarray(junction_positions[to_junction]))/2
+            nearest = int(np.argmin(((tl_positions-middle)**2).sum(axis=1)))
+            edge_partition[edge] = tl_partition[tl_names[nearest]]
+    for definition in definitions:
+        for lanes in definition["links"].values():
+            for lane in lanes:
+                edge_partition[laneEdge(lane)] = tl_partition[definition["intersection_name"]]
+    return edge_partition
+
+def cutRoute(edges, edge_partition):
+    # [(partition, [edges])], one segment per maximal run of edges in the same partition
+    segments = []
+    for edge in edges:
+        if len(segments)>0 and segments[-1][0]==edge_partition[edge]:
+            segments[-1][1].append(edge)
+        else:
+            segments.append((edge_partition[edge], [edge]))
+    return segments
+
+def segmentRouteId(route, segment):
+    return route+SEGMENT_SEPARATOR+str(segment)
+
+def loadRoutesAndTypes(route_files):
+    # route id -> edges, and the vType elements (as XML) of the route files
+    routes = {}
+    vtypes = []
+    for file in route_files:
+        for _, elem in ET.iterparse(file):
+            if elem.tag=="route" and "id" in elem.attrib:
+                routes[elem.attrib["id"]] = elem.attrib["edges"].split(" ")
+            elif elem.tag=="vType":
+                vtypes.append(ET.tostring(elem, encoding="unicode").strip())
+            if elem.tag in ["route", "vType"]:
+                elem.clear()
+    return routes, vtypes
+
+def loadDemandVehicles(demand_file):
+    # vehicles of a compiled demand file: id, type, route, depart and bus stops, in file order
+    vehicles = []
+    for _, elem in ET.iterparse(demand_file):
+        if elem.tag=="vehicle":
+            vehicles.append({"id": elem.attrib["id"], "type": elem.attrib["type"], "route": elem.attrib["route"],
+                             "depart": elem.attrib["depart"], "stops": [stop.attrib["busStop"] for stop in elem.findall("stop")]})
+            elem.clear()
+    return vehicles
+
+def loadBusStops(additional_file=ADDITIONAL_FILE):
+    # bus stop id -> (edge, element as XML)
+    bus_stops = {}
+    for _, elem in ET.iterparse(additional_file):
+        if elem.tag=="busStop":
+            bus_stops[elem.attrib["id"]] = (laneEdge(elem.attrib["lane"]), ET.tostring(elem, encoding="unicode").strip())
+    return bus_stops
+
+def writePartitionDemand(file, vtypes, segments, partition, vehicles, bus_stops):
+    # vTypes, the route segments in the partition, and the vehicles departing in it
+    with open(file, "w", buffering=1<<20) as f:
+        f.write("<?xml version=\"1.0\" encoding=\"UTF-8\"?>\n\n")
+        f.write("<routes xmlns:xsi=\"http://www.w3.org/2001/XMLSchema-instance\" xsi:noNamespaceSchemaLocation=\"http://sumo.dlr.de/xsd/routes_file.xsd\">\n")
+        f.write("    <!-- VTypes -->\n")
+        for vtype in vtypes:
+            f.write("    "+vtype+"\n")
+        f.write("\n    <!-- Routes -->\n")
+        for route, route_segments in segments.items():
+            for s_ctr, (segment_partition, edges) in enumerate(route_segments):
+                if segment_partition==partition:
+                    f.write("    <route id=\"%s\" edges=\"%s\"/>\n" % (segmentRouteId(route, s_ctr), " ".join(edges)))
+        f.write("\n    <!-- Vehicles -->\n")
+        for vehicle in vehicles:
+            segment_partition, edges = segments[vehicle["route"]][0]
+            if segment_partition!=partition:
+                continue
+            f.write("    <vehicle id=\"%s\" type=\"%s\" route=\"%s\" depart=\"%s\"" % (vehicle["id"], vehicle["type"], segmentRouteId(vehicle["route"], 0), vehicle["depart"]))
+            stops = [stop for stop in vehicle["stops"] if bus_stops[stop][0] in edges]
+            if len(stops)==0:
+                f.write("/>\n")
+                continue
+            f.write(">\n")
+            for stop in stops:
+                f.write("        <stop busStop=\"%s\" duration=\"%d\"/>\n" % (stop, BUS_STOP_DURATION))
+            f.write("    </vehicle>\n")
+        f.write("</routes>\n")
+
+def writePartitionConfiguration(file):
+    # the model configuration, with the partition's network, demand and bus stops
+    tree = ET.parse(SUMO_CONFIG_FILE)
+    for tag, value in [("net-file", "Network.net.xml"), ("route-files", "Demand.rou.xml"), ("additional-files", "BusStops.add.xml")]:
+        for elem in tree.getroot().iter(tag):
+            elem.set("value", value)
+    tree.write(file, encoding="UTF-8", xml_declaration=True)
+
+def compareSignalPrograms(original, partition, tl_names):
+    # mismatches of the controllers' tlLogic phases and signalized connections (link index,
+    # from and to lane) between the original and a partition network
+    (original_states, original_connections), (partition_states, partition_connections) = original, partition
+    mismatches = []
+    for tl in tl_names:
+        if partition_states.get(tl)!=original_states[tl]:
+            mismatches.append(tl+": tlLogic phases differ")
+        expected = sorted(c for c in original_connections if c[0]==tl)
+        found = sorted(c for c in partition_connections if c[0]==tl)
+        if found!=expected:
+            missing = len(set(expected)-set(found))
+            mismatches.append(tl+": %d of %d signalized connections differ (%d found)" % (missing, len(expected), len(found)))
+    return mismatches
+
+def partitionModel(netconvert_binary, demand_file, n_partitions=N_PARTITIONS, partition_root=PARTITION_ROOT,
+                   controller_file=CONTROLLER_FILE, net_file=NET_FILE):
+    # writes one model folder per partition, returns the partition plan (also as Plan.json)
+    definitions = loadControllerDefinitions(controller_file)
+    junction_positions, edges, tl_junctions = loadNetworkGraph(net_file)
+    tl_partition = partitionIntersections({d["intersection_name"]: np.mean([junction_positions[j] for j in tl_junctions[d["intersection_name"]]], axis=0)
+                                           for d in definitions}, n_partitions)
+    edge_partition = assignEdges(edges, junction_positions, tl_junctions, tl_partition, definitions)
+    routes, vtypes = loadRoutesAndTypes(ROUTE_FILES+[demand_file])
+    segments = {route: cutRoute(route_edges, edge_partition) for route, route_edges in routes.items()}
+    vehicles = loadDemandVehicles(demand_file)
+    bus_stops = loadBusStops()
+    signal_programs = loadSignalizedConnections(net_file)
+    shutil.rmtree(partition_root, ignore_errors=True)
+    folders = []
+    for partition in range(0, n_partitions):
+        folder = os.path.abspath(partition_root+"/partition_"+str(partition))
+        os.makedirs(folder)
+        with open(folder+"/Edges.txt", "w") as f:
+            f.write("\n".join(edge for edge, p in edge_partition.items() if p==partition)+"\n")
+        subprocess.run([netconvert_binary, "-s", net_file, "--keep-edges.input-file", folder+"/Edges.txt",
+                        "-o", folder+"/Network.net.xml"], check=True, capture_output=True)
+        mismatches = compareSignalPrograms(signal_programs, loadSignalizedConnections(folder+"/Network.net.xml"),
+                                           [tl for tl, p in tl_partition.items() if p==partition])
+        if len(mismatches)>0:
+            raise ValueError("partition %d changes the signal programs the controllers rely on:\n" % partition+"\n".join(mismatches))
+        with open(folder+"/BusStops.add.xml", "w") as f:
+            f.write("<?xml version=\"1.0\" encoding=\"UTF-8\"?>\n\n<additional>\n")
+            for edge, elem in bus_stops.values():
+                if edge_partition.get(edge)==partition:
+                    f.write("    "+elem+"\n")
+            f.write("</additional>\n")
+        with open(folder+"/SignalControllers.json", "w") as f:
+            json.dump([d for d in definitions if tl_partition[d["intersection_name"]]==partition], f, indent=1)
+        writePartitionDemand(folder+"/Demand.rou.xml", vtypes, segments, partition, vehicles, bus_stops)
+        writePartitionConfiguration(folder+"/Configuration.sumocfg")
+        folders.append(folder)
+    plan = {"folders": folders, "demand_file": os.path.abspath(demand_file), "intersections": tl_partition, "segments": segments}
+    with open(os.path.abspath(partition_root)+"/Plan.json", "w") as f:
+        json.dump(plan, f)
+    return plan
+
+class PartitionedSimulation:
+    def __init__(self, sumo_binary, plan, control_mode, weights=None, seed=None, output_root=OUTPUT_ROOT,
+                 n_seconds=None, compress_output=False):
+        self.sumo_binary = sumo_binary
+        self.plan = plan
+        self.control_mode = control_mode
+        self.weights = weights
+        self.seed = seed
+        self.output_dirs = [output_root+"/partition_"+str(p) for p in range(0, len(plan["folders"]))]
+        self.n_seconds = n_seconds
+        self.compress_output = compress_output
+        self.segments = plan["segments"]
+        self.vehicles = {vehicle["id"]: vehicle for vehicle in loadDemandVehicles(plan["demand_file"])}
+        self.stop_edges = {stop: edge for stop, (edge, _) in loadBusStops().items()}
+        self.current_segments = {}
+        self.n_handovers = 0
+        self.instances = []
+
+    def start(self):
+        for partition, folder in enumerate(self.plan["folders"]):
+            label = "partition_"+str(partition)
+            sumo_cmd = buildSumoCommand(self.sumo_binary, None, self.output_dirs[partition], self.compress_output,
+                                        config_file=folder+"/Configuration.sumocfg")
+            traci.start(sumo_cmd, label=label)
+            instance = SimulationInstance(traci.getConnection(label), self.control_mode, weights=self.weights,
+                                          demand_file=folder+"/Demand.rou.xml", seed=self.seed,
+                                          controller_file=folder+"/SignalControllers.json", n_seconds=self.n_seconds,
+                                          collect_arrivals=True, verbose=False)
+            instance.prepare()
+            self.instances.append(instance)
+
+    def handOver(self):
+        # vehicles that arrived at the end of a segment continue on their next one
+        for instance in self.instances:
+            for v_id in instance.arrived_vehicles:
+                vehicle = self.vehicles.get(v_id)
+                if vehicle is None:
+                    continue
+                route_segments = self.segments[vehicle["route"]]
+                segment = self.current_segments.pop(v_id, 0)+1
+                if segment>=len(route_segments):
+                    continue
+                self.current_segments[v_id] = segment
+                partition, edges = route_segments[segment]
+                conn = self.instances[partition].conn
+                conn.vehicle.add(v_id, segmentRouteId(vehicle["route"], segment), typeID=vehicle["type"],
+                                 departLane="best", departSpeed="max")
+                for stop in vehicle["stops"]:
+                    if self.stop_edges[stop] in edges:
+                        conn.vehicle.setBusStop(v_id, stop, duration=BUS_STOP_DURATION)
+                self.n_handovers += 1
+            instance.arrived_vehicles = []
+
+    def run(self):
+        with ThreadPoolExecutor(max_workers=len(self.instances)) as executor:
+            running = True
+            while running:
+                # all partitions simulate the same second concurrently (GIL released while SUMO steps)
+                running = all(list(executor.map(lambda instance: instance.advance(1), self.instances)))
+                self.handOver()
+                t_ctr = self.instances[0].t_ctr
+                if t_ctr%3600==0:
+                    print(simulation_times[min(t_ctr, len(simulation_times)-1)], "HANDOVERS", self.n_handovers)
+
+    def close(self):
+        for instance in self.instances:
+            instance.close()
+
+def scoreFolders(folders):
+    # emissions and travel times summed over partitions; a vehicle's travel time is the sum
+    # of its segments, plus the insertion delays at the partition boundaries
+    objectives = {"goal": 0.0}
+    for pollutant in POLLUTANT_COLUMNS:
+        objectives[pollutant] = 0.0
+    trips = {}
+    for folder in folders:
+        total_emissions, df_emissions = determineEmissions(folder)
+        objectives["goal"] += total_emissions
+        for pollutant in POLLUTANT_COLUMNS:
+            objectives[pollutant] += float(df_emissions[pollutant].sum())
+        for trip, _ in iterTripInfos(findLog(folder, "TripInfos.xml")):
+            trips.setdefault(trip["id"], []).append(trip)
+    total_duration = 0.0
+    total_delay = 0.0
+    for trip_segments in trips.values():
+        trip_segments.sort(key=lambda trip: float(trip["depart"]))
+        boundary_delay = sum(float(trip["departDelay"]) for trip in trip_segments[1:])
+        total_duration += sum(float(trip["duration"]) for trip in trip_segments)+boundary_delay
+        total_delay += sum(float(trip["timeLoss"]) for trip in trip_segments)+boundary_delay
+    objectives["total_travel_time_h"] = total_duration/3600
+    objectives["total_delay_h"] = total_delay/3600
+    objectives["trips"] = len(trips)
+    return objectives
+
+def runMonolithic(sumo_binary, demand_file, control_mode, weights, seed, output_dir, n_seconds, compress_output):
+    traci.start(buildSumoCommand(sumo_binary, demand_file, output_dir, compress_output), label="monolithic")
+    instance = SimulationInstance(traci.getConnection("monolithic"), control_mode, weights=weights, demand_file=demand_file,
+                                  seed=seed, n_seconds=n_seconds, verbose=False)
+    instance.prepare()
+    instance.run()
+    instance.close()
+
+def defaultNetconvert(sumo_binary):
+    # netconvert of the same SUMO installation
+    folder, name = os.path.split(sumo_binary)
+    return os.path.join(folder, "netconvert"+(".exe" if name.endswith(".exe") else ""))
+
+
+
+
+# #############################################################################
+# ## MAIN CODE
+# #############################################################################
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run one simulation spatially partitioned over several SUMO processes.")
+    parser.add_argument("--sumo-path", required=True)
+    parser.add_argument("--netconvert-path", default=None, help="default: netconvert next to the sumo binary")
+    parser.add_argument("--demand-file", required=True, help="compiled with CompileDemand.py")
+    parser.add_argument("--partitions", type=int, default=N_PARTITIONS)
+    parser.add_argument("--controller", default="GREEN_PRESSURE", choices=["FIXED_CYCLE", "MAX_PRESSURE", "GREEN_PRESSURE"])
+    parser.add_argument("--weights", default="1,1,1,1,1")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--controller-config", default=CONTROLLER_FILE)
+    parser.add_argument("--duration", type=int, default=None, help="simulated seconds")
+    parser.add_argument("--compress-output", action="store_true")
+    parser.add_argument("--partition-root", default=PARTITION_ROOT)
+    parser.add_argument("--output-root", default=OUTPUT_ROOT)
+    parser.add_argument("--validate", action="store_true", help="also run monolithically and compare")
+    parser.add_argument("--tolerance", type=float, default=VALIDATION_TOLERANCE)
+    args = parser.parse_args()
+    netconvert_binary = args.netconvert_path or defaultNetconvert(args.sumo_path)
+    weights = parseWeights(args.weights)
+
+    plan = partitionModel(netconvert_binary, args.demand_file, args.partitions, args.partition_root, args.controller_config)
+    for partition, folder in enumerate(plan["folders"]):
+        print("PARTITION", partition, [name for name, p in plan["intersections"].items() if p==partition])
+    simulation = PartitionedSimulation(args.sumo_path, plan, args.controller, weights, args.seed, args.output_root,
+                                       args.duration, args.compress_output)
+    start = time.time()
+    simulation.start()
+    simulation.run()
+    simulation.close()
+    print("PARTITIONED RUN %.1fs, %d HANDOVERS" % (time.time()-start, simulation.n_handovers))
+    if not args.validate:
+        sys.exit(0)
+
+    start = time.time()
+    runMonolithic(args.sumo_path, os.path.abspath(args.demand_file), args.controller, weights, args.seed,
+                  args.output_root+"/monolithic", args.duration, args.compress_output)
+    print("MONOLITHIC RUN %.1fs" % (time.time()-start))
+    partitioned = scoreFolders(simulation.output_dirs)
+    monolithic = scoreFolders([args.output_root+"/monolithic"])
+    print("%-20s %16s %16s %10s" % ("METRIC", "MONOLITHIC", "PARTITIONED", "DEVIATION"))
+    failed = False
+    for metric in VALIDATION_METRICS:
+        deviation = (partitioned[metric]-monolithic[metric])/monolithic[metric] if monolithic[metric]!=0 else 0.0
+        failed = failed or abs(deviation)>args.tolerance
+        print("%-20s %16.2f %16.2f %9.2f%%" % (metric, monolithic[metric], partitioned[metric], deviation*100))
+    print("WARNING: DEVIATION ABOVE %.0f%%" % (args.tolerance*100) if failed else "PARTITIONED RUN MATCHES THE MONOLITHIC RUN")
+    sys.exit(1 if failed else 0)
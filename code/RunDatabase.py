@@ -0,0 +1,229 @@
+# #############################################################################
+# ####### GREEN-PRESSURE - EMISSION-REDUCING SIGNALIZED INTERSECTION MANAGEMENT
+# #######
+# #######     AUTHOR:       Kevin Riehl <kriehl@ethz.ch>
+# #######     YEAR :        2025
+# #######     ORGANIZATION: Traffic Engineering Group (SVT),
+# #######                   Institute for Transportation Planning and Systems,
+# #######                   ETH Zürich
+# #############################################################################
+"""
+This code contains the run database (SQLite) of the optimizers: one row per
+evaluated candidate with its weights, seed, fidelity, score, objective
+vector and runtime, plus its per-timestep emission series. Candidates
+aborted early (CandidatePruning.py) are kept as pruned rows without a
+score, so they never count as best but stay on record. Candidates accepted
+by sequential evaluation are recorded in their own table. Rows are only
+appended; the database runs in WAL mode, so parallel workers can write
+concurrently, and best-so-far queries are served from an index.
+"""
+
+
+
+
+# #############################################################################
+# ## IMPORTS
+# #############################################################################
+import argparse
+import ast
+import io
+import json
+import sqlite3
+import time
+import numpy as np
+import pandas as pd
+
+
+
+
+# #############################################################################
+# ## PARAMETERS
+# #############################################################################
+DATABASE_FILE = "run_database.sqlite"
+SERIES_COLUMNS = ["co2", "co", "hc", "NOx", "PMx", "goal"]
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS evaluations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    study TEXT NOT NULL,
+    iteration INTEGER,
+    weights TEXT NOT NULL,
+    seed INTEGER,
+    fidelity REAL NOT NULL DEFAULT 1.0,
+    score REAL,
+    new_best INTEGER NOT NULL DEFAULT 0,
+    objectives TEXT,
+    runtime_s REAL,
+    created REAL NOT NULL,
+    pruned INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_evaluations_best ON evaluations (study, fidelity, score);
+CREATE INDEX IF NOT EXISTS idx_evaluations_iteration ON evaluations (study, iteration);
+CREATE TABLE IF NOT EXISTS accepted (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    study TEXT NOT NULL,
+    iteration INTEGER,
+    weights TEXT NOT NULL,
+    created REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS emission_series (
+    evaluation_id INTEGER PRIMARY KEY REFERENCES evaluations(id),
+    times BLOB NOT NULL,
+    values_ BLOB NOT NULL
+);
+"""
+
+
+
+
+# #############################################################################
+# ## METHODS
+# #############################################################################
+
+def arrayToBlob(array):
+    buffer = io.BytesIO()
+    np.save(buffer, array, allow_pickle=False)
+    return buffer.getvalue()
+
+def blobToArray(blob):
+    return np.load(io.BytesIO(blob), allow_pickle=False)
+
+class RunDatabase:
+    def __init__(self, file=DATABASE_FILE, timeout=60):
+        self.file = file
+        self.connection = sqlite3.connect(file, timeout=timeout, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+        # databases created before pruning was introduced
+        columns = [r[1] for r in self.connection.execute("PRAGMA table_info(evaluations)").fetchall()]
+        if "pruned" not in columns:
+            self.connection.execute("ALTER TABLE evaluations ADD COLUMN pruned INTEGER NOT NULL DEFAULT 0")
+
+    def close(self):
+        self.connection.close()
+
+    def addEvaluation(self, study, weights, objectives=None, score=None, iteration=None, seed=None, fidelity=1.0,
+                      new_best=False, runtime_s=None, df_emissions=None, pruned=False):
+        if score is None and objectives is not None and not pruned:
+            score = objectives.get("goal")
+        cursor = self.connection.cursor()
+        # BEGIN IMMEDIATE takes the write lock up front, concurrent writers wait (timeout) instead of failing
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            cursor.execute("INSERT INTO evaluations (study, iteration, weights, seed, fidelity, score, new_best, objectives, runtime_s, created, pruned) "
+                           "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                           (study, iteration, json.dumps([float(w) for w in weights]), seed, fidelity,
+                            None if score is None else float(score), int(bool(new_best)),
+                            None if objectives is None else json.dumps(objectives), runtime_s, time.time(), int(bool(pruned))))
+            evaluation_id = cursor.lastrowid
+            if df_emissions is not None:
+                times = np.asarray(df_emissions["time"], dtype=np.float64)
+                values = np.asarray(df_emissions[SERIES_COLUMNS], dtype=np.float64)
+                cursor.execute("INSERT INTO emission_series (evaluation_id, times, values_) VALUES (?, ?, ?)",
+                               (evaluation_id, arrayToBlob(times), arrayToBlob(values)))
+            cursor.execute("COMMIT")
+        except Exception:
+            cursor.execute("ROLLBACK")
+            raise
+        return evaluation_id
+
+    def best(self, study, n=1, fidelity=None):
+        # lowest scores of a study (optionally of one fidelity only), from the index
+        query = "SELECT id, iteration, weights, seed, fidelity, score FROM evaluations WHERE study=? AND score IS NOT NULL"
+        parameters = [study]
+        if fidelity is not None:
+            query += " AND fidelity=?"
+            parameters.append(fidelity)
+        rows = self.connection.execute(query+" ORDER BY score ASC LIMIT ?", parameters+[n]).fetchall()
+        return [{"id": r[0], "iteration": r[1], "weights": json.loads(r[2]), "seed": r[3], "fidelity": r[4], "score": r[5]} for r in rows]
+
+    def seedScores(self, study, weights, fidelity=1.0):
+        # seed -> score of all evaluations of exactly these weights (weights are stored as JSON)
+        rows = self.connection.execute("SELECT seed, score FROM evaluations WHERE study=? AND weights=? AND fidelity=? AND seed IS NOT NULL AND score IS NOT NULL ORDER BY id",
+                                       (study, json.dumps([float(w) for w in weights]), fidelity)).fetchall()
+        return {r[0]: r[1] for r in rows}
+
+    def incumbent(self, study):
+        # weights of the latest accepted candidate (markBest), else of the latest new_best evaluation
+        # (databases of single runs), or None; the incumbent's seeds can be run after its successor's,
+        # so the candidate evaluated first most recently is taken
+        row = self.connection.execute("SELECT weights FROM accepted WHERE study=? ORDER BY id DESC LIMIT 1", (study,)).fetchone()
+        if row is None:
+            row = self.connection.execute("SELECT weights FROM evaluations WHERE study=? AND new_best=1 GROUP BY weights ORDER BY MIN(id) DESC LIMIT 1", (study,)).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def seedEmissionSeries(self, study, weights, fidelity=1.0):
+        # seed -> emission series of the scored evaluations of exactly these weights
+        rows = self.connection.execute("SELECT e.seed, e.id FROM evaluations e JOIN emission_series s ON s.evaluation_id=e.id "
+                                       "WHERE e.study=? AND e.weights=? AND e.fidelity=? AND e.score IS NOT NULL ORDER BY e.id",
+                                       (study, json.dumps([float(w) for w in weights]), fidelity)).fetchall()
+        return {seed: self.emissionSeries(evaluation_id) for seed, evaluation_id in rows}
+
+    def countPruned(self, study):
+        return self.connection.execute("SELECT COUNT(*) FROM evaluations WHERE study=? AND pruned=1", (study,)).fetchone()[0]
+
+    def markBest(self, study, weights, iteration=None):
+        # records the acceptance of a candidate, its evaluations are left as they are
+        self.connection.execute("INSERT INTO accepted (study, iteration, weights, created) VALUES (?, ?, ?, ?)",
+                                (study, iteration, json.dumps([float(w) for w in weights]), time.time()))
+
+    def lastIteration(self, study):
+        row = self.connection.execute("SELECT MAX(iteration) FROM evaluations WHERE study=?", (study,)).fetchone()
+        return row[0]
+
+    def countEvaluations(self, study):
+        return self.connection.execute("SELECT COUNT(*) FROM evaluations WHERE study=?", (study,)).fetchone()[0]
+
+    def evaluations(self, study=None):
+        query = "SELECT id, study, iteration, weights, seed, fidelity, score, new_best, objectives, runtime_s, created, pruned FROM evaluations"
+        parameters = []
+        if study is not None:
+            query += " WHERE study=?"
+            parameters.append(study)
+        df = pd.read_sql_query(query+" ORDER BY id", self.connection, params=parameters)
+        df["weights"] = df["weights"].apply(json.loads)
+        df["objectives"] = df["objectives"].apply(lambda o: json.loads(o) if o is not None else {})
+        return df
+
+    def emissionSeries(self, evaluation_id):
+        row = self.connection.execute("SELECT times, values_ FROM emission_series WHERE evaluation_id=?", (evaluation_id,)).fetchone()
+        if row is None:
+            return None
+        df_emissions = pd.DataFrame(blobToArray(row[1]), columns=SERIES_COLUMNS)
+        df_emissions.insert(0, "time", blobToArray(row[0]))
+        return df_emissions
+
+    def importLegacyLog(self, study, file="nash_optim_log.txt"):
+        # tab separated lines of NASH_Optimizer.py: iteration, new_best, score, weights
+        n_imported = 0
+        f = open(file, "r")
+        for line in f:
+            parts = line.rstrip("\n").split("\t")
+            if len(parts)<4:
+                continue
+            self.addEvaluation(study, ast.literal_eval(parts[3]), score=float(parts[2]), iteration=int(parts[0]),
+                               new_best=parts[1]=="True")
+            n_imported += 1
+        f.close()
+        return n_imported
+
+
+
+
+# #############################################################################
+# ## MAIN CODE
+# #############################################################################
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect the optimizer run database.")
+    parser.add_argument("--database", default=DATABASE_FILE)
+    parser.add_argument("--study", default="nash")
+    parser.add_argument("--best", type=int, default=10, help="print the n best evaluations")
+    parser.add_argument("--import-log", default=None, help="import a legacy nash_optim_log.txt into the study")
+    args = parser.parse_args()
+    database = RunDatabase(args.database)
+    if args.import_log is not None:
+        print("IMPORTED", database.importLegacyLog(args.study, args.import_log), "EVALUATIONS")
+    print("EVALUATIONS", database.countEvaluations(args.study), "PRUNED", database.countPruned(args.study))
+    for row in database.best(args.study, args.best):
+        print(row)
+    database.close()
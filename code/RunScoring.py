@@ -0,0 +1,142 @@
+# #############################################################################
+# ####### GREEN-PRESSURE - EMISSION-REDUCING SIGNALIZED INTERSECTION MANAGEMENT
+# #######
+# #######     AUTHOR:       Kevin Riehl <kriehl@ethz.ch>
+# #######     YEAR :        2025
+# #######     ORGANIZATION: Traffic Engineering Group (SVT),
+# #######                   Institute for Transportation Planning and Systems,
+# #######                   ETH Zürich
+# #############################################################################
+"""
+This code scores a finished simulation run with a full objective vector
+(emissions per pollutant, weighted emission goal, travel time and delay per
+vehicle class) from a single pass over Emissions.xml and TripInfos.xml. The
+objective vectors of all optimizer candidates (stored in the run database)
+can be re-scalarized and their Pareto front evaluated without re-simulating.
+If the run was analyzed while it ran (SegmentedAnalysis.py), its emission
+series is taken from there instead of parsing Emissions.xml again.
+"""
+
+
+
+
+# #############################################################################
+# ## IMPORTS
+# #############################################################################
+import argparse
+import json
+import pandas as pd
+from EmissionLogs import determineEmissions, findLog, POLLUTANT_COLUMNS
+from TripInfoAnalytics import summarizeTripInfos
+from VehicleRegistry import VEHICLE_CLASSES
+from RunDatabase import RunDatabase, DATABASE_FILE
+from SegmentedAnalysis import loadEmissionSeries
+
+
+
+
+# #############################################################################
+# ## PARAMETERS
+# #############################################################################
+PARETO_OBJECTIVES = ["goal", "total_travel_time_h"]
+
+
+
+
+# #############################################################################
+# ## METHODS
+# #############################################################################
+
+def scoreRun(folder="../model/logs"):
+    segmented = loadEmissionSeries(folder, findLog(folder, "Emissions.xml"))
+    total_emissions, df_emissions = segmented if segmented is not None else determineEmissions(folder)
+    objectives = {"goal": total_emissions}
+    for pollutant in POLLUTANT_COLUMNS:
+        objectives[pollutant] = float(df_emissions[pollutant].sum())
+    summary = summarizeTripInfos(findLog(folder, "TripInfos.xml"))
+    total_duration = 0.0
+    total_delay = 0.0
+    for vehicle_class in VEHICLE_CLASSES:
+        if vehicle_class not in summary.classes:
+            continue
+        duration = summary.classes[vehicle_class]["duration"]
+        delay = summary.classes[vehicle_class]["timeLoss"]
+        objectives["travel_time_"+vehicle_class] = duration.mean()
+        objectives["delay_"+vehicle_class] = delay.mean()
+        total_duration += duration.total
+        total_delay += delay.total
+    objectives["total_travel_time_h"] = total_duration/3600
+    objectives["total_delay_h"] = total_delay/3600
+    return objectives, df_emissions
+
+def dominates(a, b, keys):
+    return all(a[k]<=b[k] for k in keys) and any(a[k]<b[k] for k in keys)
+
+class ParetoArchive:
+    """
+    Holds evaluated candidates (weights + objective vector) and maintains the
+    non-dominated front over the objectives in keys (all minimized).
+    """
+    def __init__(self, evaluations=(), keys=PARETO_OBJECTIVES):
+        self.keys = keys
+        self.evaluations = []
+        self.front = []
+        for evaluation in evaluations:
+            self.insert(evaluation)
+
+    @classmethod
+    def fromDatabase(cls, database, study, keys=PARETO_OBJECTIVES):
+        df = database.evaluations(study)
+        return cls([{"iteration": r.iteration, "weights": r.weights, "objectives": r.objectives} for r in df.itertuples()], keys)
+
+    def insert(self, evaluation):
+        self.evaluations.append(evaluation)
+        objectives = evaluation["objectives"]
+        if not all(k in objectives for k in self.keys):
+            return False
+        if any(dominates(e["objectives"], objectives, self.keys) for e in self.front):
+            return False
+        self.front = [e for e in self.front if not dominates(objectives, e["objectives"], self.keys)]
+        self.front.append(evaluation)
+        return True
+
+    def add(self, weights, objectives, iteration=None):
+        return self.insert({"iteration": iteration, "weights": list(weights), "objectives": objectives})
+
+    def scalarize(self, objective_weights):
+        # ranks all past evaluations by sum(weight * objective), best first
+        rows = []
+        for evaluation in self.evaluations:
+            objectives = evaluation["objectives"]
+            score = sum(w*objectives.get(k, float("nan")) for k, w in objective_weights.items())
+            rows.append({"iteration": evaluation["iteration"], "weights": evaluation["weights"], "score": score, **objectives})
+        return pd.DataFrame(rows).sort_values("score").reset_index(drop=True)
+
+    def frontTable(self):
+        rows = [{"iteration": e["iteration"], "weights": e["weights"], **e["objectives"]} for e in self.front]
+        return pd.DataFrame(rows).sort_values(self.keys[0]).reset_index(drop=True)
+
+
+
+
+# #############################################################################
+# ## MAIN CODE
+# #############################################################################
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score a run, or re-scalarize all archived optimizer candidates.")
+    parser.add_argument("--folder", default=None, help="log folder of a finished run to score")
+    parser.add_argument("--database", default=DATABASE_FILE)
+    parser.add_argument("--study", default="nash")
+    parser.add_argument("--scalarization", default=None,
+                        help="objective weights, e.g. \"goal=1,total_travel_time_h=500\"")
+    parser.add_argument("--pareto", action="store_true", help="print the Pareto front of the archive")
+    args = parser.parse_args()
+    if args.folder is not None:
+        objectives, _ = scoreRun(args.folder)
+        print(json.dumps(objectives, indent=1))
+    archive = ParetoArchive.fromDatabase(RunDatabase(args.database), args.study)
+    if args.scalarization is not None:
+        objective_weights = {k: float(v) for k, v in (p.split("=") for p in args.scalarization.split(","))}
+        print(archive.scalarize(objective_weights).head(10).to_string())
+    if args.pareto:
+        print(archive.frontTable().to_string())
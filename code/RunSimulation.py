@@ -10,6 +10,13 @@
 """
 This code will run a microsimulation with the Green-Pressure
 signal controller and generate relevant log files.
+
+It is the command line entry point with the subcommands run (one
+simulation), sweep (many simulations, see AsyncOrchestrator.py), parse-logs
+(score log folders, see RunScoring.py) and heatmap (see
+figures/emission_heatmap_batch.py). Arguments are validated before the
+heavy modules (pandas, numpy, traci) are imported, and only those of the
+chosen subcommand are. Without a subcommand, "run" is assumed.
 """
 
 
@@ -20,75 +27,10 @@ signal controller and generate relevant log files.
 # #############################################################################
 import os
 import sys
-import traci
+import argparse
+import subprocess
 import time
-import pandas as pd
-import numpy as np
-from datetime import datetime, timedelta
-import random
-import warnings
-if 'SUMO_HOME' in os.environ:
-    sys.path.append(os.path.join(os.environ['SUMO_HOME'], 'tools'))
-warnings.filterwarnings("ignore")
-
-
-
-
-# #############################################################################
-# ## RUN ARGUMENTS & PARSING
-# #############################################################################
-
-def printHelpStatement():
-    print("============================================================")
-    print("SUMO MICROSIMULATION \"GREEN-PRESSURE - EMISSION-REDUCING SIGNALIZED INTERSECTION MANAGEMENT\"")
-    print("by Kevin Riehl 2025 (IVT, ETH Zürich) <kriehl@ethz.ch>")
-    print("============================================================")
-    print("This code will run a microsimulation with the Green-Pressure\nsignal controller and generate relevant log files.")
-    print("============================================================")
-    print("Usage: python RunSimulation.py --sumo-path [A] --controller [B] --weights [C]")
-    print("\t[A] path to SUMO installation directory")
-    print("\t[B] control algorithm,\n\tOptions: \"FIXED_CYCLE\", \"MAX_PRESSURE\", \"GREEN_PRESSURE\"")
-    print("\t[C] weights for Green-Pressure Controller,\n\tTo be provided as String with no spaces!,\n\te.g. \"1.0,2.0,3.0,4.0,5.0\"")
-    print("============================================================")
-args = sys.argv
-if "help" or "--h" or "--help" in args:
-    printHelpStatement()
-    sys.exit(0)
-if len(args)>=3:
-    if args[1]=="--sumo-path":
-        sumoBinary = args[2]
-    else:
-        print("WRONG INPUT")
-        printHelpStatement()
-        sys.exit(0)
-else:
-    printHelpStatement()
-    sys.exit(0)
-if len(args)>=5:
-    if args[3]=="--controller":
-        CONTROL_MODE = args[4]
-        if not CONTROL_MODE in ["FIXED_CYCLE", "MAX_PRESSURE", "GREEN_PRESSURE"]:
-            print("WRONG controller!")
-            printHelpStatement()
-            sys.exit(0)
-weightsString="1,1,1,1,1"
-if len(args)>=7:
-    args = sys.argv 
-    if args[5]=="--weights":
-        weightsString = args[6]
-try:
-    weights_parts = weightsString.split(",")
-    weights_parts = [float(w) for w in weights_parts]
-    WEIGHTS_GREEN_PRESSURE = {"car": weights_parts[0], "moc": weights_parts[1], "lwt": weights_parts[2], "hwt": weights_parts[3], "bus": weights_parts[4]}
-except:
-    print("WRONG WEIGHTS")
-    printHelpStatement()
-    sys.exit(0)
-# if DEBUG_GUI:
-#     sumoBinary = "C:/Users/kriehl/AppData/Local/sumo-1.19.0/bin/sumo-gui.exe"
-# else:
-#     sumoBinary = "C:/Users/kriehl/AppData/Local/sumo-1.19.0/bin/sumo.exe"
-# CONTROL_MODE = "MAX_PRESSURE" # FIXED_CYCLE, MAX_PRESSURE, GREEN_PRESSURE
+from ControllerDefinitions import CONTROLLER_FILE, PRESSURE_MODES
 
 
 
@@ -96,28 +38,10 @@ except:
 # #############################################################################
 # ## PARAMETERS
 # #############################################################################
-
-# SIMULATION PARAMETER
-    # TIME PARAMETER
-SIMULATION_STEPS_PER_SECOND = 4
-SIMULATION_WAIT_TIME = 0
-start_time = datetime.strptime("2024-03-04 09:15:00", "%Y-%m-%d %H:%M:%S")
-end_time = datetime.strptime("2024-03-04 23:00:00", "%Y-%m-%d %H:%M:%S")
-simulation_times = [dt.strftime("%Y-%m-%d %H:%M:%S") for dt in [start_time + timedelta(seconds=i) for i in range(int((end_time - start_time).total_seconds()) + 1)]]
-    # PUBLIC TRANSPORT PARAMETER
-BUS_STOP_DURATION = 20 # SECS
-    # SIGNAL CONTROL PARAMETER
-T_A = 5
-T_L = 3
-G_T_MIN = 5
-G_T_MAX = 50
-WEIGHTS_MAX_PRESSURE = {"car": 1.0, "moc": 1.0, "lwt": 1.0, "hwt": 1.0, "bus": 1.0}
-# WEIGHTS_GREEN_PRESSURE = {"car": 1.0, "moc": 1.0, "lwt": 1.0, "hwt": 1.0, "bus": 1.0}
-    # DEBUGGING
-DEBUG_CONTROLLER_LOG = "NONE"# "intersection2"
-DEBUG_SPAWN_LOG = False
-DEBUG_TIME = True
-DEBUG_GUI = False
+CONTROLLERS = ["FIXED_CYCLE", "MAX_PRESSURE", "GREEN_PRESSURE"]
+WEIGHT_CLASSES = ["car", "moc", "lwt", "hwt", "bus"]
+SUBCOMMANDS = ["run", "sweep", "parse-logs", "heatmap"]
+HEATMAP_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "figures", "emission_heatmap_batch.py")
 
 
 
@@ -126,258 +50,142 @@ DEBUG_GUI = False
 # ## METHODS
 # #############################################################################
 
-def loadEmissionClassesFromFile(file="../data/Emission_VehiclePopulation.xlsx"):
-    df_emissions_car = pd.read_excel(file, sheet_name="hb_passenger_car")
-    df_emissions_moc = pd.read_excel(file, sheet_name="hb_motor_cycle")
-    df_emissions_lwt = pd.read_excel(file, sheet_name="hb_transporter")
-    df_emissions_hwt = pd.read_excel(file, sheet_name="hb_truck")
-    df_emissions_bus = pd.read_excel(file, sheet_name="hb_bus")
-    rel_columns = ["fleet_share_2022", "sumo_emission_class"]
-    df_emissions_car = df_emissions_car[rel_columns]
-    df_emissions_moc = df_emissions_moc[rel_columns]
-    df_emissions_lwt = df_emissions_lwt[rel_columns]
-    df_emissions_hwt = df_emissions_hwt[rel_columns]
-    df_emissions_bus = df_emissions_bus[rel_columns]
-    emission_model = {"car": df_emissions_car, 
-                      "moc": df_emissions_moc, 
-                      "lwt": df_emissions_lwt, 
-                      "hwt": df_emissions_hwt, 
-                      "bus": df_emissions_bus}
-    return emission_model   
-
-def getRandomEmissionClass(vehicle_class, emission_model):    
-    probs = [v for v in emission_model[vehicle_class]["fleet_share_2022"]]
-    probs = [p/sum(probs) for p in probs]
-    vals  = ["HBEFA4/"+v for v in emission_model[vehicle_class]["sumo_emission_class"]]
-    random_emission_class = np.random.choice(vals, size=1, p=probs)[0]
-    return random_emission_class
-
-def getRandomVehicleClass(no_truck=False):
-    probs = [0.81, 0.082, 0.046, 0.062]
-    vals = ["car", "moc", "lwt", "hwt"]
-    random_vehicle_class = np.random.choice(vals, size=1, p=probs)[0]
-    while no_truck and random_vehicle_class=="hwt":
-        random_vehicle_class = np.random.choice(vals, size=1, p=probs)[0]
-    return random_vehicle_class
-
-def determineWhetherTruckBannedRoute(desired_route):
-    route_entrance = desired_route.split("_")[1]
-    route_exit = desired_route.split("_")[2]
-    selected_entrances = ["E21", "E22", "E24", "E25", "E20", "E3", "E4", "E5", "E1", "E2", "E6", "E7", "E12", "E13"]
-    selected_exits = ["A1", "A2", "A3", "A16", "A18", "A15"]
-    if route_entrance in selected_entrances and route_exit in selected_exits:
-        return False
-    return True
-
-sumo_vehicle_types = {
-    "car": "sumo_car",
-    "moc": "sumo_motorcycle",
-    "lwt": "sumo_transporter",
-    "hwt": "sumo_truck",
-    "bus": "sumo_bus",
-}
-
-def spawnRandomVehicle(veh_ctr, desired_route):
-    # determine vehicle characteristics
-    new_vehicle_id = "VEH_"+str(veh_ctr)
-    no_truck = determineWhetherTruckBannedRoute(desired_route)
-    vehicle_class = getRandomVehicleClass(no_truck)
-    emission_class = getRandomEmissionClass(vehicle_class, emission_model)
-    vehicle_type = sumo_vehicle_types[vehicle_class]
-    # add vehicle with traci
-    traci.vehicle.add(new_vehicle_id, desired_route, typeID=vehicle_type)
-    traci.vehicle.setEmissionClass(new_vehicle_id, emission_class)
-    if DEBUG_SPAWN_LOG:
-        print(new_vehicle_id, no_truck, vehicle_class, emission_class, vehicle_type)
-    veh_routes[new_vehicle_id] = desired_route
-    veh_classes[new_vehicle_id] = vehicle_class
-    
-def spawnRandomBus(veh_ctr, desired_route, stops):
-    # determine vehicle characteristics
-    new_vehicle_id = "BUS_"+str(veh_ctr)+"-"+desired_route
-    vehicle_class = "bus"
-    emission_class = getRandomEmissionClass(vehicle_class, emission_model)
-    vehicle_type = sumo_vehicle_types[vehicle_class]
-    # add vehicle with traci
-    traci.vehicle.add(new_vehicle_id, desired_route, typeID=vehicle_type)
-    traci.vehicle.setEmissionClass(new_vehicle_id, emission_class)
-    for stop in stops.split("-"):
-        traci.vehicle.setBusStop(new_vehicle_id, stop, duration=BUS_STOP_DURATION)    
-    if DEBUG_SPAWN_LOG:
-        print(new_vehicle_id, False, vehicle_class, emission_class, vehicle_type)
-    veh_routes[new_vehicle_id] = desired_route
-    veh_classes[new_vehicle_id] = vehicle_class
-
-def determine_current_state():
-    current_vehicles = traci.vehicle.getIDList()
-    if len(current_vehicles)==0:
-        print(">> NOTHING, so no state")
-        return None, None
-    current_lanes = [traci.vehicle.getLaneID(v_id) for v_id in current_vehicles]
-    new_current_lanes = []
-    for v_ctr in range(0, len(current_vehicles)):
-        if not current_lanes[v_ctr].startswith(":"):
-            new_current_lanes.append(current_lanes[v_ctr])
-        else:
-            v_id = current_vehicles[v_ctr]
-            v_route = traci.vehicle.getRoute(v_id)
-            v_current_edge_index = traci.vehicle.getRouteIndex(v_id)
-            v_current_edge = v_route[v_current_edge_index]
-            new_current_lanes.append("@"+v_current_edge)
-    df_current_status = pd.DataFrame(np.asarray([current_vehicles, new_current_lanes]).transpose(), columns=["veh_id", "lane"])
-    df_current_status["class"] = df_current_status["veh_id"].map(veh_classes)
-    if CONTROL_MODE=="MAX_PRESSURE":
-        df_current_status["weight"] = df_current_status["class"].map(WEIGHTS_MAX_PRESSURE)
-    else:
-        df_current_status["weight"] = df_current_status["class"].map(WEIGHTS_GREEN_PRESSURE)
-    df_hidden_vehicles = df_current_status[df_current_status["lane"].str.startswith("@")]
-    df_hidden_vehicles["edge"] = df_hidden_vehicles["lane"].str.replace("@","")
-    return df_current_status, df_hidden_vehicles
-
-class SignalController:
-    def __init__(self, intersection_name, phases, links, multiplier=None):
-        self.intersection_name = intersection_name
-        self.phases = phases
-        self.links = links
-        self.current_gt_start = 0
-        self.current_phase = self.phases[0]
-        self.next_phase = -1
-        self.current_state = "start"
-        self.timer = -1
-        self.pressures = []
-        self.multiplier = multiplier
-        
-    def doSignalLogic(self):
-        self.timer += 1
-        self.determinePressures()
-        if self.intersection_name==DEBUG_CONTROLLER_LOG:
-            print("")
-            print(self.current_state, self.timer, "State:", self.current_phase, self.pressures, traci.simulation.getTime()-self.current_gt_start)
-        if self.current_state == "start":
-            if self.timer==G_T_MIN:
-                self.current_state="check_pressures"
-                self.timer = -1
-            else:
-                pass
-        elif self.current_state=="check_pressures":
-            current_pressure = self.pressures[int(self.current_phase/2)]
-            other_pressures = max(self.pressures)
-            if current_pressure < other_pressures:
-                self.current_state="next_phase"
-                self.timer = -1
-            else:
-                self.current_state="wait"
-                self.timer = -1
-        elif self.current_state=="wait":
-            if self.timer==T_A:
-                current_gt = traci.simulation.getTime()-self.current_gt_start
-                if current_gt > G_T_MAX:
-                    self.current_state = "next_phase"
-                    self.timer = -1
-                else:
-                    self.current_state="check_pressures"
-                    self.timer = -1
-            else:
-                pass
-        elif self.current_state=="next_phase":
-            valid_indices = [i for i in range(len(self.pressures)) if i != int(self.current_phase/2)]
-            max_pressure = max(self.pressures[i] for i in valid_indices)
-            max_indices = [i for i in valid_indices if self.pressures[i] == max_pressure]
-            self.next_phase = int(random.choice(max_indices)*2)
-            self.current_phase += 1
-            if self.intersection_name==DEBUG_CONTROLLER_LOG:
-                print(">>\t", self.current_phase, max_pressure, max_indices, valid_indices, self.current_phase, self.next_phase)
-            self.timer = -1
-            self.current_state="transition"
-        elif self.current_state=="transition":
-            if self.timer==T_L:
-                self.current_phase = self.next_phase 
-                self.next_phase = -1
-                self.timer = -1
-                self.current_state = "start"
-                self.current_gt_start = traci.simulation.getTime()
-            else:
-                pass
-        else:
-            print("WARNING UNKNOWN STATE", self.current_state)
-        if self.intersection_name==DEBUG_CONTROLLER_LOG:
-            print(self.current_state, self.timer, "State:", self.current_phase, self.pressures, traci.simulation.getTime()-self.current_gt_start)
-            print("")
-        self.setSignalOnTrafficLights()
-            
-    def determinePressures(self):
-        if df_current_status is None:
-            self.pressures = [0 for p in self.links]
-            return
-        self.pressures = []
-        for link in self.links:
-            lanes = self.links[link]
-            df_vehicles = []
-            # based on lane
-            if type(df_vehicles)==list:
-                df_vehicles = df_current_status[df_current_status["lane"].isin(lanes)]
-            else:
-                df_vehicles = pd.concat((df_vehicles, df_current_status[df_current_status["lane"].isin(lanes)]))
-            # based on hidden on intersection
-            edges = [l.split("_")[0] for l in lanes]
-            hits = df_hidden_vehicles[df_hidden_vehicles["edge"].isin(edges)]
-            if len(hits)>0:
-                if type(df_vehicles)==list:
-                    df_vehicles = df_hidden_vehicles[df_hidden_vehicles["edge"].isin(edges)]
-                else:
-                    df_vehicles = pd.concat((df_vehicles, df_hidden_vehicles[df_hidden_vehicles["edge"].isin(edges)][["veh_id", "lane", "class", "weight"]]))
-            pressure = 0 
-            if len(df_vehicles)>0:
-                pressure = sum(df_vehicles["weight"])
-            # multiplier
-            if self.multiplier is not None:
-                if link in self.multiplier:
-                    pressure *= self.multiplier[link]
-            self.pressures.append(pressure)
-    
-    def setSignalOnTrafficLights(self):
-        traci.trafficlight.setPhase(self.intersection_name, self.current_phase)
-        
-controller1 = SignalController(
-    intersection_name = "intersection1",
-    phases = [0, 2, 4],
-    links = {0:["921020465#1_3", "921020465#1_2", "921020465#1_2", "921020464#0_1", "921020464#1_1", "38361907_3", "38361907_2", "-1164287131#1_3", "-1164287131#1_2"], 
-             2:["-1169441386_2", "-1169441386_1", "-331752492#1_2", "-331752492#1_1", "-331752492#0_1", "-331752492#0_2"], 
-             4:["-183419042#1_1", "26249185#30_1", "26249185#30_2", "26249185#1_1", "26249185#1_2"]},
-    )
-
-controller2 = SignalController(
-    intersection_name = "intersection2",
-    phases = [0, 2, 4],
-    links = {0:["183049933#0_1", "-38361908#1_1"], 
-             2:["-38361908#1_1", "-38361908#1_2"], 
-             4:["-25973410#1_1", "758088375#0_1", "758088375#0_2"]}
-    )
-
-controller3 = SignalController(
-    intersection_name = "intersection3",
-    phases = [0, 2, 4],
-    links = {0:["E3_1", "-758088377#1_1", "-758088377#1_2", "-E1_1", "-E1_2"], 
-             2:["E3_1", "E3_2"], 
-             4:["-758088377#1_1", "-E1_1", "-E4_1", "-E4_2"]}
-    )
-
-controller4 = SignalController(
-    intersection_name = "intersection4",
-    phases = [0, 2],
-    links = {0:["22889927#0_1", "758088377#2_1", "-22889927#2_1"], 
-             2:["-25576697#0_1"]}
-    )
-
-controller5 = SignalController(
-    intersection_name = "intersection5",
-    phases = [0, 2, 4],
-    links = {0:["E6_1", "E6_2", "E5_1", "130569446_1", "E15_1", "E15_2"], 
-             2:["E15_2", "E6_3", "E5_2", "130569446_2"],
-             4:["E10_1", "E9_1",  "1162834479#1_1", "-208691154#0_1", "-208691154#1_1"]},
-    # multiplier={2:5}
-    )
-signal_controllers = [controller1, controller2, controller3, controller4, controller5]
+def weightsArgument(weights_string):
+    # "car,moc,lwt,hwt,bus", five non-negative numbers without spaces
+    try:
+        weights_parts = [float(w) for w in weights_string.split(",")]
+    except ValueError:
+        raise argparse.ArgumentTypeError("weights must be numbers, e.g. \"1.0,2.0,3.0,4.0,5.0\"")
+    if len(weights_parts)!=len(WEIGHT_CLASSES) or min(weights_parts)<0:
+        raise argparse.ArgumentTypeError("weights must be five non-negative numbers (car,moc,lwt,hwt,bus)")
+    return weights_string
+
+def weightsDictionary(weights_string):
+    return dict(zip(WEIGHT_CLASSES, [float(w) for w in weights_string.split(",")]))
+
+def addSimulationArguments(parser):
+    parser.add_argument("--demand-file", default=None, help="route file compiled with CompileDemand.py, replaces spawning vehicles and busses through TraCI")
+    parser.add_argument("--controller-config", default=CONTROLLER_FILE, help="controller definitions and timing")
+    parser.add_argument("--duration", type=int, default=None, help="number of simulated seconds (default: 09:15 to 23:00)")
+    parser.add_argument("--pressure-mode", default="queue", choices=PRESSURE_MODES,
+                        help="weighted upstream queues, or weighted upstream minus downstream queues (true Max-Pressure)")
+    parser.add_argument("--adaptive-steps", action="store_true",
+                        help="advance several seconds at once while the network is empty and no controller decision or spawn is due")
+    parser.add_argument("--compress-output", action="store_true", help="write the log files gzip compressed (*.xml.gz)")
+
+def buildParser():
+    parser = argparse.ArgumentParser(prog="RunSimulation.py",
+        description="SUMO microsimulation \"Green-Pressure - Emission-Reducing Signalized Intersection Management\", "
+                    "by Kevin Riehl 2025 (IVT, ETH Zürich) <kriehl@ethz.ch>")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    # RUN
+    run_parser = subparsers.add_parser("run", help="run one microsimulation and generate its log files")
+    run_parser.add_argument("--sumo-path", required=True, help="path to the SUMO binary")
+    run_parser.add_argument("--controller", required=True, choices=CONTROLLERS, help="control algorithm")
+    run_parser.add_argument("--weights", type=weightsArgument, default="1,1,1,1,1", help="weights for the Green-Pressure controller, e.g. \"1.0,2.0,3.0,4.0,5.0\"")
+    run_parser.add_argument("--seed", type=int, default=None, help="random seed for vehicle classes and controller tie-breaks")
+    run_parser.add_argument("--record-trajectory", default=None, help="file to record vehicle positions and signal states into, for gif_animation/RenderTrajectoryFrames.py")
+    run_parser.add_argument("--phase-log", default=None, help="CSV file to log every signal phase change into")
+    run_parser.add_argument("--output-dir", default=None, help="folder for the log files instead of \"../model/logs\"")
+    run_parser.add_argument("--segment-seconds", type=int, default=None,
+                            help="analyze Emissions.xml in segments of this many simulated seconds while the simulation runs (SegmentedAnalysis.py)")
+    addSimulationArguments(run_parser)
+    # SWEEP
+    sweep_parser = subparsers.add_parser("sweep", help="run controllers x weights x seeds from one process (AsyncOrchestrator.py)")
+    sweep_parser.add_argument("--sumo-path", required=True, help="path to the (headless) SUMO binary")
+    sweep_parser.add_argument("--controllers", nargs="+", default=["GREEN_PRESSURE"], choices=CONTROLLERS)
+    sweep_parser.add_argument("--weights", nargs="+", type=weightsArgument, default=["1,1,1,1,1"])
+    sweep_parser.add_argument("--seeds", type=int, nargs="+", default=[42])
+    sweep_parser.add_argument("--parallel", type=int, default=None, help="concurrent SUMO instances")
+    sweep_parser.add_argument("--output-root", default="../model/logs_orchestrated")
+    sweep_parser.add_argument("--results", default="orchestrated_runs.csv")
+    addSimulationArguments(sweep_parser)
+    # PARSE-LOGS
+    parse_parser = subparsers.add_parser("parse-logs", help="score log folders (emissions, travel times, delays)")
+    parse_parser.add_argument("folders", nargs="+", help="log folders containing Emissions.xml and TripInfos.xml (or *.xml.gz)")
+    parse_parser.add_argument("--output", default=None, help="CSV file for the objectives of all folders")
+    # HEATMAP
+    heatmap_parser = subparsers.add_parser("heatmap", help="emission heatmaps on a shared grid (figures/emission_heatmap_batch.py)")
+    heatmap_parser.add_argument("runs", nargs="+", help="LABEL=path/to/Emissions.xml, repeat a label for seeds")
+    heatmap_parser.add_argument("--baseline", default=None)
+    heatmap_parser.add_argument("--output", default="heatmaps")
+    heatmap_parser.add_argument("--workers", type=int, default=None)
+    return parser
+
+def runCommand(args):
+    import traci
+    from SimulationInstance import SimulationInstance, buildSumoCommand, simulation_times, DEFAULT_OUTPUT_DIR
+    if 'SUMO_HOME' in os.environ:
+        sys.path.append(os.path.join(os.environ['SUMO_HOME'], 'tools'))
+    demand_file = os.path.abspath(args.demand_file) if args.demand_file is not None else None
+    # LAUNCH SUMO
+    sumo_cmd = buildSumoCommand(args.sumo_path, demand_file, args.output_dir, args.compress_output)
+    if demand_file is not None and args.controller=="FIXED_CYCLE":
+        # demand and signal program are both native, no need for TraCI at all
+        n_seconds = len(simulation_times) if args.duration is None else args.duration
+        sumo_cmd += ["--end", str(n_seconds)]
+        return subprocess.run(sumo_cmd).returncode
+    traci.start(sumo_cmd)
+    analysis = None
+    if args.segment_seconds is not None:
+        from SegmentedAnalysis import SegmentedAnalysis
+        analysis = SegmentedAnalysis(args.output_dir or DEFAULT_OUTPUT_DIR, args.segment_seconds, compressed=args.compress_output)
+        analysis.start()
+    # RUN SIMULATION
+    simulation = SimulationInstance(traci, args.controller, weights=weightsDictionary(args.weights), demand_file=demand_file,
+                                    seed=args.seed, trajectory_file=args.record_trajectory, phase_log_file=args.phase_log,
+                                    controller_file=args.controller_config, adaptive_stepping=args.adaptive_steps,
+                                    n_seconds=args.duration, pressure_mode=args.pressure_mode)
+    simulation.prepare()
+    simulation.run()
+    # CLOSE SUMO
+    simulation.close()
+    if analysis is not None:
+        start = time.time()
+        total_emissions, _, _, _ = analysis.finish()
+        print("EMISSION GOAL", total_emissions, "- SEGMENTED ANALYSIS READY %.1f S AFTER THE RUN" % (time.time()-start))
+    return 0
+
+def sweepCommand(args):
+    import pandas as pd
+    from AsyncOrchestrator import AsyncOrchestrator, buildRunSpecs
+    demand_file = os.path.abspath(args.demand_file) if args.demand_file is not None else None
+    runs = buildRunSpecs(args.controllers, args.weights, args.seeds, demand_file, args.output_root, args.duration,
+                         args.controller_config, args.adaptive_steps, args.pressure_mode, args.compress_output)
+    results = AsyncOrchestrator(args.sumo_path, args.parallel).runAll(runs)
+    pd.DataFrame(results).to_csv(args.results, index=False)
+    return 0
+
+def parseLogsCommand(args):
+    import pandas as pd
+    from RunScoring import scoreRun
+    rows = []
+    for folder in args.folders:
+        objectives, _ = scoreRun(folder)
+        print(folder, "goal", objectives["goal"], "total_travel_time_h", objectives["total_travel_time_h"],
+              "total_delay_h", objectives["total_delay_h"])
+        rows.append({"folder": folder, **objectives})
+    if args.output is not None:
+        pd.DataFrame(rows).to_csv(args.output, index=False)
+    return 0
+
+def heatmapCommand(args):
+    arguments = args.runs + ["--output", args.output]
+    if args.baseline is not None:
+        arguments += ["--baseline", args.baseline]
+    if args.workers is not None:
+        arguments += ["--workers", str(args.workers)]
+    return subprocess.run([sys.executable, HEATMAP_SCRIPT] + arguments).returncode
+
+def main(argv):
+    # former calls without subcommand ("--sumo-path ... --controller ...") mean "run"
+    if len(argv)>0 and argv[0]=="help":
+        argv = ["--help"]
+    if len(argv)>0 and argv[0] not in SUBCOMMANDS and argv[0] not in ["-h", "--h", "--help"]:
+        argv = ["run"] + argv
+    args = buildParser().parse_args(argv)
+    commands = {"run": runCommand, "sweep": sweepCommand, "parse-logs": parseLogsCommand, "heatmap": heatmapCommand}
+    return commands[args.command](args)
 
 
 
@@ -385,55 +193,5 @@ signal_controllers = [controller1, controller2, controller3, controller4, contro
 # #############################################################################
 # ## MAIN CODE
 # #############################################################################
-
-# LAUNCH SUMO
-sumoConfigFile = "../model/Configuration.sumocfg" 
-sumoCmd = [sumoBinary, "-c", sumoConfigFile, "--start", "--quit-on-end", "--time-to-teleport", "-1"]
-traci.start(sumoCmd)
-
-# LOAD VEHICLE SPAWN DATA
-df_veh_spawn = pd.read_csv("../model/Spawn_Vehicles.csv")
-df_veh_spawn = df_veh_spawn.rename(columns={"Unnamed: 0": "veh_ctr"})
-df_bus_spawn = pd.read_csv("../model/Spawn_Bus.csv")
-df_bus_spawn = df_bus_spawn.rename(columns={"Unnamed: 0": "veh_ctr"})
-
-# LOAD EMISSION MODEL
-emission_model = loadEmissionClassesFromFile(file="../data/Emission_VehiclePopulation.xlsx")
-
-# INITIALIZE CONTROLLERS
-if not CONTROL_MODE=="FIXED_CYCLED":
-    for controller in signal_controllers:
-        controller.current_gt_start = traci.simulation.getTime()
-
-# RECORDER
-veh_routes = {}
-veh_classes = {}
-
-# RUN SIMULATION
-veh_ctr = 0
-for current_time in simulation_times:
-    # MEASURE
-    df_current_status, df_hidden_vehicles = determine_current_state()
-    if not CONTROL_MODE=="FIXED_CYCLED":
-        # CONTROL / SET TRAFFIC LIGHTS
-        for controller in signal_controllers:
-            controller.doSignalLogic()
-    # SPAWN CARS
-    for idx, row in df_veh_spawn[df_veh_spawn["Adjusted_Datetime"]==current_time].iterrows():
-        for x in range(0, int(np.ceil(row["n_spawn"]))):
-            veh_ctr += 1
-            spawnRandomVehicle(veh_ctr, desired_route=str(row["route"]))
-    # SPAWN BUSSES
-    for idx, row in df_bus_spawn[df_bus_spawn["Adjusted_Datetime"]==current_time].iterrows():
-        veh_ctr += 1
-        spawnRandomBus(veh_ctr, desired_route=str(row["route"]), stops=str(row["Stops"]))
-    # RUN SIMULATION FOR ONE SECOND
-    for n in range(0,SIMULATION_STEPS_PER_SECOND):
-        traci.simulationStep()
-    if DEBUG_GUI:
-        time.sleep(SIMULATION_WAIT_TIME)
-    if DEBUG_TIME:
-        print(current_time)
-
-# CLOSE SUMO
-traci.close()
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,126 @@
+# #############################################################################
+# ####### GREEN-PRESSURE - EMISSION-REDUCING SIGNALIZED INTERSECTION MANAGEMENT
+# #######
+# #######     AUTHOR:       Kevin Riehl <kriehl@ethz.ch>
+# #######     YEAR :        2025
+# #######     ORGANIZATION: Traffic Engineering Group (SVT),
+# #######                   Institute for Transportation Planning and Systems,
+# #######                   ETH Zürich
+# #############################################################################
+"""
+This code synthesizes scaled and time-shifted spawn schedules from
+Spawn_Vehicles.csv and Spawn_Bus.csv, for stress tests beyond the calibrated
+demand. Every spawn row (ceil(n_spawn) vehicles, as consumed by the
+simulation) is scaled by a factor with stochastic rounding. The first copy
+keeps the original time, and additional copies are spread over the following
+seconds, so the daily profile is preserved without insertion bursts. Routes
+are kept, so the route mix and the truck bans (determined per route at spawn
+time) are unchanged. Buses follow their timetable unless --scale-buses is
+given. The schedules are written in the original format, and can be
+compiled to a demand file right away (--compile).
+
+Usage:
+python ScaleDemand.py --factor 4 --shift-seconds -28800 --output-folder ../model/demand_x4 --compile
+"""
+
+
+
+
+# #############################################################################
+# ## IMPORTS
+# #############################################################################
+import os
+import argparse
+import numpy as np
+import pandas as pd
+
+
+
+
+# #############################################################################
+# ## PARAMETERS
+# #############################################################################
+SPAWN_VEHICLES_FILE = "../model/Spawn_Vehicles.csv"
+SPAWN_BUS_FILE = "../model/Spawn_Bus.csv"
+OUTPUT_FOLDER = "../model/demand_scaled"
+SPREAD_SECONDS = 60 # additional copies of a spawn row depart within this many seconds
+DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+
+
+# #############################################################################
+# ## METHODS
+# #############################################################################
+
+def loadSpawnFile(file):
+    df_spawn = pd.read_csv(file, index_col=0)
+    df_spawn["Adjusted_Datetime"] = pd.to_datetime(df_spawn["Adjusted_Datetime"])
+    return df_spawn
+
+def scaleSpawnRows(df_spawn, factor, shift_seconds, rng, spread_seconds=SPREAD_SECONDS):
+    # one row per spawned vehicle (n_spawn=1), ceil(n_spawn)*factor copies per row in expectation
+    counts = np.ceil(df_spawn["n_spawn"].to_numpy()).astype(np.int64)*factor
+    n_copies = np.floor(counts).astype(np.int64)
+    n_copies += rng.random(len(counts))<(counts-n_copies)
+    rows = np.repeat(np.arange(len(df_spawn)), n_copies)
+    # rank of every copy within its row, copy 0 keeps the original time
+    ranks = np.arange(len(rows))-np.repeat(np.cumsum(n_copies)-n_copies, n_copies)
+    offsets = np.where(ranks==0, 0, rng.integers(0, max(1, spread_seconds), len(rows)))
+    df_scaled = df_spawn.iloc[rows].copy()
+    df_scaled["Adjusted_Datetime"] += pd.to_timedelta(offsets+shift_seconds, unit="s")
+    df_scaled["n_spawn"] = 1.0
+    return df_scaled.sort_values("Adjusted_Datetime", kind="stable")
+
+def mergeVehicleRows(df_scaled):
+    # vehicles of the same route and second back into one row
+    columns = [c for c in df_scaled.columns if c not in ["Adjusted_Datetime", "route", "n_spawn"]]
+    aggregation = {"n_spawn": "sum", **{c: "first" for c in columns}}
+    df_merged = df_scaled.groupby(["Adjusted_Datetime", "route"], sort=False).agg(aggregation).reset_index()
+    return df_merged[list(df_scaled.columns)]
+
+def writeSpawnFile(df_spawn, file):
+    df_spawn = df_spawn.copy()
+    df_spawn["Adjusted_Datetime"] = df_spawn["Adjusted_Datetime"].dt.strftime(DATETIME_FORMAT)
+    df_spawn.index = np.arange(1, len(df_spawn)+1)
+    df_spawn.to_csv(file)
+
+def scaleDemand(factor, shift_seconds=0, seed=42, output_folder=OUTPUT_FOLDER, scale_buses=False,
+                vehicle_file=SPAWN_VEHICLES_FILE, bus_file=SPAWN_BUS_FILE, spread_seconds=SPREAD_SECONDS):
+    # writes Spawn_Vehicles.csv / Spawn_Bus.csv into output_folder, returns their paths
+    rng = np.random.default_rng(seed)
+    os.makedirs(output_folder, exist_ok=True)
+    df_vehicles = mergeVehicleRows(scaleSpawnRows(loadSpawnFile(vehicle_file), factor, shift_seconds, rng, spread_seconds))
+    df_bus = scaleSpawnRows(loadSpawnFile(bus_file), factor if scale_buses else 1, shift_seconds, rng, spread_seconds)
+    vehicle_target = output_folder+"/Spawn_Vehicles.csv"
+    bus_target = output_folder+"/Spawn_Bus.csv"
+    writeSpawnFile(df_vehicles, vehicle_target)
+    writeSpawnFile(df_bus, bus_target)
+    return vehicle_target, bus_target
+
+
+
+
+# #############################################################################
+# ## MAIN CODE
+# #############################################################################
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Synthesize scaled and time-shifted spawn schedules.")
+    parser.add_argument("--factor", type=float, default=2.0, help="demand multiplier (also below 1)")
+    parser.add_argument("--shift-seconds", type=int, default=0, help="shift all spawns, e.g. -28800 moves 17:15 to 09:15")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--spread-seconds", type=int, default=SPREAD_SECONDS)
+    parser.add_argument("--scale-buses", action="store_true", help="also scale the bus timetable")
+    parser.add_argument("--spawn-vehicles", default=SPAWN_VEHICLES_FILE)
+    parser.add_argument("--spawn-bus", default=SPAWN_BUS_FILE)
+    parser.add_argument("--output-folder", default=OUTPUT_FOLDER)
+    parser.add_argument("--compile", action="store_true", help="also compile <output-folder>/CompiledDemand.rou.xml")
+    args = parser.parse_args()
+    vehicle_file, bus_file = scaleDemand(args.factor, args.shift_seconds, args.seed, args.output_folder, args.scale_buses,
+                                         args.spawn_vehicles, args.spawn_bus, args.spread_seconds)
+    print("WROTE", vehicle_file, bus_file)
+    if args.compile:
+        from CompileDemand import compileDemand
+        n_vehicles = compileDemand(args.output_folder+"/CompiledDemand.rou.xml", vehicle_file=vehicle_file,
+                                   bus_file=bus_file, seed=args.seed)
+        print("COMPILED", n_vehicles, "VEHICLES INTO", args.output_folder+"/CompiledDemand.rou.xml")
@@ -0,0 +1,246 @@
+# #############################################################################
+# ####### GREEN-PRESSURE - EMISSION-REDUCING SIGNALIZED INTERSECTION MANAGEMENT
+# #######
+# #######     AUTHOR:       Kevin Riehl <kriehl@ethz.ch>
+# #######     YEAR :        2025
+# #######     ORGANIZATION: Traffic Engineering Group (SVT),
+# #######                   Institute for Transportation Planning and Systems,
+# #######                   ETH Zürich
+# #############################################################################
+"""
+This code analyzes Emissions.xml while the simulation is still writing it,
+so that analysis overlaps with simulation. A background thread follows the
+log and cuts it into segments of segment_seconds simulated time, at
+<timestep> tags. Every finished segment is parsed by a worker process into
+its per-timestep pollutant sums and its emission cube buckets (intersection
+x vehicle class x pollutant, see EmissionCube.py). When the run has ended,
+only the last segment is left, and the merged results are written next to
+the log:
+- EmissionSeries.csv: per-timestep pollutants and goal (as determineEmissions),
+- EmissionCube.npy / .json: as EmissionCube.py.
+RunScoring.scoreRun picks EmissionSeries.csv up instead of parsing the log
+again. SUMO cannot reopen its outputs through TraCI, hence the log is
+segmented while it grows, instead of rolling over to new files.
+
+Replay a finished log as if written live, once complete and once cut inside
+a line (as the tail of a running simulation), and compare with the
+monolithic analysis of the same bytes:
+python SegmentedAnalysis.py --replay ../model/logs --segment-seconds 3600
+"""
+
+
+
+
+# #############################################################################
+# ## IMPORTS
+# #############################################################################
+import os
+import argparse
+import threading
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from EmissionLogs import parseEmissionBuffer, addEmissionGoal, determineEmissions, POLLUTANT_COLUMNS
+from EmissionCube import (accumulateCubeLines, cubeFromBuckets, cubeLabels, buildLaneMapper, saveEmissionCube,
+                          aggregateEmissions, BUCKET_SECONDS, NET_FILE)
+
+
+
+
+# #############################################################################
+# ## PARAMETERS
+# #############################################################################
+SEGMENT_SECONDS = 3600
+POLL_SECONDS = 5.0
+TIMESTEP_TAG = b"<timestep time=\""
+SERIES_FILE = "EmissionSeries.csv"
+
+
+
+
+# #############################################################################
+# ## METHODS
+# #############################################################################
+
+def analyzeSegment(task):
+    # (file or bytes, start, end, lane mapper, intersections, bucket seconds) -> (times, totals, cube buckets)
+    source, start, end, lane_mapper, n_intersections, bucket_seconds = task
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            f.seek(start)
+            buffer = f.read(end-start)
+    else:
+        buffer = source
+    times, totals = parseEmissionBuffer(buffer, 0, len(buffer))
+    buckets = accumulateCubeLines(buffer.decode().splitlines(), lane_mapper, n_intersections, {}, bucket_seconds)
+    return times, totals, buckets
+
+class SegmentedAnalysis:
+    def __init__(self, folder, segment_seconds=SEGMENT_SECONDS, compressed=False, workers=None, bucket_seconds=BUCKET_SECONDS,
+                 poll_seconds=POLL_SECONDS, controller_file="../model/SignalControllers.json", net_file=NET_FILE):
+        self.folder = folder
+        self.file = folder+"/Emissions.xml"+(".gz" if compressed else "")
+        self.segment_seconds = segment_seconds
+        self.bucket_seconds = bucket_seconds
+        self.poll_seconds = poll_seconds
+        self.intersections, self.lane_mapper = buildLaneMapper(controller_file, net_file)
+        # SUMO and this process are busy already
+        self.executor = ProcessPoolExecutor(max_workers=workers or max(1, (os.cpu_count() or 1)-2))
+        self.futures = []
+        self.decompressor = zlib.decompressobj(wbits=31) if compressed else None
+        self.offset = 0 # bytes read from the file
+        self.position = 0 # position of the carry in the (decompressed) log
+        self.carry = b"" # not yet scanned for timestep tags
+        self.block = b"" # compressed logs: the current segment, decompressed
+        self.segment_start = 0
+        self.boundary = segment_seconds
+        self.stopping = threading.Event()
+        self.thread = None
+
+    def start(self):
+        # call once SUMO has opened its outputs
+        self.thread = threading.Thread(target=self.follow, daemon=True)
+        self.thread.start()
+
+    def follow(self):
+        while not self.stopping.wait(self.poll_seconds):
+            self.scan()
+
+    def scan(self, final=False):
+        # reads what was appended, submits every segment that is complete
+        if not os.path.exists(self.file):
+            return
+        with open(self.file, "rb") as f:
+            f.seek(self.offset)
+            data = f.read()
+        self.offset += len(data)
+        if self.decompressor is not None:
+            data = self.decompressor.decompress(data)
+            self.block += data
+        window = self.carry+data
+        scanned = 0
+        position = window.find(TIMESTEP_TAG)
+        while position!=-1:
+            quote = window.find(b"\"", position+len(TIMESTEP_TAG))
+            if quote==-1:
+                # tag still being written
+                break
+            t = float(window[position+len(TIMESTEP_TAG):quote])
+            if t>=self.boundary:
+                self.submitSegment(self.position+position)
+                self.boundary = (t//self.segment_seconds+1)*self.segment_seconds
+            scanned = quote+1
+            position = window.find(TIMESTEP_TAG, scanned)
+        keep = position if position!=-1 else max(scanned, len(window)-len(TIMESTEP_TAG)-32)
+        self.carry = window[keep:]
+        self.position += keep
+        if final:
+            self.submitSegment(self.position+len(self.carry))
+
+    def submitSegment(self, end):
+        if end<=self.segment_start:
+            return
+        if self.decompressor is not None:
+            source = self.block[:end-self.segment_start]
+            self.block = self.block[end-self.segment_start:]
+        else:
+            source = self.file
+        task = (source, self.segment_start, end, self.lane_mapper, len(self.intersections), self.bucket_seconds)
+        self.futures.append(self.executor.submit(analyzeSegment, task))
+        self.segment_start = end
+
+    def finish(self):
+        # call after SUMO closed the log; merges all segments and writes the results
+        if self.thread is not None:
+            self.stopping.set()
+            self.thread.join()
+        self.scan(final=True)
+        times = []
+        totals = []
+        buckets = {}
+        for future in self.futures:
+            segment_times, segment_totals, segment_buckets = future.result()
+            times += segment_times
+            totals.append(segment_totals)
+            for b, values in segment_buckets.items():
+                buckets[b] = buckets[b]+values if b in buckets else values
+        self.executor.shutdown()
+        totals = np.concatenate(totals) if totals else np.zeros((0, len(POLLUTANT_COLUMNS)))
+        df_emissions = pd.DataFrame(totals, columns=POLLUTANT_COLUMNS)
+        df_emissions.insert(0, "time", times)
+        df_emissions = addEmissionGoal(df_emissions)
+        df_emissions.to_csv(self.folder+"/"+SERIES_FILE, index=False)
+        cube = cubeFromBuckets(buckets, len(self.intersections))
+        labels = cubeLabels(cube, self.intersections, self.bucket_seconds, self.file)
+        saveEmissionCube(cube, labels, self.folder+"/EmissionCube")
+        return sum(df_emissions["goal"]), df_emissions, cube, labels
+
+def loadEmissionSeries(folder, log_file):
+    # (total goal, per-timestep series) written by SegmentedAnalysis, unless older than the log
+    file = folder+"/"+SERIES_FILE
+    if not os.path.exists(file) or not os.path.exists(log_file) or os.path.getmtime(file)<os.path.getmtime(log_file):
+        return None
+    df_emissions = pd.read_csv(file, dtype={"time": str}, float_precision="round_trip")
+    return sum(df_emissions["goal"]), df_emissions
+
+def replayLog(source_file, target_file, bytes_per_second, chunk_bytes, n_bytes=None):
+    # appends source_file (its first n_bytes) to target_file at roughly bytes_per_second
+    n_left = os.path.getsize(source_file) if n_bytes is None else n_bytes
+    with open(source_file, "rb") as f_in, open(target_file, "wb") as f_out:
+        while n_left>0:
+            data = f_in.read(min(chunk_bytes, n_left))
+            if not data:
+                break
+            f_out.write(data)
+            f_out.flush()
+            n_left -= len(data)
+            time.sleep(len(data)/bytes_per_second)
+
+def replayCase(source, output_folder, n_bytes, args):
+    # replays the first n_bytes of source, compares with the monolithic analysis of the same bytes
+    os.makedirs(output_folder+"/reference", exist_ok=True)
+    with open(source, "rb") as f_in, open(output_folder+"/reference/Emissions.xml", "wb") as f_out:
+        f_out.write(f_in.read(n_bytes))
+    start = time.perf_counter()
+    total, df_reference = determineEmissions(output_folder+"/reference", workers=1)
+    cube_reference, _ = aggregateEmissions(output_folder+"/reference", target_file=output_folder+"/EmissionCube_reference")
+    monolithic_s = time.perf_counter()-start
+
+    analysis = SegmentedAnalysis(output_folder, args.segment_seconds, workers=args.workers, poll_seconds=args.poll_seconds)
+    analysis.start()
+    replayLog(source, output_folder+"/Emissions.xml", n_bytes/args.replay_seconds, max(1, n_bytes//1000), n_bytes)
+    start = time.perf_counter()
+    segmented_total, df_emissions, cube, _ = analysis.finish()
+    ready_s = time.perf_counter()-start
+
+    print("SEGMENTS", len(analysis.futures), "OF", args.segment_seconds, "S,", n_bytes, "BYTES, LAST TIMESTEP", df_emissions["time"].iloc[-1] if len(df_emissions) else "-")
+    print("MONOLITHIC ANALYSIS AFTER THE RUN %.2f S, SEGMENTED RESULTS READY %.2f S AFTER THE RUN" % (monolithic_s, ready_s))
+    print("GOAL MONOLITHIC %.6f SEGMENTED %.6f" % (total, segmented_total))
+    print("TIMESTEPS EQUAL", df_emissions["time"].tolist()==df_reference["time"].tolist(),
+          "SERIES MAX DIFF %.3g" % np.abs(df_emissions[POLLUTANT_COLUMNS].to_numpy()-df_reference[POLLUTANT_COLUMNS].to_numpy()).max(initial=0),
+          "CUBE MAX DIFF %.3g" % np.abs(cube-cube_reference).max(initial=0))
+
+
+
+
+# #############################################################################
+# ## MAIN CODE
+# #############################################################################
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay a finished Emissions.xml as if written live, and compare the segmented with the monolithic analysis.")
+    parser.add_argument("--replay", required=True, help="log folder containing Emissions.xml (plain)")
+    parser.add_argument("--segment-seconds", type=int, default=SEGMENT_SECONDS)
+    parser.add_argument("--replay-seconds", type=float, default=60.0, help="wall time over which the log is written")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--poll-seconds", type=float, default=1.0)
+    parser.add_argument("--output-folder", default="../model/logs_segmented")
+    parser.add_argument("--cut-share", type=float, default=0.6,
+                        help="the truncated case replays the log up to this share of its bytes, cut inside a line, as a live tail")
+    args = parser.parse_args()
+    source = args.replay+"/Emissions.xml"
+    size = os.path.getsize(source)
+    for case, n_bytes in [("COMPLETE LOG", size), ("TRUNCATED TAIL", int(size*args.cut_share))]:
+        print(case)
+        replayCase(source, args.output_folder+"/"+case.lower().replace(" ", "_"), n_bytes, args)
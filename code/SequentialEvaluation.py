@@ -0,0 +1,208 @@
+# #############################################################################
+# ####### GREEN-PRESSURE - EMISSION-REDUCING SIGNALIZED INTERSECTION MANAGEMENT
+# #######
+# #######     AUTHOR:       Kevin Riehl <kriehl@ethz.ch>
+# #######     YEAR :        2025
+# #######     ORGANIZATION: Traffic Engineering Group (SVT),
+# #######                   Institute for Transportation Planning and Systems,
+# #######                   ETH Zürich
+# #############################################################################
+"""
+This code decides whether a candidate's weights beat the incumbent's, with
+as few stochastic runs as needed. Candidate and incumbent are run on the
+same seeds (common random numbers: same demand, same vehicle classes), so
+the per-seed score differences vary much less than the scores. Seeds are
+added in parallel batches, and after every batch a confidence interval of
+the mean difference decides:
+- accept, if it lies below zero;
+- reject, if it lies above zero;
+- reject, if it excludes an improvement of more than the indifference
+  (futility);
+- by the sign of the mean difference, if max_seeds are reached undecided
+  (as a fixed max_seeds evaluation would);
+- reject, if a run of the candidate was pruned (CandidatePruning.py).
+The confidence levels of the looks follow group-sequential boundaries
+(Pocock: the same level at every look, or O'Brien-Fleming: strict early
+looks, nearly the full level at the last), computed for the correlated
+statistics of the looks, so that repeated looks keep the overall error rate
+at alpha. Every run is recorded per seed in the run database. Seeds the
+incumbent lacks are run too, so its estimate sharpens over time. A
+comparison uses at most the first max_seeds seeds, for the candidate and
+the incumbent alike: the incumbent's evidence is capped at max_seeds too,
+and comparisons still undecided there are decided by the mean difference.
+
+Benchmark_SequentialEvaluation.py compares this policy against fixed seed
+counts.
+"""
+
+
+
+
+# #############################################################################
+# ## IMPORTS
+# #############################################################################
+import json
+import math
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+
+
+
+# #############################################################################
+# ## PARAMETERS
+# #############################################################################
+MIN_SEEDS = 4 # the first look needs a few degrees of freedom
+MAX_SEEDS = 10
+BATCH_SIZE = 2 # seeds added per look, run in parallel
+ALPHA = 0.05 # error rate over all looks
+BOUNDARY = "pocock" # or "obrien-fleming"
+BOUNDARY_PATHS = 200000 # Monte Carlo paths for the boundary constant
+INDIFFERENCE = 0.001 # improvements below this share of the incumbent's score are not worth accepting
+SEEDS = list(range(1, 101))
+
+
+
+
+# #############################################################################
+# ## METHODS
+# #############################################################################
+
+def tCentral(t, df):
+    # P(|T|<t) of Student's t with integer degrees of freedom (closed form, Abramowitz & Stegun 26.7.3/4)
+    theta = math.atan(t/math.sqrt(df))
+    c2 = math.cos(theta)**2
+    if df%2==0:
+        term, total = 1.0, 1.0
+        for k in range(2, df-1, 2):
+            term *= c2*(k-1)/k
+            total += term
+        return math.sin(theta)*total
+    if df==1:
+        return 2*theta/math.pi
+    term = total = math.cos(theta)
+    for k in range(2, df-2, 2):
+        term *= c2*k/(k+1)
+        total += term
+    return 2/math.pi*(theta+math.sin(theta)*total)
+
+def tQuantile(p, df):
+    # Student t quantile (p>0.5) by bisection on the closed form distribution
+    low, high = 0.0, 1.0
+    while tCentral(high, df)<2*p-1:
+        high *= 2
+    for _ in range(100):
+        middle = (low+high)/2
+        low, high = (middle, high) if tCentral(middle, df)<2*p-1 else (low, middle)
+    return (low+high)/2
+
+def lookSizes(min_seeds, max_seeds, batch_size):
+    sizes = [min_seeds]
+    while sizes[-1]<max_seeds:
+        sizes.append(min(sizes[-1]+batch_size, max_seeds))
+    return sizes
+
+def groupSequentialLevels(sizes, alpha, boundary=BOUNDARY, n_paths=BOUNDARY_PATHS):
+    # nominal two-sided level per look (at the given numbers of seeds), such that the probability
+    # to cross any look's boundary under no difference is alpha; z statistics of the looks are
+    # correlated (they share seeds), the boundary constant is their simulated (1-alpha) quantile
+    sizes = np.asarray(sizes, dtype=np.float64)
+    increments = np.random.default_rng(0).normal(size=(n_paths, len(sizes)))*np.sqrt(np.diff(sizes, prepend=0))
+    z = np.abs(np.cumsum(increments, axis=1))/np.sqrt(sizes)
+    shape = np.ones(len(sizes)) if boundary=="pocock" else np.sqrt(sizes[-1]/sizes)
+    constant = float(np.quantile((z/shape).max(axis=1), 1-alpha))
+    return [math.erfc(constant*w/math.sqrt(2)) for w in shape]
+
+def weightsKey(weights):
+    return json.dumps([float(w) for w in weights])
+
+class SequentialEvaluator:
+    """
+    evaluate(weights, seed) -> (objectives, df_emissions or None), is called from
+    parallel threads; objectives["goal"] is the score (lower is better), or
+    objectives["pruned"] is set if the run was aborted.
+    """
+    def __init__(self, evaluate, database=None, study="nash", min_seeds=MIN_SEEDS, max_seeds=MAX_SEEDS,
+                 batch_size=BATCH_SIZE, alpha=ALPHA, boundary=BOUNDARY, indifference=INDIFFERENCE, parallel=None, seeds=SEEDS):
+        self.evaluate = evaluate
+        self.database = database
+        self.study = study
+        self.min_seeds = max(2, min_seeds)
+        self.max_seeds = max(self.min_seeds, max_seeds)
+        self.batch_size = batch_size
+        self.looks = lookSizes(self.min_seeds, self.max_seeds, batch_size)
+        self.alpha_looks = dict(zip(self.looks, groupSequentialLevels(self.looks, alpha, boundary)))
+        self.indifference = indifference
+        self.parallel = parallel or batch_size
+        # common seeds of all comparisons, for the incumbent as well
+        self.seeds = seeds[:self.max_seeds]
+        self.scores = {}
+        self.pruned = set()
+        self.n_simulations = 0
+
+    def seedScores(self, weights):
+        key = weightsKey(weights)
+        if key not in self.scores:
+            self.scores[key] = self.database.seedScores(self.study, weights) if self.database is not None else {}
+        return self.scores[key]
+
+    def estimate(self, weights):
+        # mean score over all seeds run so far, and their number
+        scores = list(self.seedScores(weights).values())
+        return (statistics.mean(scores) if scores else float("nan")), len(scores)
+
+    def runSeed(self, weights, seed):
+        start = time.time()
+        objectives, df_emissions = self.evaluate(weights, seed)
+        return objectives, df_emissions, time.time()-start
+
+    def runSeeds(self, jobs, iteration):
+        # simulations in parallel, recording in this thread (the database connection is not shared)
+        with ThreadPoolExecutor(max_workers=self.parallel) as executor:
+            results = list(executor.map(lambda job: self.runSeed(*job), jobs))
+        for (weights, seed), (objectives, df_emissions, runtime) in zip(jobs, results):
+            pruned = objectives.get("pruned", False)
+            if pruned:
+                self.pruned.add(weightsKey(weights))
+            else:
+                self.seedScores(weights)[seed] = objectives["goal"]
+            if self.database is not None:
+                self.database.addEvaluation(self.study, weights, objectives, iteration=iteration, seed=seed,
+                                            runtime_s=runtime, df_emissions=df_emissions, pruned=pruned)
+        self.n_simulations += len(jobs)
+
+    def compare(self, candidate, incumbent, iteration=None):
+        # runs seed batches until the candidate is accepted or rejected
+        candidate_scores = self.seedScores(candidate)
+        incumbent_scores = self.seedScores(incumbent)
+        n_seeds = self.min_seeds
+        n_before = self.n_simulations
+        while True:
+            seeds = self.seeds[:n_seeds]
+            jobs = [(candidate, s) for s in seeds if s not in candidate_scores]
+            jobs += [(incumbent, s) for s in seeds if s not in incumbent_scores]
+            self.runSeeds(jobs, iteration)
+            if weightsKey(candidate) in self.pruned:
+                return {"accept": False, "reason": "pruned", "seeds": len(candidate_scores), "mean_difference": float("nan"),
+                        "ci": (float("nan"), float("nan")), "simulations": self.n_simulations-n_before, "candidate_score": float("nan")}
+            differences = [candidate_scores[s]-incumbent_scores[s] for s in seeds]
+            mean = statistics.mean(differences)
+            half_width = tQuantile(1-self.alpha_looks[n_seeds]/2, len(differences)-1)*statistics.stdev(differences)/math.sqrt(len(differences))
+            low, high = mean-half_width, mean+half_width
+            threshold = self.indifference*abs(statistics.mean(incumbent_scores[s] for s in seeds))
+            decision = None
+            if high<0:
+                decision = (True, "better")
+            elif low>0:
+                decision = (False, "worse")
+            elif low>-threshold:
+                decision = (False, "improvement below indifference")
+            elif n_seeds>=self.max_seeds:
+                decision = (mean<0, "mean difference at max seeds")
+            if decision is not None:
+                return {"accept": decision[0], "reason": decision[1], "seeds": len(seeds), "mean_difference": mean,
+                        "ci": (low, high), "simulations": self.n_simulations-n_before,
+                        "candidate_score": statistics.mean(candidate_scores[s] for s in seeds)}
+            n_seeds = min(n_seeds+self.batch_size, self.max_seeds)
@@ -0,0 +1,197 @@
+# #############################################################################
+# ####### GREEN-PRESSURE - EMISSION-REDUCING SIGNALIZED INTERSECTION MANAGEMENT
+# #######
+# #######     AUTHOR:       Kevin Riehl <kriehl@ethz.ch>
+# #######     YEAR :        2025
+# #######     ORGANIZATION: Traffic Engineering Group (SVT),
+# #######                   Institute for Transportation Planning and Systems,
+# #######                   ETH Zürich
+# #############################################################################
+"""
+This code contains the (Max- / Green-) Pressure signal controller. It talks
+to SUMO through the TraCI connection it is given (the traci module itself,
+or a labeled connection from traci.getConnection), so several simulations
+can be controlled from one process.
+"""
+
+
+
+
+# #############################################################################
+# ## IMPORTS
+# #############################################################################
+import random
+
+
+
+
+# #############################################################################
+# ## PARAMETERS
+# #############################################################################
+T_A = 5
+T_L = 3
+G_T_MIN = 5
+G_T_MAX = 50
+CONTROL_CADENCE = 1 # SECS between two controller ticks
+DEFAULT_TIMING = {"T_A": T_A, "T_L": T_L, "G_T_MIN": G_T_MIN, "G_T_MAX": G_T_MAX, "cadence": CONTROL_CADENCE}
+DEBUG_CONTROLLER_LOG = "NONE"# "intersection2"
+
+
+
+
+# #############################################################################
+# ## METHODS
+# #############################################################################
+
+class SignalController:
+    def __init__(self, intersection_name, phases, links, multiplier=None, timing=None, downstream=None, conn=None, rng=None):
+        self.intersection_name = intersection_name
+        self.phases = phases
+        self.links = links
+        self.downstream = downstream
+        timing = {**DEFAULT_TIMING, **(timing or {})}
+        self.t_a = timing["T_A"]
+        self.t_l = timing["T_L"]
+        self.g_t_min = timing["G_T_MIN"]
+        self.g_t_max = timing["G_T_MAX"]
+        self.cadence = timing["cadence"]
+        self.conn = conn
+        self.rng = rng if rng is not None else random
+        self.measurement_lanes = []
+        self.link_slice = None
+        self.current_gt_start = 0
+        self.current_phase = self.phases[0]
+        self.next_phase = -1
+        self.current_state = "start"
+        self.timer = -1
+        self.pressures = []
+        self.multiplier = multiplier
+
+    def isDue(self, t_ctr):
+        return t_ctr % self.cadence==0
+
+    def needsPressures(self):
+        return self.current_state in ["check_pressures", "next_phase"]
+
+    def doSignalLogic(self, link_pressures=None):
+        self.timer += self.cadence
+        if self.needsPressures():
+            self.determinePressures(link_pressures)
+        if self.intersection_name==DEBUG_CONTROLLER_LOG:
+            print("")
+            print(self.current_state, self.timer, "State:", self.current_phase, self.pressures, self.conn.simulation.getTime()-self.current_gt_start)
+        if self.current_state == "start":
+            if self.timer>=self.g_t_min:
+                self.current_state="check_pressures"
+                self.timer = -1
+            else:
+                pass
+        elif self.current_state=="check_pressures":
+            current_pressure = self.pressures[int(self.current_phase/2)]
+            other_pressures = max(self.pressures)
+            if current_pressure < other_pressures:
+                self.current_state="next_phase"
+                self.timer = -1
+            else:
+                self.current_state="wait"
+                self.timer = -1
+        elif self.current_state=="wait":
+            if self.timer>=self.t_a:
+                current_gt = self.conn.simulation.getTime()-self.current_gt_start
+                if current_gt > self.g_t_max:
+                    self.current_state = "next_phase"
+                    self.timer = -1
+                else:
+                    self.current_state="check_pressures"
+                    self.timer = -1
+            else:
+                pass
+        elif self.current_state=="next_phase":
+            valid_indices = [i for i in range(len(self.pressures)) if i != int(self.current_phase/2)]
+            max_pressure = max(self.pressures[i] for i in valid_indices)
+            max_indices = [i for i in valid_indices if self.pressures[i] == max_pressure]
+            self.next_phase = int(self.rng.choice(max_indices)*2)
+            self.current_phase += 1
+            if self.intersection_name==DEBUG_CONTROLLER_LOG:
+                print(">>\t", self.current_phase, max_pressure, max_indices, valid_indices, self.current_phase, self.next_phase)
+            self.timer = -1
+            self.current_state="transition"
+        elif self.current_state=="transition":
+            if self.timer>=self.t_l:
+                self.current_phase = self.next_phase
+                self.next_phase = -1
+                self.timer = -1
+                self.current_state = "start"
+                self.current_gt_start = self.conn.simulation.getTime()
+            else:
+                pass
+        else:
+            print("WARNING UNKNOWN STATE", self.current_state)
+        if self.intersection_name==DEBUG_CONTROLLER_LOG:
+            print(self.current_state, self.timer, "State:", self.current_phase, self.pressures, self.conn.simulation.getTime()-self.current_gt_start)
+            print("")
+        self.setSignalOnTrafficLights()
+
+    def determinePressures(self, link_pressures):
+        # link pressures (weighted vehicles on the link lanes, plus vehicles hidden
+        # on the junction coming from the link edges, minus weighted vehicles on
+        # the downstream lanes if given) are computed for all controllers at once
+        # by StateSnapshot.computeLinkPressures()
+        start, end = self.link_slice
+        self.pressures = link_pressures[start:end].tolist()
+        # multiplier
+        if self.multiplier is not None:
+            for l_ctr, link in enumerate(self.links):
+                if link in self.multiplier:
+                    self.pressures[l_ctr] *= self.multiplier[link]
+
+    def setSignalOnTrafficLights(self):
+        self.conn.trafficlight.setPhase(self.intersection_name, self.current_phase)
+        if self.cadence>1:
+            # hold the phase until the next tick
+            self.conn.trafficlight.setPhaseDuration(self.intersection_name, self.cadence+1)
+
+    def quietTicks(self):
+        # number of upcoming ticks that only count the timer up, without any decision
+        thresholds = {"start": self.g_t_min, "wait": self.t_a, "transition": self.t_l}
+        if self.current_state not in thresholds:
+            return 0
+        return max(0, -(-(thresholds[self.current_state]-self.timer)//self.cadence)-1)
+
+    def quietSeconds(self, t_ctr):
+        # seconds after t_ctr until the next tick with a decision
+        next_tick = (t_ctr//self.cadence+1)*self.cadence
+        return next_tick + self.quietTicks()*self.cadence - t_ctr - 1
+
+    def skipSeconds(self, t_ctr, seconds):
+        # ticks falling into the skipped seconds only count the timer up; the
+        # current phase is held, as setSignalOnTrafficLights would do
+        n_ticks = (t_ctr+seconds)//self.cadence - t_ctr//self.cadence
+        self.timer += n_ticks*self.cadence
+        self.conn.trafficlight.setPhaseDuration(self.intersection_name, seconds+2)
+
+    def determineMeasurementLanes(self):
+        # link lanes, plus the internal lanes following any lane of the link edges
+        # (vehicles there are counted as hidden on the link edge), plus the
+        # downstream lanes of the links; lanes missing in the network are skipped
+        # (they never hold a vehicle, e.g. -25576697#0_1 of intersection4)
+        known_lanes = set(self.conn.lane.getIDList())
+        lanes = []
+        for link_lanes in self.links.values():
+            lanes += [lane for lane in link_lanes if lane in known_lanes]
+        link_edges = set(lane.rsplit("_", 1)[0] for lane in lanes)
+        pending = [edge+"_"+str(l) for edge in link_edges for l in range(self.conn.edge.getLaneNumber(edge))]
+        visited = set()
+        while pending:
+            lane = pending.pop()
+            for link in self.conn.lane.getLinks(lane):
+                for internal_lane in [link[4], link[0]]:
+                    if internal_lane.startswith(":") and internal_lane not in visited:
+                        visited.add(internal_lane)
+                        lanes.append(internal_lane)
+                        pending.append(internal_lane)
+        if self.downstream is not None:
+            for downstream_lanes in self.downstream.values():
+                lanes += [lane for lane in downstream_lanes if lane in known_lanes]
+        self.measurement_lanes = list(dict.fromkeys(lanes))
+        return self.measurement_lanes
@@ -0,0 +1,366 @@
+# #############################################################################
+# ####### GREEN-PRESSURE - EMISSION-REDUCING SIGNALIZED INTERSECTION MANAGEMENT
+# #######
+# #######     AUTHOR:       Kevin Riehl <kriehl@ethz.ch>
+# #######     YEAR :        2025
+# #######     ORGANIZATION: Traffic Engineering Group (SVT),
+# #######                   Institute for Transportation Planning and Systems,
+# #######                   ETH Zürich
+# #############################################################################
+"""
+This code contains one microsimulation run (measurement, signal control,
+vehicle spawning and stepping) bound to a single TraCI connection. It is
+driven second by second, either to the end by RunSimulation.py, or
+interleaved with other instances by AsyncOrchestrator.py.
+"""
+
+
+
+
+# #############################################################################
+# ## IMPORTS
+# #############################################################################
+import os
+import re
+import time
+import random
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+from DemandModel import loadEmissionClassesFromFile, getRandomEmissionClass, getRandomVehicleClass
+from DemandModel import determineWhetherTruckBannedRoute, determineVehicleClassFromType, sumo_vehicle_types
+from VehicleRegistry import VehicleRegistry
+from StateSnapshot import LaneIndex, StateSnapshot
+from TrajectoryRecorder import TrajectoryRecorder
+from ControllerDefinitions import loadControllerDefinitions, addDownstreamLanes, CONTROLLER_FILE
+from SignalController import SignalController
+from DecisionKernel import DecisionKernel
+
+
+
+
+# #############################################################################
+# ## PARAMETERS
+# #############################################################################
+
+# SIMULATION PARAMETER
+    # TIME PARAMETER
+SIMULATION_STEPS_PER_SECOND = 4
+SIMULATION_WAIT_TIME = 0
+start_time = datetime.strptime("2024-03-04 09:15:00", "%Y-%m-%d %H:%M:%S")
+end_time = datetime.strptime("2024-03-04 23:00:00", "%Y-%m-%d %H:%M:%S")
+simulation_times = [dt.strftime("%Y-%m-%d %H:%M:%S") for dt in [start_time + timedelta(seconds=i) for i in range(int((end_time - start_time).total_seconds()) + 1)]]
+    # PUBLIC TRANSPORT PARAMETER
+BUS_STOP_DURATION = 20 # SECS
+    # SIGNAL CONTROL PARAMETER
+WEIGHTS_MAX_PRESSURE = {"car": 1.0, "moc": 1.0, "lwt": 1.0, "hwt": 1.0, "bus": 1.0}
+    # MODEL FILES
+SUMO_CONFIG_FILE = "../model/Configuration.sumocfg"
+ROUTE_FILES = ["../model/CarRoutes.rou.xml", "../model/BusRoutes.rou.xml"]
+DEFAULT_OUTPUT_DIR = "../model/logs" # as in the SUMO configuration
+DEPART_PATTERN = re.compile(r' depart="([^"]*)"')
+    # DEBUGGING
+DEBUG_SPAWN_LOG = False
+DEBUG_GUI = False
+
+
+
+
+# #############################################################################
+# ## METHODS
+# #############################################################################
+
+def buildSumoCommand(sumo_binary, demand_file=None, output_dir=None, compress_output=False, config_file=SUMO_CONFIG_FILE):
+    sumo_cmd = [sumo_binary, "-c", config_file, "--start", "--quit-on-end", "--time-to-teleport", "-1"]
+    if demand_file is not None:
+        route_files = [os.path.abspath(f) for f in ROUTE_FILES] + [os.path.abspath(demand_file)]
+        sumo_cmd += ["--route-files", ",".join(route_files)]
+    if compress_output and output_dir is None:
+        output_dir = DEFAULT_OUTPUT_DIR
+    if output_dir is not None:
+        # one log folder per run, so that concurrent runs do not overwrite each other;
+        # SUMO writes gzip compressed logs for file names ending on .gz
+        output_dir = os.path.abspath(output_dir)
+        os.makedirs(output_dir, exist_ok=True)
+        suffix = ".xml.gz" if compress_output else ".xml"
+        sumo_cmd += ["--emission-output", output_dir+"/Emissions"+suffix,
+                     "--summary-output", output_dir+"/Log_summary"+suffix,
+                     "--tripinfo-output", output_dir+"/TripInfos"+suffix]
+    return sumo_cmd
+
+class SimulationInstance:
+    def __init__(self, conn, control_mode, weights=None, demand_file=None, seed=None, trajectory_file=None,
+                 phase_log_file=None, controller_file=CONTROLLER_FILE, adaptive_stepping=False,
+                 n_seconds=None, pressure_mode="queue", collect_arrivals=False, vectorized_control=False, verbose=True):
+        self.conn = conn
+        self.control_mode = control_mode
+        self.demand_file = demand_file
+        self.trajectory_file = trajectory_file
+        self.phase_log_file = phase_log_file
+        # recorded trajectories need every second, so steps are not skipped then
+        self.adaptive_stepping = adaptive_stepping and trajectory_file is None
+        self.n_seconds = len(simulation_times) if n_seconds is None else min(n_seconds, len(simulation_times))
+        self.verbose = verbose
+        # arrived vehicle ids since the last reset, for hand-overs between partitions (PartitionedSimulation.py)
+        self.collect_arrivals = collect_arrivals
+        self.arrived_vehicles = []
+        self.rng = random.Random(seed)
+        self.np_rng = np.random.RandomState(seed)
+        self.t_ctr = 0
+        self.veh_ctr = 0
+        # CONTROLLERS
+        definitions = loadControllerDefinitions(controller_file)
+        if pressure_mode=="downstream":
+            # pressure = weighted upstream minus weighted downstream queues (true Max-Pressure)
+            definitions = addDownstreamLanes(definitions)
+        self.signal_controllers = [SignalController(**definition, conn=conn, rng=self.rng) for definition in definitions]
+        # RECORDER
+        if control_mode=="MAX_PRESSURE":
+            self.vehicle_registry = VehicleRegistry(WEIGHTS_MAX_PRESSURE)
+        else:
+            self.vehicle_registry = VehicleRegistry(weights)
+        self.lane_index = LaneIndex(self.signal_controllers)
+        self.state_snapshot = StateSnapshot(self.lane_index, self.vehicle_registry)
+        self.link_pressures = None
+        for controller in self.signal_controllers:
+            controller.link_slice = self.lane_index.link_slices[controller.intersection_name]
+        # all controllers decided at once by the decision kernel, ties broken by seeded per-intersection streams
+        # (pays off from some hundred intersections on, slower than the controllers for the model's)
+        self.decision_kernel = DecisionKernel.fromControllers(self.signal_controllers, seed) if vectorized_control else None
+
+    def prepare(self):
+        # LOAD VEHICLE SPAWN DATA
+        if self.demand_file is None:
+            df_veh_spawn = pd.read_csv("../model/Spawn_Vehicles.csv")
+            df_veh_spawn = df_veh_spawn.rename(columns={"Unnamed: 0": "veh_ctr"})
+            df_bus_spawn = pd.read_csv("../model/Spawn_Bus.csv")
+            df_bus_spawn = df_bus_spawn.rename(columns={"Unnamed: 0": "veh_ctr"})
+            self.veh_spawns = {t: rows for t, rows in df_veh_spawn.groupby("Adjusted_Datetime", sort=False)}
+            self.bus_spawns = {t: rows for t, rows in df_bus_spawn.groupby("Adjusted_Datetime", sort=False)}
+            # LOAD EMISSION MODEL
+            self.emission_model = loadEmissionClassesFromFile(file="../data/Emission_VehiclePopulation.xlsx")
+        # INITIALIZE CONTROLLERS
+        if not self.control_mode=="FIXED_CYCLE":
+            for controller in self.signal_controllers:
+                controller.current_gt_start = self.conn.simulation.getTime()
+                controller.determineMeasurementLanes()
+        if self.trajectory_file is not None:
+            self.trajectory_recorder = TrajectoryRecorder(self.trajectory_file, [c.intersection_name for c in self.signal_controllers])
+            self.emission_classes = {}
+        if self.phase_log_file is not None:
+            self.phase_log = open(self.phase_log_file, "w")
+            self.phase_log.write("time,intersection,phase\n")
+            self.logged_phases = {}
+        if self.adaptive_stepping:
+            self.spawn_seconds = self.loadSpawnSeconds()
+
+    def spawnRandomVehicle(self, desired_route):
+        # determine vehicle characteristics
+        new_vehicle_id = "VEH_"+str(self.veh_ctr)
+        no_truck = determineWhetherTruckBannedRoute(desired_route)
+        vehicle_class = getRandomVehicleClass(no_truck, rng=self.np_rng)
+        emission_class = getRandomEmissionClass(vehicle_class, self.emission_model, rng=self.np_rng)
+        vehicle_type = sumo_vehicle_types[vehicle_class]
+        # add vehicle with traci
+        self.conn.vehicle.add(new_vehicle_id, desired_route, typeID=vehicle_type)
+        self.conn.vehicle.setEmissionClass(new_vehicle_id, emission_class)
+        if DEBUG_SPAWN_LOG:
+            print(new_vehicle_id, no_truck, vehicle_class, emission_class, vehicle_type)
+        self.vehicle_registry.register(new_vehicle_id, vehicle_class, desired_route)
+
+    def spawnRandomBus(self, desired_route, stops):
+        # determine vehicle characteristics
+        new_vehicle_id = "BUS_"+str(self.veh_ctr)+"-"+desired_route
+        vehicle_class = "bus"
+        emission_class = getRandomEmissionClass(vehicle_class, self.emission_model, rng=self.np_rng)
+        vehicle_type = sumo_vehicle_types[vehicle_class]
+        # add vehicle with traci
+        self.conn.vehicle.add(new_vehicle_id, desired_route, typeID=vehicle_type)
+        self.conn.vehicle.setEmissionClass(new_vehicle_id, emission_class)
+        for stop in stops.split("-"):
+            self.conn.vehicle.setBusStop(new_vehicle_id, stop, duration=BUS_STOP_DURATION)
+        if DEBUG_SPAWN_LOG:
+            print(new_vehicle_id, False, vehicle_class, emission_class, vehicle_type)
+        self.vehicle_registry.register(new_vehicle_id, vehicle_class, desired_route)
+
+    def registerDepartedVehicles(self):
+        # vehicles loaded natively from a compiled demand file are registered on departure
+        for v_id in self.conn.simulation.getDepartedIDList():
+            vehicle_class = determineVehicleClassFromType(self.conn.vehicle.getTypeID(v_id))
+            self.vehicle_registry.register(v_id, vehicle_class, self.conn.vehicle.getRouteID(v_id))
+
+    def recordTrajectory(self, current_time):
+        current_vehicles = self.conn.vehicle.getIDList()
+        positions = [self.conn.vehicle.getPosition(v_id) for v_id in current_vehicles]
+        angles = [self.conn.vehicle.getAngle(v_id) for v_id in current_vehicles]
+        speeds = [self.conn.vehicle.getSpeed(v_id) for v_id in current_vehicles]
+        accels = [self.conn.vehicle.getAcceleration(v_id) for v_id in current_vehicles]
+        slopes = [self.conn.vehicle.getSlope(v_id) for v_id in current_vehicles]
+        # the emission class of a vehicle does not change, it is queried once
+        for v_id in current_vehicles:
+            if v_id not in self.emission_classes:
+                self.emission_classes[v_id] = self.conn.vehicle.getEmissionClass(v_id)
+        eclasses = [self.emission_classes[v_id] for v_id in current_vehicles]
+        signal_states = [self.conn.trafficlight.getRedYellowGreenState(c.intersection_name) for c in self.signal_controllers]
+        self.trajectory_recorder.record(current_time, current_vehicles, self.vehicle_registry.classCodesOf(current_vehicles), positions, angles, signal_states,
+                                        speeds, accels, slopes, eclasses)
+
+    def loadSpawnSeconds(self):
+        # simulation seconds at which vehicles are spawned or depart, sorted
+        if self.demand_file is None:
+            spawn_times = set(self.veh_spawns) | set(self.bus_spawns)
+            spawn_seconds = [t_ctr for t_ctr, t in enumerate(simulation_times) if t in spawn_times]
+        else:
+            spawn_seconds = set()
+            with open(self.demand_file, "r") as f:
+                # line by line, demand files of scaled demand can be large
+                for line in f:
+                    for d in DEPART_PATTERN.findall(line):
+                        spawn_seconds.add(int(float(d)))
+            spawn_seconds = sorted(spawn_seconds)
+        return np.asarray(spawn_seconds, dtype=np.int64)
+
+    def determineSkippableSeconds(self):
+        # seconds after t_ctr that need neither measurement, control nor spawning
+        if self.conn.vehicle.getIDCount()>0 or len(self.conn.simulation.getPendingVehicles())>0:
+            return 0
+        next_spawn = np.searchsorted(self.spawn_seconds, self.t_ctr)
+        next_spawn = self.spawn_seconds[next_spawn] if next_spawn<len(self.spawn_seconds) else self.n_seconds
+        skippable = min(next_spawn-self.t_ctr-2, self.n_seconds-self.t_ctr-2)
+        if self.control_mode=="FIXED_CYCLE":
+            pass
+        elif self.decision_kernel is not None:
+            skippable = min(skippable, int(self.decision_kernel.quietSeconds(self.t_ctr).min()))
+        else:
+            for controller in self.signal_controllers:
+                skippable = min(skippable, controller.quietSeconds(self.t_ctr))
+        return max(0, skippable)
+
+    def logPhaseChanges(self, current_time):
+        for controller in self.signal_controllers:
+            if self.logged_phases.get(controller.intersection_name)!=controller.current_phase:
+                self.logged_phases[controller.intersection_name] = controller.current_phase
+                self.phase_log.write("%s,%s,%d\n" % (current_time, controller.intersection_name, controller.current_phase))
+
+    def determineCurrentState(self, controllers):
+        # measures only the lanes of the given controllers
+        measurement_lanes = dict.fromkeys(lane for c in controllers for lane in c.measurement_lanes)
+        current_vehicles = []
+        current_lanes = []
+        for lane in measurement_lanes:
+            lane_vehicles = self.conn.lane.getLastStepVehicleIDs(lane)
+            current_vehicles += lane_vehicles
+            current_lanes += [lane]*len(lane_vehicles)
+        if len(current_vehicles)==0:
+            self.state_snapshot.clear()
+            return
+        hidden_edges = []
+        for v_ctr in range(0, len(current_vehicles)):
+            if not current_lanes[v_ctr].startswith(":"):
+                hidden_edges.append(None)
+            else:
+                v_id = current_vehicles[v_ctr]
+                v_route = self.conn.vehicle.getRoute(v_id)
+                v_current_edge_index = self.conn.vehicle.getRouteIndex(v_id)
+                hidden_edges.append(v_route[v_current_edge_index])
+        self.state_snapshot.update(current_vehicles, current_lanes, hidden_edges)
+
+    def finished(self):
+        return self.t_ctr>=self.n_seconds
+
+    def control(self):
+        # measure and control for the current second (Python side only, plus TraCI queries)
+        current_time = simulation_times[self.t_ctr]
+        if self.control_mode=="FIXED_CYCLE":
+            pass
+        elif self.decision_kernel is not None:
+            self.controlVectorized()
+            if self.phase_log_file is not None:
+                self.logPhaseChanges(current_time)
+        else:
+            due_controllers = [c for c in self.signal_controllers if c.isDue(self.t_ctr)]
+            # MEASURE (ONLY FOR CONTROLLERS THAT DECIDE ON PRESSURES NOW)
+            measured_controllers = [c for c in due_controllers if c.needsPressures()]
+            if len(measured_controllers)>0:
+                self.determineCurrentState(measured_controllers)
+                self.link_pressures = self.state_snapshot.computeLinkPressures()
+            # CONTROL / SET TRAFFIC LIGHTS
+            for controller in due_controllers:
+                controller.doSignalLogic(self.link_pressures)
+            if self.phase_log_file is not None:
+                self.logPhaseChanges(current_time)
+        if self.demand_file is None:
+            # SPAWN CARS
+            if current_time in self.veh_spawns:
+                for idx, row in self.veh_spawns[current_time].iterrows():
+                    for x in range(0, int(np.ceil(row["n_spawn"]))):
+                        self.veh_ctr += 1
+                        self.spawnRandomVehicle(desired_route=str(row["route"]))
+            # SPAWN BUSSES
+            if current_time in self.bus_spawns:
+                for idx, row in self.bus_spawns[current_time].iterrows():
+                    self.veh_ctr += 1
+                    self.spawnRandomBus(desired_route=str(row["route"]), stops=str(row["Stops"]))
+
+    def controlVectorized(self):
+        kernel = self.decision_kernel
+        due = kernel.isDue(self.t_ctr)
+        measured = np.flatnonzero(due & kernel.needsPressures())
+        if len(measured)>0:
+            self.determineCurrentState([self.signal_controllers[i] for i in measured])
+            self.link_pressures = self.state_snapshot.computeLinkPressures()
+        phases = kernel.step(self.link_pressures, self.conn.simulation.getTime(), due)
+        for i in np.flatnonzero(due):
+            controller = self.signal_controllers[i]
+            controller.current_phase = int(phases[i])
+            controller.setSignalOnTrafficLights()
+
+    def step(self):
+        # advance SUMO by one second (or more, while nothing is due)
+        current_time = simulation_times[self.t_ctr]
+        # SKIP AHEAD WHILE THE NETWORK IS EMPTY AND NOTHING IS DUE
+        skipped = self.determineSkippableSeconds() if self.adaptive_stepping else 0
+        if skipped>0:
+            if not self.control_mode=="FIXED_CYCLE":
+                for controller in self.signal_controllers:
+                    controller.skipSeconds(self.t_ctr, skipped)
+                if self.decision_kernel is not None:
+                    self.decision_kernel.skipSeconds(self.t_ctr, skipped)
+            self.conn.simulationStep(self.conn.simulation.getTime()+1+skipped)
+        else:
+            # RUN SIMULATION FOR ONE SECOND
+            for n in range(0,SIMULATION_STEPS_PER_SECOND):
+                self.conn.simulationStep()
+                if self.demand_file is not None:
+                    self.registerDepartedVehicles()
+                arrived_vehicles = self.conn.simulation.getArrivedIDList()
+                self.vehicle_registry.release(arrived_vehicles)
+                if self.collect_arrivals:
+                    self.arrived_vehicles += arrived_vehicles
+        if self.trajectory_file is not None:
+            self.recordTrajectory(self.conn.simulation.getTime())
+        if DEBUG_GUI:
+            time.sleep(SIMULATION_WAIT_TIME)
+        if self.verbose:
+            print(current_time)
+        self.t_ctr += 1+skipped
+
+    def advance(self, n_seconds=1):
+        # runs up to n_seconds simulated seconds, returns False once the run is finished
+        target = self.t_ctr+n_seconds
+        while self.t_ctr<target and not self.finished():
+            self.control()
+            self.step()
+        return not self.finished()
+
+    def run(self):
+        while not self.finished():
+            self.control()
+            self.step()
+
+    def close(self):
+        self.conn.close()
+        if self.trajectory_file is not None:
+            self.trajectory_recorder.close()
+        if self.phase_log_file is not None:
+            self.phase_log.close()
@@ -0,0 +1,171 @@
+# #############################################################################
+# ####### GREEN-PRESSURE - EMISSION-REDUCING SIGNALIZED INTERSECTION MANAGEMENT
+# #######
+# #######     AUTHOR:       Kevin Riehl <kriehl@ethz.ch>
+# #######     YEAR :        2025
+# #######     ORGANIZATION: Traffic Engineering Group (SVT),
+# #######                   Institute for Transportation Planning and Systems,
+# #######                   ETH Zürich
+# #############################################################################
+"""
+This code contains the per-step state representation of the microsimulation:
+a lane index over all controlled lanes and a snapshot made of preallocated
+NumPy arrays (location index, class code, weight, hidden flag) that is reused
+across steps. The pressures of all links of all controllers are computed in
+one vectorized pass, either from the upstream queues only, or as upstream
+minus downstream queues where the controllers have downstream lanes. A
+pandas view is only built on demand for debugging.
+"""
+
+
+
+
+# #############################################################################
+# ## IMPORTS
+# #############################################################################
+import numpy as np
+from VehicleRegistry import VEHICLE_CLASSES, UNKNOWN_CLASS
+
+
+
+
+# #############################################################################
+# ## METHODS
+# #############################################################################
+
+def flattenMembers(members):
+    # list of location lists -> (flat members, start and size of every list)
+    flat = np.asarray([m for group in members for m in group], dtype=np.int64)
+    sizes = np.asarray([len(group) for group in members], dtype=np.int64)
+    starts = np.concatenate(([0], np.cumsum(sizes)[:-1])).astype(np.int64)
+    return flat, starts, sizes
+
+def sumMembers(location_values, members, starts, sizes):
+    if len(sizes)==0:
+        return np.zeros(0)
+    if len(members)==0:
+        return np.zeros(len(sizes))
+    # reduceat on a start equal to the length of members is invalid, so empty
+    # groups at the end are clipped and then zeroed like the others
+    values = np.add.reduceat(location_values[members], np.minimum(starts, len(members)-1))
+    values[sizes==0] = 0.0
+    return values
+
+class LaneIndex:
+    """
+    Maps the measurement locations of all controllers to integers. A location
+    is either a lane ID or "@"+edge for vehicles hidden on an internal
+    junction lane, the last index is a sink for everything not controlled.
+    Links of controllers with downstream lanes also get downstream members.
+    """
+    def __init__(self, signal_controllers):
+        self.location_names = []
+        self.locations = {}
+        self.link_slices = {}
+        members = []
+        downstream_members = []
+        for controller in signal_controllers:
+            start = len(members)
+            downstream = getattr(controller, "downstream", None)
+            for link in controller.links:
+                lanes = list(dict.fromkeys(controller.links[link]))
+                edges = list(dict.fromkeys(l.split("_")[0] for l in lanes))
+                members.append([self.intern(l) for l in lanes] + [self.intern("@"+e) for e in edges])
+                downstream_members.append([self.intern(l) for l in dict.fromkeys(downstream[link])] if downstream is not None else [])
+            self.link_slices[controller.intersection_name] = (start, len(members))
+        self.sink = len(self.location_names)
+        self.n_locations = self.sink+1
+        self.link_members, self.link_starts, self.link_sizes = flattenMembers(members)
+        self.downstream_members, self.downstream_starts, self.downstream_sizes = flattenMembers(downstream_members)
+        self.has_downstream = len(self.downstream_members)>0
+        self.n_links = len(members)
+
+    def intern(self, location):
+        if location not in self.locations:
+            self.locations[location] = len(self.location_names)
+            self.location_names.append(location)
+        return self.locations[location]
+
+    def locationOf(self, location):
+        return self.locations.get(location, self.sink)
+
+    def sumLinks(self, location_values):
+        return sumMembers(location_values, self.link_members, self.link_starts, self.link_sizes)
+
+    def sumDownstream(self, location_values):
+        return sumMembers(location_values, self.downstream_members, self.downstream_starts, self.downstream_sizes)
+
+
+class StateSnapshot:
+    def __init__(self, lane_index, vehicle_registry, capacity=1024):
+        self.lane_index = lane_index
+        self.vehicle_registry = vehicle_registry
+        self.n = 0
+        self.veh_ids = ()
+        self.lanes = ()
+        self.hidden_edges = ()
+        self.allocate(capacity)
+
+    def allocate(self, capacity):
+        self.location = np.full(capacity, self.lane_index.sink, dtype=np.int64)
+        self.slot = np.full(capacity, -1, dtype=np.int64)
+        self.class_code = np.full(capacity, UNKNOWN_CLASS, dtype=np.int8)
+        self.weight = np.zeros(capacity, dtype=np.float64)
+        self.hidden = np.zeros(capacity, dtype=bool)
+
+    def __len__(self):
+        return self.n
+
+    def update(self, veh_ids, lanes, hidden_edges):
+        # lanes[i] is the lane of vehicle i, hidden_edges[i] its route edge if
+        # it is on an internal lane (lane starting with ":"), otherwise None
+        n = len(veh_ids)
+        if n>len(self.location):
+            self.allocate(max(n, 2*len(self.location)))
+        location = self.location
+        slot = self.slot
+        hidden = self.hidden
+        locationOf = self.lane_index.locationOf
+        slots = self.vehicle_registry.slots
+        for i in range(0, n):
+            if hidden_edges[i] is None:
+                location[i] = locationOf(lanes[i])
+                hidden[i] = False
+            else:
+                location[i] = locationOf("@"+hidden_edges[i])
+                hidden[i] = True
+            slot[i] = slots.get(veh_ids[i], -1)
+        known = slot[:n]>=0
+        np.take(self.vehicle_registry.class_code, slot[:n], out=self.class_code[:n])
+        np.take(self.vehicle_registry.weight, slot[:n], out=self.weight[:n])
+        self.class_code[:n][~known] = UNKNOWN_CLASS
+        self.weight[:n][~known] = 0.0
+        self.veh_ids = veh_ids
+        self.lanes = lanes
+        self.hidden_edges = hidden_edges
+        self.n = n
+
+    def clear(self):
+        self.n = 0
+        self.veh_ids = ()
+        self.lanes = ()
+        self.hidden_edges = ()
+
+    def computeLinkPressures(self):
+        location_weights = np.bincount(self.location[:self.n], weights=self.weight[:self.n], minlength=self.lane_index.n_locations)
+        link_pressures = self.lane_index.sumLinks(location_weights)
+        if self.lane_index.has_downstream:
+            link_pressures -= self.lane_index.sumDownstream(location_weights)
+        return link_pressures
+
+    def toDataFrame(self):
+        import pandas as pd
+        n = self.n
+        df = pd.DataFrame({
+            "veh_id": list(self.veh_ids),
+            "lane": [l if e is None else "@"+e for l, e in zip(self.lanes, self.hidden_edges)],
+            "class": [VEHICLE_CLASSES[c] if c>=0 else None for c in self.class_code[:n]],
+            "weight": self.weight[:n].copy(),
+            "hidden": self.hidden[:n].copy(),
+        })
+        return df
@@ -0,0 +1,120 @@
+# #############################################################################
+# ####### GREEN-PRESSURE - EMISSION-REDUCING SIGNALIZED INTERSECTION MANAGEMENT
+# #######
+# #######     AUTHOR:       Kevin Riehl <kriehl@ethz.ch>
+# #######     YEAR :        2025
+# #######     ORGANIZATION: Traffic Engineering Group (SVT),
+# #######                   Institute for Transportation Planning and Systems,
+# #######                   ETH Zürich
+# #############################################################################
+"""
+This code records vehicle positions, classes, kinematics (speed,
+acceleration, slope), emission classes and signal states during a headless
+run into a compact trajectory file, so animations can be rendered offline
+(see gif_animation/RenderTrajectoryFrames.py) without sumo-gui, and
+emissions can be estimated offline (see EmissionEstimator.py) without the
+SUMO emission device.
+
+The file is a sequence of np.save() records: first the intersection names,
+then per chunk one structured array of vehicle rows, one of signal rows and
+the emission class names so far (the vehicle rows hold indices into it).
+Files recorded before the kinematics were added have no emission class
+record and are read as well.
+"""
+
+
+
+
+# #############################################################################
+# ## IMPORTS
+# #############################################################################
+import numpy as np
+
+
+
+
+# #############################################################################
+# ## PARAMETERS
+# #############################################################################
+VEHICLE_DTYPE = np.dtype([("time", np.float32), ("veh", np.int32), ("class_code", np.int8),
+                          ("x", np.float32), ("y", np.float32), ("angle", np.float32),
+                          ("speed", np.float32), ("accel", np.float32), ("slope", np.float32), ("eclass", np.int16)])
+SIGNAL_DTYPE = np.dtype([("time", np.float32), ("intersection", np.int16), ("state", "S64")])
+
+
+
+
+# #############################################################################
+# ## METHODS
+# #############################################################################
+
+def vehicleNumber(veh_id):
+    # "VEH_12" -> 12, "BUS_45-route_101" -> 45 (both share the spawn counter)
+    return int(veh_id.split("_")[1].split("-")[0])
+
+class TrajectoryRecorder:
+    def __init__(self, file, intersections, chunk_steps=300):
+        self.file = open(file, "wb")
+        self.intersections = list(intersections)
+        self.chunk_steps = chunk_steps
+        self.vehicle_rows = []
+        self.signal_rows = []
+        self.eclass_codes = {}
+        np.save(self.file, np.asarray(self.intersections, dtype="U64"))
+
+    def eclassCode(self, eclass):
+        if eclass not in self.eclass_codes:
+            self.eclass_codes[eclass] = len(self.eclass_codes)
+        return self.eclass_codes[eclass]
+
+    def record(self, time, veh_ids, class_codes, positions, angles, signal_states, speeds=None, accels=None, slopes=None, eclasses=None):
+        rows = np.empty(len(veh_ids), dtype=VEHICLE_DTYPE)
+        rows["time"] = time
+        rows["veh"] = [vehicleNumber(v) for v in veh_ids]
+        rows["class_code"] = class_codes
+        if len(veh_ids)>0:
+            positions = np.asarray(positions, dtype=np.float32)
+            rows["x"] = positions[:,0]
+            rows["y"] = positions[:,1]
+            rows["angle"] = angles
+        rows["speed"] = speeds if speeds is not None else np.nan
+        rows["accel"] = accels if accels is not None else np.nan
+        rows["slope"] = slopes if slopes is not None else np.nan
+        rows["eclass"] = [self.eclassCode(e) for e in eclasses] if eclasses is not None else -1
+        self.vehicle_rows.append(rows)
+        signals = np.empty(len(signal_states), dtype=SIGNAL_DTYPE)
+        signals["time"] = time
+        signals["intersection"] = np.arange(len(signal_states))
+        signals["state"] = [s.encode() for s in signal_states]
+        self.signal_rows.append(signals)
+        if len(self.vehicle_rows)>=self.chunk_steps:
+            self.flush()
+
+    def flush(self):
+        if len(self.vehicle_rows)==0:
+            return
+        np.save(self.file, np.concatenate(self.vehicle_rows))
+        np.save(self.file, np.concatenate(self.signal_rows))
+        np.save(self.file, np.asarray(list(self.eclass_codes), dtype="U64"))
+        self.vehicle_rows = []
+        self.signal_rows = []
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+def loadTrajectoryChunks(file, with_emission_classes=False):
+    # yields (intersections, vehicle_rows, signal_rows[, emission class names]) chunk by chunk
+    with open(file, "rb") as f:
+        intersections = [str(i) for i in np.load(f)]
+        while True:
+            try:
+                vehicle_rows = np.load(f)
+                signal_rows = np.load(f)
+                eclasses = [str(e) for e in np.load(f)] if "eclass" in vehicle_rows.dtype.names else []
+            except (EOFError, ValueError):
+                break
+            if with_emission_classes:
+                yield intersections, vehicle_rows, signal_rows, eclasses
+            else:
+                yield intersections, vehicle_rows, signal_rows
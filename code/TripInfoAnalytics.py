@@ -0,0 +1,306 @@
+# #############################################################################
+# ####### GREEN-PRESSURE - EMISSION-REDUCING SIGNALIZED INTERSECTION MANAGEMENT
+# #######
+# #######     AUTHOR:       Kevin Riehl <kriehl@ethz.ch>
+# #######     YEAR :        2025
+# #######     ORGANIZATION: Traffic Engineering Group (SVT),
+# #######                   Institute for Transportation Planning and Systems,
+# #######                   ETH Zürich
+# #############################################################################
+"""
+This code aggregates SUMO TripInfos.xml logs in a single streaming pass:
+per vehicle class (car, moc, lwt, hwt, bus) and per route it collects
+travel time, delay (timeLoss), waiting time and stop time distributions with
+bounded memory, and it aggregates many runs in parallel into one comparison
+table in the style of figures/Tab_1_Comparison.xlsx.
+"""
+
+
+
+
+# #############################################################################
+# ## IMPORTS
+# #############################################################################
+import argparse
+import re
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from DemandModel import determineVehicleClassFromType
+from EmissionLogs import openLog, POLLUTANT_ATTRIBUTES, ATTRIBUTE_GOAL_WEIGHTS
+from VehicleRegistry import VEHICLE_CLASSES
+
+
+
+
+# #############################################################################
+# ## PARAMETERS
+# #############################################################################
+METRICS = ["duration", "timeLoss", "waitingTime", "stopTime"]
+POLLUTANTS = POLLUTANT_ATTRIBUTES
+AQI_WEIGHTS = ATTRIBUTE_GOAL_WEIGHTS
+# geometric histogram bins from 0.1s to ~28h, ~3.5% relative quantile resolution
+HISTOGRAM_EDGES = np.concatenate(([0.0], np.geomspace(0.1, 1e5, 400)))
+ROUTE_FILES = ["../model/CarRoutes.rou.xml", "../model/BusRoutes.rou.xml"]
+ATTRIBUTE_PATTERN = re.compile(r'(\w+)="([^"]*)"')
+
+
+
+
+# #############################################################################
+# ## METHODS
+# #############################################################################
+
+class StreamingDistribution:
+    def __init__(self):
+        self.n = 0
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.minimum = np.inf
+        self.maximum = -np.inf
+        self.counts = np.zeros(len(HISTOGRAM_EDGES), dtype=np.int64)
+
+    def add(self, value):
+        self.n += 1
+        self.total += value
+        self.total_sq += value*value
+        self.minimum = min(self.minimum, value)
+        self.maximum = max(self.maximum, value)
+        self.counts[max(0, np.searchsorted(HISTOGRAM_EDGES, value, side="right")-1)] += 1
+
+    def merge(self, other):
+        self.n += other.n
+        self.total += other.total
+        self.total_sq += other.total_sq
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+        self.counts += other.counts
+
+    def mean(self):
+        return self.total/self.n if self.n>0 else np.nan
+
+    def std(self):
+        if self.n<2:
+            return np.nan
+        return np.sqrt(max(0.0, (self.total_sq - self.total*self.total/self.n)/(self.n-1)))
+
+    def quantile(self, q):
+        if self.n==0:
+            return np.nan
+        cumulative = np.cumsum(self.counts)
+        b = int(np.searchsorted(cumulative, q*self.n))
+        upper = HISTOGRAM_EDGES[b+1] if b+1<len(HISTOGRAM_EDGES) else self.maximum
+        return float(min(max(upper, self.minimum), self.maximum))
+
+    def summary(self):
+        return {"n": self.n, "mean": self.mean(), "std": self.std(), "min": self.minimum if self.n else np.nan,
+                "p50": self.quantile(0.5), "p90": self.quantile(0.9), "p99": self.quantile(0.99),
+                "max": self.maximum if self.n else np.nan}
+
+
+class TripInfoSummary:
+    """
+    Aggregates of one or more TripInfos.xml files. Per class it keeps the
+    distributions of METRICS and the sums behind the Tab_1 columns, per route
+    the distributions of METRICS.
+    """
+    SUM_FIELDS = ["routeLength", "waitingCount", "rel_delay", "rel_waiting", "speed", "unfinished"] + \
+                 [p+"_abs" for p in POLLUTANTS] + [p+"_rate" for p in POLLUTANTS] + ["AQI_abs", "AQI_rate"]
+
+    def __init__(self, label=None):
+        self.label = label
+        self.n_runs = 0
+        self.classes = {}
+        self.routes = {}
+        self.sums = {}
+
+    def group(self, groups, key):
+        if key not in groups:
+            groups[key] = {m: StreamingDistribution() for m in METRICS}
+        return groups[key]
+
+    def addTrip(self, vehicle_class, route, trip, emissions):
+        if vehicle_class not in self.sums:
+            self.sums[vehicle_class] = dict.fromkeys(self.SUM_FIELDS, 0.0)
+        sums = self.sums[vehicle_class]
+        if float(trip["arrival"])<0:
+            sums["unfinished"] += 1
+            return
+        duration = float(trip["duration"])
+        class_group = self.group(self.classes, vehicle_class)
+        route_group = self.group(self.routes, route)
+        for metric in METRICS:
+            value = float(trip[metric])
+            class_group[metric].add(value)
+            route_group[metric].add(value)
+        sums["routeLength"] += float(trip["routeLength"])
+        sums["waitingCount"] += float(trip["waitingCount"])
+        if duration>0:
+            sums["rel_delay"] += float(trip["timeLoss"])/duration*100
+            sums["rel_waiting"] += float(trip["waitingTime"])/duration*100
+            sums["speed"] += float(trip["routeLength"])/duration*3.6
+        aqi = 0.0
+        for pollutant in POLLUTANTS:
+            value = float(emissions.get(pollutant+"_abs", 0.0))
+            aqi += value*AQI_WEIGHTS[pollutant]
+            sums[pollutant+"_abs"] += value
+            if duration>0:
+                sums[pollutant+"_rate"] += value/(duration/60)
+        sums["AQI_abs"] += aqi
+        if duration>0:
+            sums["AQI_rate"] += aqi/(duration/60)
+
+    def merge(self, other):
+        self.n_runs += other.n_runs
+        for source, target in [(other.classes, self.classes), (other.routes, self.routes)]:
+            for key, distributions in source.items():
+                group = self.group(target, key)
+                for metric in METRICS:
+                    group[metric].merge(distributions[metric])
+        for vehicle_class, sums in other.sums.items():
+            if vehicle_class not in self.sums:
+                self.sums[vehicle_class] = dict.fromkeys(self.SUM_FIELDS, 0.0)
+            for field, value in sums.items():
+                self.sums[vehicle_class][field] += value
+        return self
+
+    def comparisonTable(self):
+        # one row per vehicle class, columns as in figures/Tab_1_Comparison.xlsx
+        # (averages over vehicles, totals averaged over runs)
+        n_total = sum(self.classes[c]["duration"].n for c in self.classes)
+        runs = max(1, self.n_runs)
+        rows = []
+        for vehicle_class in [c for c in VEHICLE_CLASSES if c in self.classes]:
+            sums = self.sums[vehicle_class]
+            n = self.classes[vehicle_class]["duration"].n
+            delay = self.classes[vehicle_class]["timeLoss"]
+            waiting = self.classes[vehicle_class]["waitingTime"]
+            row = {
+                "run": self.label,
+                "class": vehicle_class,
+                "Fleet Share [%]": n/n_total*100,
+                "Av. Delay Time [s]": delay.mean(),
+                "Av. Rel. Delay Time [%]": sums["rel_delay"]/n,
+                "Av. Speed [km/h]": sums["speed"]/n,
+                "Av. Waiting Time [s]": waiting.mean(),
+                "Av. Rel. Waiting Time [%]": sums["rel_waiting"]/n,
+                "Av. Num. Waits": sums["waitingCount"]/n,
+                "Total Delay Time [h]": delay.total/3600/runs,
+                "Total Waiting Time [h]": waiting.total/3600/runs,
+                "Total Num. Waits": sums["waitingCount"]/runs,
+                "Av. AQI Emission [mg/min]": sums["AQI_rate"]/n,
+            }
+            for pollutant in POLLUTANTS:
+                row["Av. "+pollutant+" Emission [mg/min]"] = sums[pollutant+"_rate"]/n
+            row["Total AQI Emission [kg]"] = sums["AQI_abs"]/1e6/runs
+            row["Unfinished Trips"] = sums["unfinished"]/runs
+            rows.append(row)
+        return pd.DataFrame(rows)
+
+    def distributionTable(self, by="class"):
+        groups = self.classes if by=="class" else self.routes
+        rows = []
+        for key in sorted(groups):
+            for metric in METRICS:
+                rows.append({"run": self.label, by: key, "metric": metric, **groups[key][metric].summary()})
+        return pd.DataFrame(rows)
+
+
+def loadRouteEndpoints(route_files=ROUTE_FILES):
+    # (first edge, last edge) -> route id, to recover the route of a trip
+    endpoints = {}
+    for file in route_files:
+        for _, elem in ET.iterparse(file):
+            if elem.tag=="route":
+                edges = elem.attrib["edges"].split(" ")
+                endpoints.setdefault((edges[0], edges[-1]), elem.attrib["id"])
+            elem.clear()
+    return endpoints
+
+def laneEdge(lane):
+    return lane.rsplit("_", 1)[0]
+
+def determineTripRoute(trip, route_endpoints):
+    veh_id = trip["id"]
+    if veh_id.startswith("BUS_") and "-" in veh_id:
+        return veh_id.split("-", 1)[1]
+    key = (laneEdge(trip["departLane"]), laneEdge(trip["arrivalLane"]))
+    return route_endpoints.get(key, key[0]+"->"+key[1])
+
+def iterTripInfos(file):
+    # yields (tripinfo attributes, emissions attributes) of every trip
+    trip = None
+    with openLog(file) as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith("<tripinfo "):
+                if trip is not None:
+                    yield trip, {}
+                trip = dict(ATTRIBUTE_PATTERN.findall(line))
+                if line.endswith("/>"):
+                    yield trip, {}
+                    trip = None
+            elif line.startswith("<emissions ") and trip is not None:
+                yield trip, dict(ATTRIBUTE_PATTERN.findall(line))
+                trip = None
+    if trip is not None:
+        yield trip, {}
+
+def summarizeTripInfos(file, label=None, route_endpoints=None):
+    if route_endpoints is None:
+        route_endpoints = loadRouteEndpoints()
+    summary = TripInfoSummary(label if label is not None else file)
+    summary.n_runs = 1
+    for trip, emissions in iterTripInfos(file):
+        vehicle_class = determineVehicleClassFromType(trip["vType"])
+        summary.addTrip(vehicle_class, determineTripRoute(trip, route_endpoints), trip, emissions)
+    return summary
+
+def aggregateTripInfos(files, labels=None, workers=None):
+    """
+    Summarizes many TripInfos.xml files on a process pool. Runs sharing a
+    label (e.g. seeds of one controller) are merged into one summary.
+    """
+    labels = labels if labels is not None else files
+    route_endpoints = loadRouteEndpoints()
+    summaries = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(summarizeTripInfos, f, l, route_endpoints) for f, l in zip(files, labels)]
+        for future in futures:
+            summary = future.result()
+            if summary.label in summaries:
+                summaries[summary.label].merge(summary)
+            else:
+                summaries[summary.label] = summary
+    return summaries
+
+def comparisonTable(summaries):
+    return pd.concat([s.comparisonTable() for s in summaries.values()], ignore_index=True)
+
+
+
+
+# #############################################################################
+# ## MAIN CODE
+# #############################################################################
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Aggregate TripInfos.xml logs into per-class / per-route statistics.")
+    parser.add_argument("files", nargs="+", help="TripInfos.xml files, optionally as LABEL=FILE")
+    parser.add_argument("--output", default="trip_comparison.xlsx", help="comparison table (.xlsx or .csv)")
+    parser.add_argument("--distributions", default=None, help="optional per-class and per-route distributions (.csv)")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+    labels = [f.split("=", 1)[0] if "=" in f else f for f in args.files]
+    files = [f.split("=", 1)[1] if "=" in f else f for f in args.files]
+    summaries = aggregateTripInfos(files, labels, workers=args.workers)
+    df_comparison = comparisonTable(summaries)
+    if args.output.endswith(".csv"):
+        df_comparison.to_csv(args.output, index=False)
+    else:
+        df_comparison.to_excel(args.output, index=False)
+    print(df_comparison.to_string())
+    if args.distributions is not None:
+        df_distributions = pd.concat([s.distributionTable("class") for s in summaries.values()] +
+                                     [s.distributionTable("route") for s in summaries.values()], ignore_index=True)
+        df_distributions.to_csv(args.distributions, index=False)
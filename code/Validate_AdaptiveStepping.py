@@ -0,0 +1,86 @@
+# #############################################################################
+# ####### GREEN-PRESSURE - EMISSION-REDUCING SIGNALIZED INTERSECTION MANAGEMENT
+# #######
+# #######     AUTHOR:       Kevin Riehl <kriehl@ethz.ch>
+# #######     YEAR :        2025
+# #######     ORGANIZATION: Traffic Engineering Group (SVT),
+# #######                   Institute for Transportation Planning and Systems,
+# #######                   ETH Zürich
+# #############################################################################
+"""
+This code checks that "RunSimulation.py --adaptive-steps" does not change
+the simulation: the same seeded run is executed once stepping every second
+and once with adaptive stepping, and the logged signal phase sequences
+(--phase-log) and the emission / trip totals must be identical.
+"""
+
+
+
+
+# #############################################################################
+# ## IMPORTS
+# #############################################################################
+import argparse
+import subprocess
+import sys
+import time
+import pandas as pd
+from RunScoring import scoreRun
+
+
+
+
+# #############################################################################
+# ## METHODS
+# #############################################################################
+
+def runSimulation(sumo_path, controller, weights, seed, phase_log, adaptive, demand_file=None):
+    arguments = ["--sumo-path", sumo_path, "--controller", controller, "--weights", weights,
+                 "--seed", str(seed), "--phase-log", phase_log]
+    if demand_file is not None:
+        arguments += ["--demand-file", demand_file]
+    if adaptive:
+        arguments += ["--adaptive-steps"]
+    start = time.time()
+    result = subprocess.run([sys.executable, "RunSimulation.py"] + arguments, capture_output=True, text=True)
+    if result.returncode!=0:
+        print(result.stderr)
+        sys.exit(result.returncode)
+    duration = time.time()-start
+    objectives, _ = scoreRun()
+    return duration, objectives
+
+
+
+
+# #############################################################################
+# ## MAIN CODE
+# #############################################################################
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check that adaptive stepping leaves phase sequences and totals unchanged.")
+    parser.add_argument("--sumo-path", required=True)
+    parser.add_argument("--controller", default="GREEN_PRESSURE", choices=["MAX_PRESSURE", "GREEN_PRESSURE"])
+    parser.add_argument("--weights", default="1,1,1,1,1")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--demand-file", default=None)
+    args = parser.parse_args()
+
+    duration_ref, objectives_ref = runSimulation(args.sumo_path, args.controller, args.weights, args.seed,
+                                                 "phases_reference.csv", False, args.demand_file)
+    duration_ada, objectives_ada = runSimulation(args.sumo_path, args.controller, args.weights, args.seed,
+                                                 "phases_adaptive.csv", True, args.demand_file)
+    phases_ref = pd.read_csv("phases_reference.csv")
+    phases_ada = pd.read_csv("phases_adaptive.csv")
+    same_phases = phases_ref.equals(phases_ada)
+    same_objectives = objectives_ref==objectives_ada
+    print("PHASE CHANGES", len(phases_ref), "vs.", len(phases_ada), "IDENTICAL" if same_phases else "DIFFERENT")
+    if not same_phases:
+        merged = phases_ref.merge(phases_ada, how="outer", indicator=True)
+        print(merged[merged["_merge"]!="both"].head(20).to_string())
+    print("OBJECTIVES", "IDENTICAL" if same_objectives else "DIFFERENT")
+    if not same_objectives:
+        for key in objectives_ref:
+            if objectives_ref[key]!=objectives_ada.get(key):
+                print("\t", key, objectives_ref[key], objectives_ada.get(key))
+    print("RUNTIME", "%.1fs" % duration_ref, "vs.", "%.1fs" % duration_ada, "(adaptive)")
+    sys.exit(0 if same_phases and same_objectives else 1)
@@ -0,0 +1,141 @@
+# #############################################################################
+# ####### GREEN-PRESSURE - EMISSION-REDUCING SIGNALIZED INTERSECTION MANAGEMENT
+# #######
+# #######     AUTHOR:       Kevin Riehl <kriehl@ethz.ch>
+# #######     YEAR :        2025
+# #######     ORGANIZATION: Traffic Engineering Group (SVT),
+# #######                   Institute for Transportation Planning and Systems,
+# #######                   ETH Zürich
+# #############################################################################
+"""
+This code checks that the decision kernel (DecisionKernel.py) makes exactly
+the transitions of SignalController.doSignalLogic(), without SUMO: the
+controllers of model/SignalControllers.json are replicated to n
+intersections (optionally with random timings, cadences and link
+multipliers), and both are driven tick by tick with the same synthetic link
+pressures (small integers, so that ties are frequent) and the same
+tie-break streams. State, timer, phase, next phase and green start of every
+intersection are compared after every tick, as are the quiet seconds and
+the skipped seconds of adaptive stepping.
+"""
+
+
+
+
+# #############################################################################
+# ## IMPORTS
+# #############################################################################
+import argparse
+import sys
+import numpy as np
+from ControllerDefinitions import loadControllerDefinitions, CONTROLLER_FILE
+from SignalController import SignalController
+from DecisionKernel import DecisionKernel, TieBreakStream, STATE_CODES
+
+
+
+
+# #############################################################################
+# ## METHODS
+# #############################################################################
+
+class FakeConnection:
+    # the part of a TraCI connection the controllers use
+    class Simulation:
+        def __init__(self):
+            self.time = 0.0
+        def getTime(self):
+            return self.time
+    class TrafficLight:
+        def setPhase(self, tl_id, phase):
+            pass
+        def setPhaseDuration(self, tl_id, duration):
+            pass
+    def __init__(self):
+        self.simulation = FakeConnection.Simulation()
+        self.trafficlight = FakeConnection.TrafficLight()
+
+def buildControllers(n, seed, conn, rng=None, controller_file=CONTROLLER_FILE):
+    # n controllers replicating the model's, each with its own tie-break stream; with rng,
+    # timings, cadences and link multipliers are randomized
+    definitions = loadControllerDefinitions(controller_file)
+    controllers = []
+    n_links = 0
+    for i in range(n):
+        definition = dict(definitions[i % len(definitions)])
+        definition["intersection_name"] = definition["intersection_name"]+"_"+str(i)
+        if rng is not None:
+            definition["timing"] = {"T_A": int(rng.integers(1, 8)), "T_L": int(rng.integers(1, 5)), "G_T_MIN": int(rng.integers(1, 10)),
+                                    "G_T_MAX": int(rng.integers(10, 60)), "cadence": int(rng.choice([1, 1, 2, 3]))}
+            definition["multiplier"] = {link: float(rng.choice([0.5, 1.0, 2.0])) for link in definition["links"] if rng.random()<0.5}
+        controller = SignalController(**definition, conn=conn, rng=TieBreakStream(seed, i))
+        controller.link_slice = (n_links, n_links+len(controller.links))
+        n_links += len(controller.links)
+        controllers.append(controller)
+    return controllers, n_links
+
+def compareStates(controllers, kernel):
+    # indices of intersections whose state differs
+    reference = np.asarray([[STATE_CODES[c.current_state], c.timer, c.current_phase, c.next_phase, c.current_gt_start] for c in controllers])
+    vectorized = np.stack([kernel.state, kernel.timer, kernel.phase, kernel.next_phase, kernel.gt_start], axis=1)
+    return np.flatnonzero((reference!=vectorized).any(axis=1))
+
+def runDifferential(n, n_seconds, seed, randomize, skip_every):
+    rng = np.random.default_rng(seed)
+    conn = FakeConnection()
+    controllers, n_links = buildControllers(n, seed, conn, rng if randomize else None)
+    kernel = DecisionKernel.fromControllers(controllers, seed)
+    n_ticks = 0
+    n_phase_changes = 0
+    n_skipped = 0
+    t_ctr = 0
+    while t_ctr<n_seconds:
+        conn.simulation.time = float(t_ctr)
+        # integers in [0, 4) tie often, floats never
+        link_pressures = rng.integers(0, 4, n_links).astype(np.float64) if rng.random()<0.7 else rng.random(n_links)*10
+        due = kernel.isDue(t_ctr)
+        phases_before = kernel.phase.copy()
+        for i in np.flatnonzero(due):
+            controllers[i].doSignalLogic(link_pressures)
+        kernel.step(link_pressures, conn.simulation.getTime(), due)
+        n_ticks += int(due.sum())
+        n_phase_changes += int((kernel.phase!=phases_before).sum())
+        mismatches = compareStates(controllers, kernel)
+        if len(mismatches)>0:
+            return {"n": n, "seconds": t_ctr, "ticks": n_ticks, "phase_changes": n_phase_changes, "mismatch": controllers[mismatches[0]].intersection_name}
+        skipped = 0
+        if skip_every>0 and t_ctr%skip_every==0:
+            reference_quiet = [c.quietSeconds(t_ctr) for c in controllers]
+            if reference_quiet!=kernel.quietSeconds(t_ctr).tolist():
+                return {"n": n, "seconds": t_ctr, "ticks": n_ticks, "phase_changes": n_phase_changes, "mismatch": "quiet seconds"}
+            skipped = max(0, min(reference_quiet))
+            for c in controllers:
+                c.skipSeconds(t_ctr, skipped)
+            kernel.skipSeconds(t_ctr, skipped)
+            n_skipped += skipped
+        t_ctr += 1+skipped
+    return {"n": n, "seconds": n_seconds, "ticks": n_ticks, "phase_changes": n_phase_changes, "skipped": n_skipped, "mismatch": None}
+
+
+
+
+# #############################################################################
+# ## MAIN CODE
+# #############################################################################
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Differential test of the decision kernel against SignalController.doSignalLogic().")
+    parser.add_argument("--intersections", type=int, nargs="+", default=[5, 50, 200])
+    parser.add_argument("--seconds", type=int, default=3600)
+    parser.add_argument("--seeds", type=int, nargs="+", default=[1, 2, 3])
+    parser.add_argument("--skip-every", type=int, default=97, help="try adaptive skipping every this many seconds (0: never)")
+    args = parser.parse_args()
+    n_failed = 0
+    for n in args.intersections:
+        for seed in args.seeds:
+            for randomize in [False, True]:
+                result = runDifferential(n, args.seconds, seed, randomize, args.skip_every)
+                print("N %4d SEED %d %-10s TICKS %8d PHASE CHANGES %7d SKIPPED S %5d %s" % (n, seed, "RANDOMIZED" if randomize else "MODEL",
+                      result["ticks"], result["phase_changes"], result.get("skipped", 0),
+                      "IDENTICAL" if result["mismatch"] is None else "MISMATCH AT %d S: %s" % (result["seconds"], result["mismatch"])))
+                n_failed += result["mismatch"] is not None
+    sys.exit(1 if n_failed>0 else 0)
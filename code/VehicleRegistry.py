@@ -0,0 +1,123 @@
+# #############################################################################
+# ####### GREEN-PRESSURE - EMISSION-REDUCING SIGNALIZED INTERSECTION MANAGEMENT
+# #######
+# #######     AUTHOR:       Kevin Riehl <kriehl@ethz.ch>
+# #######     YEAR :        2025
+# #######     ORGANIZATION: Traffic Engineering Group (SVT),
+# #######                   Institute for Transportation Planning and Systems,
+# #######                   ETH Zürich
+# #############################################################################
+"""
+This code contains the vehicle registry of the microsimulation, which interns
+vehicle IDs to integer slots in NumPy arrays (class code, route index, weight).
+Slots are recycled when vehicles arrive, so memory is bounded by the vehicles
+in the network rather than by the vehicles ever spawned.
+"""
+
+
+
+
+# #############################################################################
+# ## IMPORTS
+# #############################################################################
+import numpy as np
+
+
+
+
+# #############################################################################
+# ## PARAMETERS
+# #############################################################################
+VEHICLE_CLASSES = ["car", "moc", "lwt", "hwt", "bus"]
+VEHICLE_CLASS_CODES = {c: i for i, c in enumerate(VEHICLE_CLASSES)}
+UNKNOWN_CLASS = -1
+
+
+
+
+# #############################################################################
+# ## METHODS
+# #############################################################################
+
+class VehicleRegistry:
+    def __init__(self, class_weights, capacity=1024):
+        self.slots = {}
+        self.free_slots = []
+        self.n_slots = 0
+        self.class_code = np.full(capacity, UNKNOWN_CLASS, dtype=np.int8)
+        self.route_index = np.full(capacity, -1, dtype=np.int32)
+        self.weight = np.zeros(capacity, dtype=np.float64)
+        self.routes = {}
+        self.route_names = []
+        self.class_weights = np.zeros(len(VEHICLE_CLASSES), dtype=np.float64)
+        self.setClassWeights(class_weights)
+
+    def setClassWeights(self, class_weights):
+        for vehicle_class, weight in class_weights.items():
+            self.class_weights[VEHICLE_CLASS_CODES[vehicle_class]] = weight
+        used = self.class_code[:self.n_slots]
+        self.weight[:self.n_slots] = np.where(used>=0, self.class_weights[used], 0.0)
+
+    def __len__(self):
+        return len(self.slots)
+
+    def __contains__(self, veh_id):
+        return veh_id in self.slots
+
+    def internRoute(self, route):
+        if route not in self.routes:
+            self.routes[route] = len(self.route_names)
+            self.route_names.append(route)
+        return self.routes[route]
+
+    def grow(self):
+        capacity = 2*len(self.class_code)
+        self.class_code = np.resize(self.class_code, capacity)
+        self.route_index = np.resize(self.route_index, capacity)
+        self.weight = np.resize(self.weight, capacity)
+
+    def register(self, veh_id, vehicle_class, route):
+        if veh_id in self.slots:
+            slot = self.slots[veh_id]
+        elif self.free_slots:
+            slot = self.free_slots.pop()
+        else:
+            if self.n_slots==len(self.class_code):
+                self.grow()
+            slot = self.n_slots
+            self.n_slots += 1
+        code = VEHICLE_CLASS_CODES.get(vehicle_class, UNKNOWN_CLASS)
+        self.slots[veh_id] = slot
+        self.class_code[slot] = code
+        self.route_index[slot] = self.internRoute(route)
+        self.weight[slot] = self.class_weights[code] if code>=0 else 0.0
+        return slot
+
+    def release(self, veh_ids):
+        for veh_id in veh_ids:
+            slot = self.slots.pop(veh_id, None)
+            if slot is None:
+                continue
+            self.class_code[slot] = UNKNOWN_CLASS
+            self.route_index[slot] = -1
+            self.weight[slot] = 0.0
+            self.free_slots.append(slot)
+
+    def slotsOf(self, veh_ids):
+        # unknown vehicles get slot -1
+        return np.fromiter((self.slots.get(v, -1) for v in veh_ids), dtype=np.int64, count=len(veh_ids))
+
+    def weightsOf(self, veh_ids):
+        slots = self.slotsOf(veh_ids)
+        return np.where(slots>=0, self.weight[slots], 0.0)
+
+    def classCodesOf(self, veh_ids):
+        slots = self.slotsOf(veh_ids)
+        return np.where(slots>=0, self.class_code[slots], UNKNOWN_CLASS)
+
+    def classOf(self, veh_id):
+        code = self.class_code[self.slots[veh_id]]
+        return VEHICLE_CLASSES[code] if code>=0 else None
+
+    def routeOf(self, veh_id):
+        return self.route_names[self.route_index[self.slots[veh_id]]]
@@ -1,17 +1,151 @@
 # Imports
+import os
+import re
+import shutil
+import subprocess
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional
 import PIL.Image
-from typing import List
+from PIL import GifImagePlugin
 
 # ##############################################################################
 # # # Methods # # GREECE B_TRACK ANIMATION
 # ##############################################################################
 
 
-def render_gif_animation(lst_image_files: List[str], target_file: str, speed:int=100, first_last_slow:bool=True, add=0, crop_default=True, crop=[]):
+def sorted_frame_files(path: str) -> List[str]:
+    """
+    This function lists the image files of a folder in natural order, so that
+    "foto_10.png" comes after "foto_9.png" (os.listdir order is arbitrary).
+
+    Parameters
+    ----------
+    path : str
+        The folder containing the frames.
+
+    Returns
+    -------
+    List[str]
+        The sorted list of image files.
+    """
+    def natural_key(name):
+        return [int(part) if part.isdigit() else part for part in re.split(r"(\d+)", name)]
+    files = [f for f in os.listdir(path) if f.lower().endswith((".png", ".jpg", ".jpeg", ".bmp"))]
+    return [path+"/"+f for f in sorted(files, key=natural_key)]
+
+
+def load_frame(file: str, crop_default: bool=True, crop=[], palette: bool=False) -> PIL.Image.Image:
+    """
+    This function decodes and crops a single frame. With palette=True the
+    frame is quantized to an adaptive 256 color palette, ready for GIF encoding.
+    """
+    with PIL.Image.open(file) as image:
+        if crop_default:
+            image = image.crop((int(image.size[0]/2-image.size[1]/2), 0, int(image.size[0]/2+image.size[1]/2), image.size[1]))
+        else:
+            image = image.crop((crop[0], crop[1], crop[2], crop[3]))
+        image = image.convert("RGB")
+    if palette:
+        image = image.convert("P", palette=PIL.Image.Palette.ADAPTIVE)
+    return image
+
+
+def iter_frames(lst_image_files: List[str], crop_default: bool=True, crop=[], palette: bool=False, workers: Optional[int]=None) -> Iterator[PIL.Image.Image]:
+    """
+    This function decodes and crops frames on a worker pool and yields them in
+    order. At most two frames per worker are in flight, so memory does not
+    grow with the number of frames.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers<=1:
+        for file in lst_image_files:
+            yield load_frame(file, crop_default, crop, palette)
+        return
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for file in lst_image_files:
+            pending.append(executor.submit(load_frame, file, crop_default, crop, palette))
+            if len(pending)>=2*workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def find_ffmpeg() -> Optional[str]:
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is None:
+        try:
+            import imageio_ffmpeg
+            ffmpeg = imageio_ffmpeg.get_ffmpeg_exe()
+        except Exception:
+            ffmpeg = None
+    return ffmpeg
+
+
+class GifStreamWriter:
+    """
+    Writes a GIF animation frame by frame (each frame with its own local color
+    table), instead of collecting all frames for a single PIL save().
+    """
+    def __init__(self, target_file: str, speed: int=100):
+        self.file = open(target_file, "wb")
+        self.speed = speed
+        self.header_written = False
+
+    def write(self, frame: PIL.Image.Image, repeat: int=1):
+        if frame.mode!="P":
+            frame = frame.convert("P", palette=PIL.Image.Palette.ADAPTIVE)
+        if not self.header_written:
+            header, _ = GifImagePlugin.getheader(frame, info={"loop": 0, "duration": self.speed})
+            self.file.write(b"".join(header))
+            self.header_written = True
+        for data in GifImagePlugin.getdata(frame, duration=self.speed*repeat, include_color_table=True):
+            self.file.write(data)
+
+    def close(self):
+        self.file.write(b";")
+        self.file.close()
+
+
+class FFmpegStreamWriter:
+    """
+    Pipes raw RGB frames into an ffmpeg process (e.g. for MP4 targets), which
+    encodes them while the next frames are still being decoded.
     """
-    This function reads static images from a list of image files, and stores 
-    all of them in an GIF animation.
-    
+    def __init__(self, target_file: str, speed: int=100, ffmpeg: Optional[str]=None):
+        self.target_file = target_file
+        self.fps = 1000.0/speed
+        self.ffmpeg = ffmpeg or find_ffmpeg()
+        if self.ffmpeg is None:
+            raise RuntimeError("ffmpeg not found, install ffmpeg or imageio-ffmpeg, or render to .gif")
+        self.process = None
+
+    def write(self, frame: PIL.Image.Image, repeat: int=1):
+        frame = frame.convert("RGB")
+        if self.process is None:
+            self.process = subprocess.Popen([
+                self.ffmpeg, "-y", "-loglevel", "error",
+                "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", "%dx%d" % frame.size, "-r", str(self.fps), "-i", "-",
+                "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2", "-pix_fmt", "yuv420p", self.target_file,
+            ], stdin=subprocess.PIPE)
+        data = frame.tobytes()
+        for x in range(0, repeat):
+            self.process.stdin.write(data)
+
+    def close(self):
+        if self.process is not None:
+            self.process.stdin.close()
+            self.process.wait()
+
+
+def render_gif_animation(lst_image_files: List[str], target_file: str, speed:int=100, first_last_slow:bool=True, add=0, crop_default=True, crop=[], workers: Optional[int]=None):
+    """
+    This function reads static images from a list of image files, and stores
+    all of them in an GIF animation (or a video, if target_file is e.g. an
+    .mp4 file). Frames are decoded, cropped and encoded one by one, so peak
+    memory is independent of the animation length.
+
     Parameters
     ----------
     lst_image_files: List[str]
@@ -21,43 +155,39 @@ def render_gif_animation(lst_image_files: List[str], target_file: str, speed:int
     speed : int
         Optional, Defualt: 100. The time per image. The slower the faster the animation.
     first_last_slow : bool
-        Optional, Default : True. This will repeat the first and the last 
+        Optional, Default : True. This will repeat the first and the last
         image for ten times, so the animation does not directly run.
-        
+    workers : int
+        Optional, Default : None (all cores). Number of processes decoding and
+        cropping frames in parallel.
+
     Returns
     -------
     None
     """
-    frames = []
-    if first_last_slow:
-        for x in range(0,10):
-            image = PIL.Image.open(lst_image_files[0])
-            if crop_default:
-                image = image.crop((int(image.size[0]/2-image.size[1]/2), 0, int(image.size[0]/2+image.size[1]/2), image.size[1]))
-            else:
-                image = image.crop((crop[0], crop[1], crop[2], crop[3]))
-            frames.append(image)
-    for file in lst_image_files:
-        image = PIL.Image.open(file)
-        if crop_default:
-            image = image.crop((int(image.size[0]/2-image.size[1]/2), 0, int(image.size[0]/2+image.size[1]/2), image.size[1]))
-        else:
-            image = image.crop((crop[0], crop[1], crop[2], crop[3]))
-        frames.append(image)
-        print(file)
-    if first_last_slow:
-        for x in range(0,10):
-            frames.append(frames[-1])
-    frames[0].save(target_file, format='GIF',
-                    append_images=frames[1:],
-                    save_all=True,
-                    duration=speed, loop=0)
-    
-import os
-path = "figures_car_grp"
-files = os.listdir(path)
-files = [path+"/"+f for f in files]
-# files = files[0:1000]
+    is_gif = target_file.lower().endswith(".gif")
+    if is_gif:
+        writer = GifStreamWriter(target_file, speed)
+    else:
+        writer = FFmpegStreamWriter(target_file, speed)
+    frame = None
+    try:
+        for f_ctr, frame in enumerate(iter_frames(lst_image_files, crop_default, crop, palette=is_gif, workers=workers)):
+            if f_ctr==0 and first_last_slow:
+                writer.write(frame, repeat=10)
+            writer.write(frame)
+            print(lst_image_files[f_ctr])
+        if frame is not None and first_last_slow:
+            writer.write(frame, repeat=10)
+    finally:
+        writer.close()
+
+
+if __name__ == "__main__":
+    path = "figures_car_grp"
+    files = sorted_frame_files(path)
+    # files = files[0:1000]
 
-render_gif_animation(files, path+".gif", speed=100, first_last_slow=True, add=0) #add=52
-# render_gif_animation(files, path+".gif", speed=100, first_last_slow=True, add=0, crop_default=False, crop=[0, 350, 1910, 700]) #add=52
\ No newline at end of file
+    render_gif_animation(files, path+".gif", speed=100, first_last_slow=True, add=0) #add=52
+    # render_gif_animation(files, path+".mp4", speed=100, first_last_slow=True, add=0)
+    # render_gif_animation(files, path+".gif", speed=100, first_last_slow=True, add=0, crop_default=False, crop=[0, 350, 1910, 700]) #add=52
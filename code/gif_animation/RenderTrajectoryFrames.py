@@ -0,0 +1,194 @@
+# #############################################################################
+# ####### GREEN-PRESSURE - EMISSION-REDUCING SIGNALIZED INTERSECTION MANAGEMENT
+# #######
+# #######     AUTHOR:       Kevin Riehl <kriehl@ethz.ch>
+# #######     YEAR :        2025
+# #######     ORGANIZATION: Traffic Engineering Group (SVT),
+# #######                   Institute for Transportation Planning and Systems,
+# #######                   ETH Zürich
+# #############################################################################
+"""
+This code renders animation frames offscreen (matplotlib Agg) from a
+trajectory file recorded with "RunSimulation.py --record-trajectory", using
+the lane shapes of Network.net.xml. Frames are rendered in parallel across
+processes, with the same viewport options as RunSimulation_GIF.py
+(fixed offset / zoom / angle, or tracking a single vehicle).
+"""
+
+
+
+
+# #############################################################################
+# ## IMPORTS
+# #############################################################################
+import os
+import sys
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import xml.etree.ElementTree as ET
+import numpy as np
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from TrajectoryRecorder import loadTrajectoryChunks, vehicleNumber
+from RenderGIF_2_Animation import render_gif_animation, sorted_frame_files
+
+
+
+
+# #############################################################################
+# ## PARAMETERS
+# #############################################################################
+BACKGROUND_COLOR = (0.0, 0.0, 0.0)
+LANE_COLOR = (0.5, 0.5, 0.5)
+CLASS_COLORS = [(1.0, 1.0, 1.0),            # car (white)
+                (0.0, 0.5, 0.0),            # moc (green)
+                (0.0, 150/255, 1.0),        # lwt
+                (1.0, 150/255, 150/255),    # hwt
+                (1.0, 1.0, 0.0),            # bus (yellow)
+                (0.7, 0.7, 0.7)]            # unknown
+SIGNAL_COLORS = {"G": (0.0, 1.0, 0.0), "g": (0.0, 0.7, 0.0), "y": (1.0, 1.0, 0.0), "Y": (1.0, 1.0, 0.0),
+                 "r": (1.0, 0.0, 0.0), "R": (1.0, 0.0, 0.0)}
+FRAME_SIZE = (6, 6) # inch
+FRAME_DPI = 100
+
+
+
+
+# #############################################################################
+# ## METHODS
+# #############################################################################
+
+def loadNetworkShapes(net_file):
+    lane_shapes = {}
+    signal_links = []
+    boundary = None
+    for _, elem in ET.iterparse(net_file):
+        if elem.tag=="location":
+            boundary = [float(v) for v in elem.attrib["convBoundary"].split(",")]
+        elif elem.tag=="edge":
+            if elem.attrib.get("function")!="internal":
+                for lane in elem.findall("lane"):
+                    shape = [[float(v) for v in p.split(",")] for p in lane.attrib["shape"].split(" ")]
+                    lane_shapes[lane.attrib["id"]] = np.asarray(shape)
+            elem.clear()
+        elif elem.tag=="connection" and "tl" in elem.attrib:
+            from_lane = elem.attrib["from"]+"_"+elem.attrib["fromLane"]
+            signal_links.append((elem.attrib["tl"], int(elem.attrib["linkIndex"]), from_lane))
+    signal_positions = [(tl, idx, lane_shapes[lane][-1]) for tl, idx, lane in signal_links if lane in lane_shapes]
+    return lane_shapes, signal_positions, boundary
+
+def rotate(points, angle):
+    # same rotation direction as traci.gui.setAngle
+    rad = np.radians(angle)
+    rotation = np.asarray([[np.cos(rad), np.sin(rad)], [-np.sin(rad), np.cos(rad)]])
+    return np.asarray(points) @ rotation.T
+
+_network = None
+
+def initWorker(net_file, angle):
+    global _network
+    lane_shapes, signal_positions, boundary = loadNetworkShapes(net_file)
+    segments = [rotate(shape, angle) for shape in lane_shapes.values()]
+    signals = [(tl, idx, rotate(pos, angle)) for tl, idx, pos in signal_positions]
+    _network = {"segments": segments, "signals": signals, "boundary": boundary, "angle": angle}
+
+def metersToPoints(meters, view_width):
+    return meters*FRAME_SIZE[0]*72/view_width
+
+def renderFrame(target_file, time, vehicles, signal_states, center, view_width):
+    fig = plt.figure(figsize=FRAME_SIZE, dpi=FRAME_DPI, facecolor=BACKGROUND_COLOR)
+    ax = fig.add_axes([0, 0, 1, 1])
+    ax.set_facecolor(BACKGROUND_COLOR)
+    ax.add_collection(LineCollection(_network["segments"], colors=[LANE_COLOR], linewidths=metersToPoints(3.2, view_width)))
+    for tl, idx, pos in _network["signals"]:
+        state = signal_states.get(tl, "")
+        if idx<len(state):
+            ax.plot(pos[0], pos[1], "s", color=SIGNAL_COLORS.get(state[idx], LANE_COLOR), markersize=metersToPoints(2.0, view_width))
+    if len(vehicles)>0:
+        positions = rotate(np.stack((vehicles["x"], vehicles["y"]), axis=1), _network["angle"])
+        colors = [CLASS_COLORS[c] for c in vehicles["class_code"]]
+        ax.scatter(positions[:,0], positions[:,1], c=colors, s=metersToPoints(4.5, view_width)**2, marker="o", linewidths=0)
+    aspect = FRAME_SIZE[1]/FRAME_SIZE[0]
+    ax.set_xlim(center[0]-view_width/2, center[0]+view_width/2)
+    ax.set_ylim(center[1]-view_width*aspect/2, center[1]+view_width*aspect/2)
+    ax.set_axis_off()
+    ax.text(0.02, 0.98, "t = %.0f s" % time, transform=ax.transAxes, color="white", va="top", fontsize=8)
+    fig.savefig(target_file, facecolor=BACKGROUND_COLOR)
+    plt.close(fig)
+    return target_file
+
+def iterFrames(trajectory_file, begin, end, every):
+    # yields (time, vehicle rows, {intersection: state}) per recorded step
+    for intersections, vehicle_rows, signal_rows in loadTrajectoryChunks(trajectory_file):
+        for time in np.union1d(vehicle_rows["time"], signal_rows["time"]):
+            if time<begin or time>end or int(round(time-begin)) % every!=0:
+                continue
+            signals = signal_rows[signal_rows["time"]==time]
+            signal_states = {intersections[s["intersection"]]: s["state"].decode() for s in signals}
+            yield float(time), vehicle_rows[vehicle_rows["time"]==time], signal_states
+
+def renderTrajectoryFrames(trajectory_file, net_file, target_folder, offset=None, zoom=100, angle=0, track=None,
+                           begin=0, end=np.inf, every=1, workers=None):
+    """
+    Viewport semantics follow sumo-gui: zoom=100 shows the whole network
+    width, zoom=1000 a tenth of it; offset is the view center in network
+    coordinates; track keeps a vehicle (e.g. "VEH_123") in the center.
+    """
+    os.makedirs(target_folder, exist_ok=True)
+    _, _, boundary = loadNetworkShapes(net_file)
+    view_width = (boundary[2]-boundary[0])*100.0/zoom
+    if offset is None:
+        offset = ((boundary[0]+boundary[2])/2, (boundary[1]+boundary[3])/2)
+    center = rotate(offset, angle)
+    tracked = vehicleNumber(track) if track is not None else None
+    workers = workers or os.cpu_count() or 1
+    pending = deque()
+    n_frames = 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=initWorker, initargs=(net_file, angle)) as executor:
+        for time, vehicles, signal_states in iterFrames(trajectory_file, begin, end, every):
+            if tracked is not None:
+                hits = vehicles[vehicles["veh"]==tracked]
+                if len(hits)==0:
+                    continue
+                center = rotate((hits["x"][0], hits["y"][0]), angle)
+            n_frames += 1
+            target_file = target_folder+"/foto_"+"{0:0=5d}".format(n_frames)+".png"
+            pending.append(executor.submit(renderFrame, target_file, time, vehicles, signal_states, center, view_width))
+            if len(pending)>=2*workers:
+                pending.popleft().result()
+        while pending:
+            pending.popleft().result()
+    return n_frames
+
+
+
+
+# #############################################################################
+# ## MAIN CODE
+# #############################################################################
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render animation frames from a recorded trajectory file.")
+    parser.add_argument("trajectory_file")
+    parser.add_argument("--net-file", default="../../model/Network.net.xml")
+    parser.add_argument("--target-folder", default="figures")
+    parser.add_argument("--offset", type=float, nargs=2, default=None, help="view center, as traci.gui.setOffset")
+    parser.add_argument("--zoom", type=float, default=100, help="as traci.gui.setZoom")
+    parser.add_argument("--angle", type=float, default=0, help="as traci.gui.setAngle")
+    parser.add_argument("--track", default=None, help="vehicle to follow, as traci.gui.trackVehicle")
+    parser.add_argument("--begin", type=float, default=0)
+    parser.add_argument("--end", type=float, default=np.inf)
+    parser.add_argument("--every", type=int, default=1, help="render every n-th recorded second")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--gif", default=None, help="optional, assemble the frames into this GIF/MP4 file")
+    args = parser.parse_args()
+    n_frames = renderTrajectoryFrames(args.trajectory_file, args.net_file, args.target_folder, offset=args.offset,
+                                      zoom=args.zoom, angle=args.angle, track=args.track, begin=args.begin,
+                                      end=args.end, every=args.every, workers=args.workers)
+    print("RENDERED", n_frames, "FRAMES")
+    if args.gif is not None:
+        render_gif_animation(sorted_frame_files(args.target_folder), args.gif, speed=100, first_last_slow=True,
+                             workers=args.workers)
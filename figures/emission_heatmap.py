@@ -18,6 +18,8 @@ signal controller and generate relevant log files.
 # #############################################################################
 # ## IMPORTS
 # #############################################################################
+import os
+import sys
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
@@ -25,6 +27,8 @@ from matplotlib.colors import LinearSegmentedColormap
 import matplotlib.colors as colors
 import matplotlib.image as mpimg  # For loading images
 from PIL import Image
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "code"))
+from EmissionLogs import openLog, ATTRIBUTE_GOAL_WEIGHTS
 
 
 
@@ -35,6 +39,7 @@ from PIL import Image
 grid_resolution = 4.0  # m
 heatmap_frame_border = 2
 alpha = 55+180  # Rotation angle in degrees
+AQI_WEIGHTS = ATTRIBUTE_GOAL_WEIGHTS # emission goal weights, see EmissionLogs.py
 
 
 
@@ -43,11 +48,20 @@ alpha = 55+180  # Rotation angle in degrees
 # ## METHODS FOR LOADING
 # #############################################################################
 def loadTimeStepLogs(file):
-    file_reader = open(file, "r")
-    file_content = file_reader.read()
-    file_reader.close()
-    parts = file_content.split("<timestep time=\"")[1:]
-    return parts
+    # yields the text of one timestep at a time, streamed from the log
+    part = None
+    with openLog(file) as f:
+        for line in f:
+            if "<timestep time=\"" in line:
+                before, after = line.split("<timestep time=\"", 1)
+                if part is not None:
+                    part.append(before)
+                    yield "".join(part)
+                part = [after]
+            elif part is not None:
+                part.append(line)
+    if part is not None:
+        yield "".join(part)
 
 def extractInformationFromParts(parts):
     emission_info = []
@@ -63,7 +77,7 @@ def extractInformationFromParts(parts):
             veh_em_nox = float(vehicle_part.split(" NOx=\"")[1].split("\"")[0])
             veh_em_pmx = float(vehicle_part.split(" PMx=\"")[1].split("\"")[0])
             veh_em_noise = float(vehicle_part.split(" noise=\"")[1].split("\"")[0])
-            veh_em_aqi =  (veh_em_co2*0.15 + veh_em_co*0.10 + veh_em_hc*0.15 + veh_em_nox *0.30 + veh_em_pmx*0.30)/1000
+            veh_em_aqi =  (veh_em_co2*AQI_WEIGHTS["CO2"] + veh_em_co*AQI_WEIGHTS["CO"] + veh_em_hc*AQI_WEIGHTS["HC"] + veh_em_nox *AQI_WEIGHTS["NOx"] + veh_em_pmx*AQI_WEIGHTS["PMx"])/1000
             emission_info.append([
                 time,
                 veh_pos_x,
@@ -0,0 +1,233 @@
+# #############################################################################
+# ####### GREEN-PRESSURE - EMISSION-REDUCING SIGNALIZED INTERSECTION MANAGEMENT
+# #######
+# #######     AUTHOR:       Kevin Riehl <kriehl@ethz.ch>
+# #######     YEAR :        2025
+# #######     ORGANIZATION: Traffic Engineering Group (SVT),
+# #######                   Institute for Transportation Planning and Systems,
+# #######                   ETH Zürich
+# #############################################################################
+"""
+This code grids any number of emission logs (Emissions.xml) in parallel onto
+one shared, fixed heatmap grid (same rotation, resolution and bounds as
+emission_heatmap.py), so all maps are aligned cell by cell. Runs with the
+same label are treated as seeds of one scenario: per run, mean, std and 95%
+confidence maps are written, plus the difference of each scenario to a
+baseline scenario with its confidence, as .npz and figures.
+
+Usage:
+python emission_heatmap_batch.py MAX=../logs/logs_max_pressure/Emissions.xml GREEN=../logs/logs_green_pressure/Emissions.xml --baseline MAX
+"""
+
+
+
+
+# #############################################################################
+# ## IMPORTS
+# #############################################################################
+import os
+import re
+import sys
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+from matplotlib.colors import LinearSegmentedColormap
+import matplotlib.colors as colors
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "code"))
+from EmissionLogs import openLog, POLLUTANT_ATTRIBUTES, ATTRIBUTE_GOAL_WEIGHTS
+
+
+
+
+# #############################################################################
+# ## PARAMETERS
+# #############################################################################
+grid_resolution = 4.0  # m
+heatmap_frame_border = 2
+alpha = 55+180  # Rotation angle in degrees
+    # fixed grid bounds (rotated coordinates), as in emission_heatmap.py
+minx = -72
+maxx = 764
+miny = -2852
+maxy = -1660
+grid_x = np.arange(round((minx-heatmap_frame_border)/grid_resolution), round((maxx+heatmap_frame_border)/grid_resolution)+1)*grid_resolution
+grid_y = np.arange(round((miny-heatmap_frame_border)/grid_resolution), round((maxy+heatmap_frame_border)/grid_resolution)+1)*grid_resolution
+    # emissions
+AQI_WEIGHTS = ATTRIBUTE_GOAL_WEIGHTS
+VEHICLE_PATTERN = re.compile(r' CO2="([^"]*)" CO="([^"]*)" HC="([^"]*)" NOx="([^"]*)" PMx="([^"]*)".* x="([^"]*)" y="([^"]*)"')
+CHUNK_ROWS = 200000
+    # two-sided 95% t-quantiles by degrees of freedom (normal beyond)
+T_QUANTILES_95 = {1: 12.706, 2: 4.303, 3: 3.182, 4: 2.776, 5: 2.571, 6: 2.447, 7: 2.365, 8: 2.306, 9: 2.262,
+                  10: 2.228, 12: 2.179, 15: 2.131, 20: 2.086, 25: 2.060, 30: 2.042}
+
+
+
+
+# #############################################################################
+# ## METHODS FOR GRIDDING
+# #############################################################################
+def rotate_positions(x, y, alpha):
+    rad_alpha = np.radians(alpha)
+    rotated_x = x * np.cos(rad_alpha) - y * np.sin(rad_alpha)
+    rotated_y = x * np.sin(rad_alpha) + y * np.cos(rad_alpha)
+    return rotated_x, rotated_y
+
+def addToGrid(grid, rows):
+    rows = np.asarray(rows)
+    aqi = rows[:, :5] @ np.asarray([AQI_WEIGHTS[p] for p in POLLUTANT_ATTRIBUTES]) / 1000
+    rotated_x, rotated_y = rotate_positions(rows[:, 5], rows[:, 6], alpha)
+    ix = np.round(rotated_x/grid_resolution).astype(np.int64) - int(round(grid_x[0]/grid_resolution))
+    iy = np.round(rotated_y/grid_resolution).astype(np.int64) - int(round(grid_y[0]/grid_resolution))
+    inside = (ix>=0) & (ix<len(grid_x)) & (iy>=0) & (iy<len(grid_y))
+    grid += np.bincount(ix[inside]*len(grid_y)+iy[inside], weights=aqi[inside], minlength=grid.size).reshape(grid.shape)
+    return int((~inside).sum())
+
+def gridEmissionLog(file):
+    # streams one Emissions.xml into the shared grid (index: grid_x, grid_y), AQI emissions per cell
+    grid = np.zeros((len(grid_x), len(grid_y)))
+    outside = 0
+    rows = []
+    with openLog(file) as f:
+        for line in f:
+            match = VEHICLE_PATTERN.search(line)
+            if match is not None:
+                rows.append([float(v) for v in match.groups()])
+                if len(rows)>=CHUNK_ROWS:
+                    outside += addToGrid(grid, rows)
+                    rows = []
+    if len(rows)>0:
+        outside += addToGrid(grid, rows)
+    if outside>0:
+        print("WARNING", outside, "emission rows outside of the heatmap grid in", file)
+    return grid
+
+
+
+
+# #############################################################################
+# ## METHODS FOR STATISTICS
+# #############################################################################
+def tQuantile95(dof):
+    if dof<1:
+        return np.nan
+    known = [d for d in T_QUANTILES_95 if d<=dof]
+    return T_QUANTILES_95[max(known)] if dof<=30 else 1.96
+
+def summarizeRuns(grids):
+    grids = np.stack(grids)
+    n = len(grids)
+    mean = grids.mean(axis=0)
+    std = grids.std(axis=0, ddof=1) if n>1 else np.zeros_like(mean)
+    ci = tQuantile95(n-1)*std/np.sqrt(n) if n>1 else np.full_like(mean, np.nan)
+    return mean, std, ci
+
+def compareRuns(grids_base, grids_other):
+    # baseline minus other (positive = reduction), Welch confidence half-width
+    n_base, n_other = len(grids_base), len(grids_other)
+    mean_base, std_base, _ = summarizeRuns(grids_base)
+    mean_other, std_other, _ = summarizeRuns(grids_other)
+    difference = mean_base - mean_other
+    if n_base<2 or n_other<2:
+        return difference, np.full_like(difference, np.nan)
+    var_base, var_other = std_base**2/n_base, std_other**2/n_other
+    var = var_base + var_other
+    with np.errstate(divide="ignore", invalid="ignore"):
+        dof = var**2 / (var_base**2/(n_base-1) + var_other**2/(n_other-1))
+    dof = np.nan_to_num(dof, nan=min(n_base, n_other)-1)
+    t = np.vectorize(tQuantile95)(np.floor(dof).astype(int))
+    return difference, t*np.sqrt(var)
+
+
+
+
+# #############################################################################
+# ## METHODS FOR PLOTTING
+# #############################################################################
+def toImage(grid):
+    # same orientation as emission_heatmap.py (rows: grid_x, columns: reversed grid_y)
+    return grid[:, ::-1]
+
+def plotHeatmap(grid, title, target_file):
+    plt.rc('font', family='sans-serif')
+    fig, ax = plt.subplots(1, 1, figsize=(12, 2))
+    cmap = LinearSegmentedColormap.from_list("custom_cmap",  [(1, 1, 1), (0, 0, 1)] , N=100)
+    im = ax.imshow(toImage(grid), origin='lower', cmap=cmap, aspect='auto')
+    ax.set_title(title, fontweight="bold", y=0.8)
+    ax.set_xticks([])
+    ax.set_yticks([])
+    cbar = fig.colorbar(im, ax=ax, orientation='horizontal', fraction=0.05)
+    cbar.set_label('AQI Emissions [g]')
+    for spine in ax.spines.values():
+        spine.set_visible(False)
+    fig.savefig(target_file, bbox_inches="tight")
+    plt.close(fig)
+
+def plotDifference(difference, ci, title, target_file):
+    plt.rc('font', family='sans-serif')
+    fig, ax = plt.subplots(1, 1, figsize=(12, 2))
+    shown = np.cbrt(difference)
+    if not np.all(np.isnan(ci)):
+        # cells where the difference is within the confidence interval are blanked
+        shown = np.where(np.abs(difference)>ci, shown, 0.0)
+    cmap_diverging = colors.LinearSegmentedColormap.from_list("custom_diverging", ['red', 'white', 'green'], N=100)
+    im = ax.imshow(toImage(shown), origin='lower', cmap=cmap_diverging, aspect='auto')
+    ax.set_title(title, fontweight="bold", y=0.8)
+    ax.set_xticks([])
+    ax.set_yticks([])
+    limit = max(np.abs(shown).max(), 1e-9)
+    im.set_clim(-limit, limit)
+    cbar = fig.colorbar(im, ax=ax, orientation='horizontal', fraction=0.05)
+    cbar.set_label('Reduction [cbrt g]')
+    for spine in ax.spines.values():
+        spine.set_visible(False)
+    fig.savefig(target_file, bbox_inches="tight")
+    plt.close(fig)
+
+
+
+
+# #############################################################################
+# ## MAIN CODE
+# #############################################################################
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Grid many emission logs onto one shared heatmap grid and compare them.")
+    parser.add_argument("runs", nargs="+", help="LABEL=path/to/Emissions.xml, repeat a label for seeds")
+    parser.add_argument("--baseline", default=None, help="label to compute differences against")
+    parser.add_argument("--output", default="heatmaps", help="output folder")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--format", default="png")
+    args = parser.parse_args()
+    labels = [run.split("=", 1)[0] for run in args.runs]
+    files = [run.split("=", 1)[1] for run in args.runs]
+    os.makedirs(args.output, exist_ok=True)
+
+    # Grid all logs in parallel
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        grids = list(executor.map(gridEmissionLog, files))
+    runs = {}
+    for label, grid in zip(labels, grids):
+        runs.setdefault(label, []).append(grid)
+
+    # Per-run, mean and difference maps
+    results = {"grid_x": grid_x, "grid_y": grid_y}
+    for label, label_grids in runs.items():
+        for r_ctr, grid in enumerate(label_grids):
+            results["run_"+label+"_"+str(r_ctr)] = grid
+        mean, std, ci = summarizeRuns(label_grids)
+        results["mean_"+label] = mean
+        results["std_"+label] = std
+        results["ci_"+label] = ci
+        plotHeatmap(mean, "AQI Emission Heatmap ("+label+", n="+str(len(label_grids))+")",
+                    args.output+"/mean_"+label+"."+args.format)
+    if args.baseline is not None:
+        for label in [l for l in runs if l!=args.baseline]:
+            difference, ci = compareRuns(runs[args.baseline], runs[label])
+            results["diff_"+args.baseline+"_"+label] = difference
+            results["diffci_"+args.baseline+"_"+label] = ci
+            plotDifference(difference, ci, "AQI Emission Reduction ("+label+" vs. "+args.baseline+")",
+                           args.output+"/diff_"+args.baseline+"_"+label+"."+args.format)
+    np.savez_compressed(args.output+"/heatmaps.npz", **results)
+    print("SAVED", len(files), "RUNS TO", args.output)